@@ -4,8 +4,6 @@ import tempfile
 import base64
 import time
 import sys
-from PIL import Image
-from io import BytesIO
 
 # Add project root to path to enable imports
 sys.path.append(os.path.abspath('.'))
@@ -16,6 +14,7 @@ try:
     from src.agents.prompt_agent import PromptAgent
     from src.agents.report_generation_agent import ReportGenerationAgent
     from src.agents.citation_agent import get_citations
+    from src.utils.text_compressor import RAW_TEXT_HEADROOM, compress_documents
 except ImportError as e:
     st.error(f"Error loading project modules: {e}. Make sure the application is run from the project root directory.")
     st.stop()
@@ -224,24 +223,25 @@ def create_download_link(file_path, link_text):
     """
 
 
-def save_uploaded_file(uploaded_file, directory):
-    """Save uploaded file to a temporary directory."""
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-    
-    temp_path = os.path.join(directory, uploaded_file.name)
-    with open(temp_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    
-    return temp_path
-
-
 def display_latex_content(latex_content, tab_title="Generated LaTeX"):
     """Display LaTeX content in a formatted way."""
     with st.expander(f"View {tab_title}", expanded=True):
         st.code(latex_content, language="latex")
 
 
+def render_partial_output(placeholder, parser):
+    """Shows the title, section headings and bullet points streamed so far."""
+    title, sections = PromptAgent.preview_sections(parser.snapshot())
+    if not title and not sections:
+        placeholder.markdown("_The model is thinking..._")
+        return
+    lines = [f"### {title}"] if title else []
+    for heading, content in sections:
+        lines.append(f"#### {heading}")
+        lines.extend(f"- {item}" for item in content if item)
+    placeholder.markdown("\n".join(lines))
+
+
 def check_api_key():
     """Check if API key is provided in secrets or needs to be entered by user."""
     if 'GROQ' in os.environ:
@@ -269,6 +269,26 @@ def main():
         # API Key input
         st.subheader("Configuration")
         api_key = check_api_key()
+        use_cache = st.checkbox(
+            "Reuse cached AI responses",
+            value=True,
+            help="Answer repeated requests from the local response cache. Untick to force fresh generations."
+        )
+        map_reduce = st.checkbox(
+            "Summarise each paper separately",
+            value=False,
+            help="Read whole papers: each one is summarised in its own parallel request before the document is generated."
+        )
+        retrieval = st.checkbox(
+            "Pick relevant passages from whole papers",
+            value=True,
+            help="Read most of each paper and fill the prompt with its passages most relevant to each part of the document."
+        )
+        sectioned = st.checkbox(
+            "Write report sections in parallel",
+            value=False,
+            help="IEEE reports: plan an outline first, then write every section in its own parallel request."
+        )
         
         # Project info
         st.markdown("### About")
@@ -414,22 +434,11 @@ def main():
                 if process_button_disabled:
                     st.warning("Please upload research papers, format template, and provide API key.")
                 else:
-                    # Create temporary directories
+                    # Temporary directory for the generated LaTeX file only;
+                    # uploads are read straight from memory.
                     temp_dir = tempfile.mkdtemp()
-                    research_dir = os.path.join(temp_dir, "Research_papers")
-                    format_dir = os.path.join(temp_dir, "Format")
-                    os.makedirs(research_dir, exist_ok=True)
-                    os.makedirs(format_dir, exist_ok=True)
                     
                     try:
-                        # Save uploaded files
-                        research_paths = []
-                        for paper in uploaded_research_papers:
-                            paper_path = save_uploaded_file(paper, research_dir)
-                            research_paths.append(paper_path)
-                        
-                        format_path = save_uploaded_file(uploaded_format, format_dir)
-                        
                         # Show progress with custom styling
                         st.markdown('<div class="card progress-animation">', unsafe_allow_html=True)
                         progress_bar = st.progress(0)
@@ -440,26 +449,49 @@ def main():
                         progress_bar.progress(10)
                         time.sleep(0.5)  # Small delay for animation effect
                         
-                        input_handler = InputHandler(research_paths, format_path)
+                        input_handler = InputHandler(
+                            uploaded_research_papers,
+                            uploaded_format,
+                            budget=None if map_reduce else (
+                                PromptAgent.retrieval_budget(output_format) if retrieval
+                                else PromptAgent.content_budget(output_format)
+                            ).scaled(RAW_TEXT_HEADROOM)
+                        )
                         processed_data = input_handler.process_inputs()
+                        research_documents, _ = compress_documents(processed_data["research_papers"])
                         progress_bar.progress(30)
                         time.sleep(0.5)
                         
                         # Step 2: Extract citations
                         status_text.markdown("📚 **Extracting citations...**")
-                        extracted_citations = get_citations(research_paths)
+                        extracted_citations = get_citations(uploaded_research_papers, use_cache=use_cache)
                         progress_bar.progress(50)
                         time.sleep(0.5)
                         
-                        # Step 3: Generate content with LLM
+                        # Step 3: Generate content with LLM, showing it as it streams in.
+                        # Clicking Cancel reruns the script, which abandons the streaming request.
                         status_text.markdown("🧠 **Generating document content with AI...**")
-                        agent = PromptAgent(api_key)
+                        st.button("✋ Cancel generation")
+                        preview = st.empty()
+                        last_render = [0.0]
+
+                        def show_partial(parser):
+                            if time.monotonic() - last_render[0] >= 0.25:
+                                render_partial_output(preview, parser)
+                                last_render[0] = time.monotonic()
+
+                        agent = PromptAgent(api_key, retrieval=retrieval)
                         llm_output = agent.get_response(
-                            processed_data["research_papers"],
+                            research_documents,
                             processed_data["format_requirements"],
                             extracted_citations,
-                            output_format
+                            output_format,
+                            use_cache=use_cache,
+                            map_reduce=map_reduce,
+                            on_partial=show_partial,
+                            sectioned=sectioned
                         )
+                        preview.empty()
                         progress_bar.progress(80)
                         time.sleep(0.5)
                         
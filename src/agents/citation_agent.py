@@ -1,57 +1,303 @@
-import fitz
 import os
-import re
-from dotenv import load_dotenv
-import google.generativeai as genai
-# Load environment variables
-load_dotenv()
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from src.llm.llm_interface import LLMInterface
+from src.llm.output_budget import get_budget
+from src.llm.providers import load_environment
+from src.llm.response_cache import acached_generate, cached_generate
+from src.utils.pdf_extractor import PDFExtractor, source_name
+from src.utils.reference_locator import TRAILING_PAGES, chunk_references, locate_references
+from src.utils.reference_parser import parse_bibliography, split_entries
 
-# Configure Gemini API
-google_api_key = os.getenv("GOOGLE_API_KEY")
-if not google_api_key:
-    raise ValueError("Error: GOOGLE_API_KEY is missing. Please set it correctly.")
+logger = logging.getLogger(__name__)
 
-genai.configure(api_key=google_api_key)
+# Providers that format bibliographies, best first (see build_providers), unless BIBTEX_AI_CITATION_PROVIDERS
+# says otherwise; it and GOOGLE_API_KEY are read on first use.
+DEFAULT_CITATION_PROVIDERS = "gemini:gemini-1.5-flash"
+# Bibliographies longer than this are split into chunks extracted by concurrent requests.
+MAX_CHUNK_CHARS = 6000
+# Maximum number of citation LLM requests in flight at once.
+MAX_CONCURRENT_REQUESTS = 8
+# Papers whose bibliography the local parser reads with at least this confidence skip the LLM.
+LOCAL_PARSE_CONFIDENCE = 0.8
 
 
-def get_citations(research_papers: list):
-    references = []
-    text = ""
-    for file_path in research_papers:   
-        doc = fitz.open(file_path)
-        text = "\n".join(page.get_text() for page in doc)
-            
-    llm = genai.GenerativeModel('gemini-1.5-flash')
-        
-    prompt = f'''Extract 15 references from the following research paper:
-    Research Paper:
-    {text}
+def _parse_bibitems(citations):
+    """Cleans an LLM response and splits it into individual \\bibitem lines."""
+    citations = citations.replace('```latex', '').replace('```', '')
+    citations = citations.replace('\\begin{thebibliography}{99}', '')
+    citations = citations.replace('\\end{thebibliography}', '')
+    references = [ref.strip() for ref in citations.split('\\bibitem') if ref.strip()]
+    return [f'\\bibitem{ref}' for ref in references]
+
+
+def _chunk_prompt(bibliography):
+    return f'''Extract every reference from the following bibliography excerpt of a research paper:
+    Bibliography:
+    {bibliography}
 
     Generate LaTeX code for the citations using the following format:
     \\bibitem{{key}} Author(s), "Title," Journal/Conference, vol., no., pp., year.
 
     Instructions:
     - Only include the \\bibitem entries
-    - Return exactly 15 references
+    - Return one entry for every reference in the excerpt, in the same order
     - Each reference should be on its own line
     - Do not include any \\begin or \\end commands
-    '''         
-    response = llm.generate_content([prompt])
-    response.resolve()
-    citations = response.text
-    
-    # Clean and split into individual references
-    citations = citations.replace('```latex', '').replace('```', '')
-    citations = citations.replace('\\begin{thebibliography}{99}', '')
-    citations = citations.replace('\\end{thebibliography}', '')
-    references = [ref.strip() for ref in citations.split('\\bibitem') if ref.strip()]
-    references = [f'\\bibitem{ref}' for ref in references][:15]  # Ensure exactly 15
-    
-    return references
+    '''
+
+
+@functools.lru_cache(maxsize=None)
+def citation_llm():
+    """Returns the shared LLMInterface routing citation requests across the citation providers."""
+    load_environment()
+    return LLMInterface(providers=os.getenv("BIBTEX_AI_CITATION_PROVIDERS", DEFAULT_CITATION_PROVIDERS), params={})
+
+
+def _extract_chunk(bibliography, use_cache=True):
+    """
+    Asks the citation LLM, or the LLM response cache, to format one chunk of a bibliography as \\bibitem lines.
+    :return: The \\bibitem lines, or None if the request failed.
+    """
+    llm = citation_llm()
+    budget = get_budget("citations")
+    try:
+        return _parse_bibitems(cached_generate(
+            llm.provider, llm.model, budget.cache_params(llm.params), _chunk_prompt(bibliography),
+            functools.partial(llm.generate_text, budget=budget), use_cache
+        ))
+    except Exception as e:
+        logger.error(f"Failed to extract citations from bibliography chunk: {e}")
+        return None
+
+
+async def _aextract_chunk(bibliography, use_cache=True):
+    """Async counterpart of _extract_chunk, bounded by the providers' concurrency limit per event loop."""
+    llm = citation_llm()
+    budget = get_budget("citations")
+    try:
+        return _parse_bibitems(await acached_generate(
+            llm.provider, llm.model, budget.cache_params(llm.params), _chunk_prompt(bibliography),
+            functools.partial(llm.agenerate_text, budget=budget), use_cache
+        ))
+    except Exception as e:
+        logger.error(f"Failed to extract citations from bibliography chunk: {e}")
+        return None
+
+
+def _drop_known_entries(bibliography, seen, store=None):
+    """
+    Removes the entries of a bibliography bound for the citation LLM that need no request: those
+    duplicating a reference already parsed locally or queued from another paper, so each work is
+    extracted once per batch, and those an earlier job resolved, which are read from the store.
+
+    :param seen: CitationIndex of the batch's references so far; the remaining entries are added to it.
+    :param store: Optional CitationStore to look the remaining entries up in.
+    :return: Tuple of (\\bibitem lines found in the store, the bibliography without the entries dropped,
+             (index in seen of the entry duplicated, entry line) for each duplicate dropped); a bibliography
+             that is not numbered is returned unchanged.
+    """
+    entries = split_entries(bibliography)
+    new = []
+    duplicates = []
+    for number, entry in entries:
+        entry_id, is_new = seen.add(entry)
+        if is_new:
+            new.append((number, entry))
+        else:
+            duplicates.append((entry_id, _entry_line(number, entry)))
+    if duplicates:
+        logger.info(f"Skipping {len(duplicates)} reference(s) already found in other papers")
+    stored = store.find([entry for _, entry in new]) if store is not None and new else [None] * len(new)
+    known = [bibitem for bibitem in stored if bibitem]
+    if known:
+        logger.info(f"Found {len(known)} reference(s) in the citation store")
+    kept = [(number, entry) for (number, entry), bibitem in zip(new, stored) if not bibitem]
+    if len(kept) == len(entries):
+        return known, bibliography, duplicates
+    return known, "\n".join(_entry_line(number, entry) for number, entry in kept), duplicates
+
+
+def _entry_line(number, entry):
+    return f"[{number}] {entry}" if number is not None else entry
+
+
+def _plan_citations(research_papers, max_workers, use_local_parser, store=None):
+    """
+    Locates and, where possible, locally parses each paper's bibliography; entries of the
+    others are looked up in the citation store before any is sent to the citation LLM.
+
+    :param store: Optional CitationStore of references resolved by earlier jobs.
+    :return: Tuple of (per-paper (\\bibitem lines resolved without the LLM, chunk indices, (chunk index, entry
+             line) of each entry dropped as a duplicate of one sent in that chunk), chunks for the citation
+             LLM, the \\bibitem lines parsed locally).
+    """
+    # NumPy is only loaded once a job needs it
+    from src.utils.citation_index import CitationIndex, reference_fields
+    records = PDFExtractor.extract_documents(research_papers, max_workers)
+
+    per_paper = []  # \\bibitem lines resolved without the LLM, and the chunks to send to it, for each paper
+    chunks = []
+    parsed = []
+    seen = CitationIndex()
+    duplicates = []  # (paper position, index in seen of the entry duplicated, entry line)
+    queued = {}  # Index in seen of each entry sent to the LLM -> its chunk
+    for paper, record in zip(research_papers, records):
+        name = source_name(paper)
+        bibliography = locate_references(record["pages"], record["metadata"].get("sections"))
+        if not bibliography:
+            logger.warning(f"No bibliography found in {name}; sending its last pages instead.")
+            bibliography = "\n".join(record["pages"][-TRAILING_PAGES:])
+        elif use_local_parser:
+            references, confidence = parse_bibliography(bibliography)
+            logger.info(f"Local bibliography parse of {name}: {len(references)} reference(s), confidence {confidence:.2f}")
+            if confidence >= LOCAL_PARSE_CONFIDENCE:
+                per_paper.append((references, [], []))
+                parsed.extend(references)
+                for reference in references:
+                    seen.add(reference)
+                continue
+        known, bibliography, dropped = _drop_known_entries(bibliography, seen, store)
+        duplicates.extend((len(per_paper), entry_id, line) for entry_id, line in dropped)
+        paper_chunks = chunk_references(bibliography, MAX_CHUNK_CHARS)
+        for index, chunk in enumerate(paper_chunks, len(chunks)):
+            for _, entry in split_entries(chunk):
+                queued.setdefault(seen.find(reference_fields(entry)), index)
+        per_paper.append((known, list(range(len(chunks), len(chunks) + len(paper_chunks))), []))
+        chunks.extend(paper_chunks)
+
+    # Duplicates of a locally parsed or stored reference are resolved already; those of a queued one are
+    # remembered with its chunk, so they can be sent after all if that chunk's request fails
+    for position, entry_id, line in duplicates:
+        if entry_id in queued:
+            per_paper[position][2].append((queued[entry_id], line))
+    return per_paper, chunks, parsed
+
+
+def _requeue_failed(per_paper, results):
+    """
+    Collects the entries dropped as duplicates of an entry whose chunk's request failed, so that one
+    failed request does not also lose the other papers' citations of the same works.
+
+    :param results: \\bibitem lines of each chunk, or None where its request failed.
+    :return: Chunks of those entries to send to the citation LLM; their indices, following the results,
+             are added to the chunk indices of the papers they came from.
+    """
+    retry = []
+    for _, indices, covered in per_paper:
+        lines = [line for index, line in covered if results[index] is None]
+        for chunk in chunk_references("\n".join(lines), MAX_CHUNK_CHARS):
+            indices.append(len(results) + len(retry))
+            retry.append(chunk)
+    if retry:
+        logger.warning(f"Re-sending the skipped duplicates of failed bibliography chunks in {len(retry)} chunk(s)")
+    return retry
+
+
+def _merge_citations(per_paper, results):
+    """Merges stored, local and LLM results in paper order, dropping duplicates and assigning stable keys."""
+    from src.utils.citation_index import deduplicate
+    references = []
+    for known, indices, _ in per_paper:
+        references.extend(known)
+        references.extend(ref for index in indices for ref in results[index] or ())
+    return deduplicate(references)
+
+
+def _store_citations(store, parsed, chunks, results):
+    """
+    Adds the references parsed locally and those the citation LLM formatted to the citation store.
+    A formatted line is also stored under the keys of its source entry (e.g. a DOI the LLM left out)
+    when the chunk's entries and lines pair up one to one and agree on author and year.
+    """
+    from src.utils.citation_index import compatible, reference_fields
+    from src.utils.citation_store import reference_keys
+    records = [(reference_keys(reference), reference) for reference in parsed]
+    for chunk, references in zip(chunks, results):
+        if references is None:
+            continue
+        entries = split_entries(chunk)
+        for position, reference in enumerate(references):
+            keys = reference_keys(reference)
+            if len(entries) == len(references):  # The prompt asks for one line per entry, in order
+                entry = entries[position][1]
+                if compatible(reference_fields(entry), reference_fields(reference)):
+                    keys = list(dict.fromkeys(reference_keys(entry) + keys))
+            records.append((keys, reference))
+    written = store.add(records)
+    if written:
+        logger.info(f"Stored {written} reference key(s) in the citation store")
+
+
+def _extract_chunks(chunks, use_cache):
+    """Extracts chunks by concurrent requests to the citation LLM; see _extract_chunk."""
+    if not chunks:
+        return []
+    logger.info(f"Extracting citations from {len(chunks)} bibliography chunk(s) with {citation_llm().provider}")
+    with ThreadPoolExecutor(max_workers=min(len(chunks), MAX_CONCURRENT_REQUESTS)) as pool:
+        return list(pool.map(_extract_chunk, chunks, [use_cache] * len(chunks)))
+
+
+async def _aextract_chunks(chunks, use_cache):
+    """Async counterpart of _extract_chunks."""
+    if not chunks:
+        return []
+    logger.info(f"Extracting citations from {len(chunks)} bibliography chunk(s) with {citation_llm().provider}")
+    return list(await asyncio.gather(*(_aextract_chunk(chunk, use_cache) for chunk in chunks)))
+
+
+def _citation_store(use_store):
+    from src.utils.citation_store import get_store
+    return get_store() if use_store else None
+
 
+def get_citations(research_papers: list, max_workers=None, use_local_parser=True, use_cache=True, use_store=True):
+    """
+    Extracts references from research papers given as file paths or in-memory PDFs
+    (bytes, memoryviews or uploaded files) and returns them as \\bibitem lines.
 
+    Only the bibliography pages of each paper, located locally, are used. Papers whose
+    numbered bibliography the local parser reads confidently need no LLM call; the others
+    are split into chunks extracted by concurrent requests to the citation LLM; references
+    already found in another paper, or resolved by an earlier job and kept in the citation
+    store, are not sent. The results of all papers are merged in paper order, with each work
+    listed once under a stable key (see CitationIndex), and the newly resolved ones are stored.
 
+    :param use_local_parser: Set to False to always extract with the citation LLM.
+    :param use_cache: Set to False to bypass the LLM response cache.
+    :param use_store: Set to False to neither read nor update the citation store (see get_store).
+    """
+    store = _citation_store(use_store)
+    per_paper, chunks, parsed = _plan_citations(research_papers, max_workers, use_local_parser, store)
 
+    results = _extract_chunks(chunks, use_cache)
+    retry = _requeue_failed(per_paper, results)
+    if retry:
+        chunks = chunks + retry
+        results += _extract_chunks(retry, use_cache)
+    if store is not None:
+        _store_citations(store, parsed, chunks, results)
+    return _merge_citations(per_paper, results)
 
 
+async def aget_citations(research_papers: list, max_workers=None, use_local_parser=True, use_cache=True,
+                         use_store=True):
+    """
+    Async counterpart of get_citations. PDF extraction runs in a worker thread and the
+    citation LLM requests of every paper and job on the event loop share one concurrency limit.
+    """
+    store = _citation_store(use_store)
+    per_paper, chunks, parsed = await asyncio.to_thread(
+        _plan_citations, research_papers, max_workers, use_local_parser, store
+    )
 
+    results = await _aextract_chunks(chunks, use_cache)
+    retry = _requeue_failed(per_paper, results)
+    if retry:
+        chunks = chunks + retry
+        results += await _aextract_chunks(retry, use_cache)
+    if store is not None:
+        await asyncio.to_thread(_store_citations, store, parsed, chunks, results)
+    return _merge_citations(per_paper, results)
@@ -2,37 +2,274 @@ import sys
 import os
 import json
 import logging
-from langchain.schema import Document
 import re
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 
 # Ensure the src directory is added to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
 
-from src.llm.llm_interface import LLMInterface
+from src.llm.llm_interface import MAX_CONCURRENT_REQUESTS, LLMInterface
+from src.llm.output_budget import get_budget
+from src.llm.response_cache import acached_generate, cached_generate, cached_stream
+from src.utils.text_budget import TextBudget
+from src.utils.prompt_budget import PromptPlanner
+from src.utils.disk_cache import get_cache, sha256_hex
+from src.utils.llm_json import IncrementalJSONParser, loads_tolerant
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cache namespace of per-paper summaries used by map-reduce mode.
+SUMMARY_CACHE = "paper-summaries-v1"
+
+SUMMARY_PROMPT = """
+You are an AI assistant that summarises research papers for a {target}.
+Summarise the research paper below in at most {words} words of plain prose.
+Cover the problem addressed, the method, the main results with their key numbers, and the conclusions.
+Mention the paper's title and authors so that they can be cited. Do not invent anything that is not in the paper.
+Only output the summary.
+
+=== Research Paper ===
+Title: {title}
+Author: {author}
+Sections: {sections}
+Content:
+{content}
+""".strip()
+
+# Number of sections the outline of a sectioned IEEE report asks for, and the length of the whole report in words.
+MIN_SECTIONS = 5
+MAX_SECTIONS = 7
+REPORT_WORDS = 2400
+# Queries selecting each paper's passages for a whole report or presentation, one per part, so that the
+# methods and results past a paper's introduction make it into the prompt too.
+DOCUMENT_QUERIES = [
+    "abstract introduction problem motivation contribution",
+    "background related work",
+    "method approach model architecture algorithm",
+    "experiment dataset evaluation setup",
+    "result performance accuracy improvement comparison",
+    "discussion limitation conclusion future work",
+]
+# Passages ranked per query, and the paper context of one sectioned-report section in tokens.
+TOP_K_PASSAGES = 12
+# With retrieval, each paper is read up to this many times its share of the prompt (see retrieval_budget): enough
+# for the whole of a typical paper, while a very long upload still stops early.
+RETRIEVAL_READ_FACTOR = int(os.getenv("BIBTEX_AI_RETRIEVAL_READ_FACTOR", "8"))
+SECTION_CONTEXT_TOKENS = 4000
+# Used when the outline response cannot be parsed.
+DEFAULT_OUTLINE_HEADINGS = ["Introduction", "Background", "Methodology", "Results", "Discussion", "Conclusion"]
+
+OUTLINE_PROMPT = """
+You are an AI assistant that plans a research report written in LaTeX.
+Read the research papers below and plan a report of at least three pages that draws on all of them.
+ONLY use the required format to understand the layout. DO NOT copy any of its content.
+
+=== Research Papers ===
+{papers}
+
+=== Required Format ===
+{format_requirements}
+
+Respond in JSON format with the following keys:
+- "title": The title of the report.
+- "author": The author of the report.
+- "abstract": A detailed abstract summarizing the report.
+- "sections": Between {min_sections} and {max_sections} sections in reading order, each a dictionary with
+  "heading", "focus" (one or two sentences on what the section covers) and "papers" (the numbers of the research papers it draws on).
+
+Example:
+{{
+    "title": "AI in Healthcare",
+    "author": "AI Researcher",
+    "abstract": "This report explores the applications of AI in healthcare...",
+    "sections": [
+        {{"heading": "Introduction", "focus": "Motivates the use of AI in diagnostics.", "papers": [1, 2]}},
+        {{"heading": "Methodology", "focus": "Compares the models used by the papers.", "papers": [2]}}
+    ]
+}}
+
+Do not write the sections themselves. I only want to see the output in JSON format. The thinking should not be in the output.
+""".strip()
+
+SECTION_PROMPT = """
+You are an AI assistant that writes one section of a research report in LaTeX.
+
+Report title: {title}
+Abstract: {abstract}
+Outline of the report:
+{outline}
+
+Write the section "{heading}". It covers: {focus}
+Write about {words} words of detailed, well-structured academic prose, based on the research papers below.
+Mention the research papers by author or title wherever their insights are used.
+Only output the body of the section: no \\section command, no JSON, no Markdown and no thinking.
+
+=== Research Papers ===
+{papers}
+""".strip()
+
+
+class ResponseReport:
+    """
+    Token accounting of one get_response call, filled in while it runs. Pass a fresh report to
+    every call: concurrent calls on one PromptAgent then keep their figures apart.
+    """
+
+    def __init__(self):
+        self.plan = None  # Token report of the response prompt, or of the outline prompt of a sectioned report
+        self.usage = []  # Reasoning and payload tokens of each LLM call (see OutputMeter.usage)
+
+
+class SectionedDraft:
+    """
+    Progress of a sectioned IEEE report: the outline and the sections written so far.
+    Passed to get_response's on_partial callback in place of the streaming parser.
+    """
+
+    def __init__(self, outline):
+        self.outline = outline
+        self.contents = [None] * len(outline["sections"])
+
+    def snapshot(self):
+        """Returns the report so far in the structure IncrementalJSONParser.snapshot() produces."""
+        return {
+            "title": self.outline["title"],
+            "sections": [
+                {"heading": section["heading"], "content": [content] if content else []}
+                for section, content in zip(self.outline["sections"], self.contents)
+            ],
+        }
+
+    def result(self):
+        """
+        Returns the report for ReportGenerationAgent; a section whose generation failed has
+        content None and keeps its outline "focus".
+        """
+        return {
+            "title": self.outline["title"],
+            "author": self.outline["author"],
+            "abstract": self.outline["abstract"],
+            "sections": [
+                {"heading": section["heading"], "focus": section["focus"], "content": content}
+                for section, content in zip(self.outline["sections"], self.contents)
+            ],
+        }
+
+
 class PromptAgent:
     """Agent to generate structured prompts for academic LaTeX output."""
 
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, planner=None, retrieval=True):
+        """
+        :param retrieval: Fill prompts with the passages of each paper most relevant to the output
+                          (see PassageIndex) instead of the beginning of each paper. Extract papers with
+                          retrieval_budget: retrieval can only pick from what was extracted.
+        """
         self.llm = LLMInterface(api_key)
+        self.planner = planner or PromptPlanner()
+        self.retrieval = retrieval
+
+    @staticmethod
+    def output_task(output_format):
+        """Names the output budget (see OUTPUT_BUDGETS) of the single-call response in an output format."""
+        return "beamer" if PromptAgent.is_beamer(output_format) else "report"
 
-    def generate_prompt(self, research_papers: list[Document], format_requirements: str, citations: str, output_format: str) -> str:
+    def _cached(self, task, generate, report=None):
+        """
+        Binds a task's output budget to an LLMInterface method for the response cache.
+        :param report: Optional ResponseReport the call's token usage is added to.
+        :return: Tuple of (generation parameters for the cache key, callable taking the prompt).
+        """
+        budget = get_budget(task)
+        on_usage = report.usage.append if report is not None else None
+        return budget.cache_params(self.llm.params), functools.partial(generate, budget=budget, on_usage=on_usage)
+
+    def _generate(self, task, prompt, use_cache, report=None):
+        """Sends a prompt within the output budget of a task, or answers it from the response cache."""
+        params, generate = self._cached(task, self.llm.generate_text, report)
+        return cached_generate(self.llm.provider, self.llm.model, params, prompt, generate, use_cache)
+
+    async def _agenerate(self, task, prompt, use_cache, report=None):
+        params, agenerate = self._cached(task, self.llm.agenerate_text, report)
+        return await acached_generate(self.llm.provider, self.llm.model, params, prompt, agenerate, use_cache)
+
+    def _stream(self, task, prompt, use_cache, report=None):
+        params, stream = self._cached(task, self.llm.stream_text, report)
+        return cached_stream(self.llm.provider, self.llm.model, params, prompt, stream, use_cache)
+
+    @staticmethod
+    def is_beamer(output_format):
+        """Checks whether an output format such as "Beamer presentation" asks for slides."""
+        return "beamer" in output_format.lower()
+
+    @staticmethod
+    def content_budget(output_format):
+        """
+        Returns the TextBudget of paper content used per research paper in the prompt.
+        Pass it to InputHandler so that extraction stops once a paper has supplied enough text.
+        """
+        return TextBudget(max_tokens=500 if PromptAgent.is_beamer(output_format) else 2000)
+
+    @staticmethod
+    def retrieval_budget(output_format):
+        """
+        Returns the TextBudget to extract each paper with when prompts are filled by retrieval:
+        RETRIEVAL_READ_FACTOR times content_budget, so passages come from (most of) the paper.
+        """
+        return PromptAgent.content_budget(output_format).scaled(RETRIEVAL_READ_FACTOR)
+
+    def generate_prompt(self, research_papers: list, format_requirements: str, citations: str, output_format: str,
+                        index=None, report=None) -> str:
         """
         Generates a structured prompt based on output format (IEEE or Beamer).
+
+        Paper content is cut by measured token counts so that the prompt fits the model's
+        context window; the planned and actual token counts are kept in report.plan.
+        :param index: Optional PassageIndex of the papers; each paper then contributes its passages
+                      most relevant to DOCUMENT_QUERIES instead of its beginning.
+        :param report: Optional ResponseReport to record the prompt's token plan in.
+        :raises PromptTooLargeError: If the prompt cannot fit, before any request is sent.
         """
+        prompt, plan = self.planner.plan(
+            lambda contents: self._assemble_prompt(research_papers, contents, format_requirements, output_format),
+            self._paper_contents(research_papers, output_format, index),
+            per_paper_cap=self.content_budget(output_format).max_tokens,
+        )
+        if report is not None:
+            report.plan = plan
+        return prompt
+
+    def build_index(self, research_papers, use_cache=True):
+        """Returns the PassageIndex of a job's papers, or None when retrieval is off."""
+        from src.utils.passage_index import PassageIndex  # NumPy is only loaded once a job needs the index
+        return PassageIndex(research_papers, use_cache) if self.retrieval and research_papers else None
+
+    def _paper_contents(self, research_papers, output_format, index):
+        """Returns the content of each paper for a prompt: its most relevant passages, or its full text without an index."""
+        if index is None:
+            return [doc.page_content for doc in research_papers]
+        cap = self.content_budget(output_format).max_tokens
+        contents = []
+        for paper, doc in enumerate(research_papers):
+            passages = index.select(DOCUMENT_QUERIES, cap, papers=[paper], k=TOP_K_PASSAGES)
+            contents.append(index.excerpt(passages, paper) or doc.page_content)
+        return contents
+
+    def _assemble_prompt(self, research_papers, contents, format_requirements, output_format):
+        """Fills the prompt template with each paper's metadata and the given (already cut) content."""
         papers_text = "\n\n".join([
             f"Title: {doc.metadata.get('title', 'Unknown')}\n"
             f"Author: {doc.metadata.get('author', 'Unknown')}\n"
             f"Sections: {list(doc.metadata.get('sections', {}).keys())}\n"
-            # f"Content:\n{doc.page_content[:500]}..."
-            f"Content:\n{doc.page_content[:2000] + '...' if output_format.lower() == 'beamer' else doc.page_content[:8000] + '...'}"
-            for doc in research_papers
+            f"Content:\n{content}..."
+            for doc, content in zip(research_papers, contents)
         ])
         
-        if output_format.lower() == "beamer":
+        if self.is_beamer(output_format):
             prompt = f"""
             You are an AI assistant that generates structured LaTeX content for Beamer presentations.
             Use the following research papers as references and format the output as per Format pdf submitted.
@@ -84,7 +321,7 @@ class PromptAgent:
                 {{"heading": "Introduction", "content": ["AI is transforming healthcare.", "Machine learning improves diagnostics."]}},
                 {{"heading": "Challenges", "content": ["Data privacy concerns.", "High computational costs."]}}
             ],
-            "citation": [ {"citation": ""}]
+            "citation": [ {{"citation": ""}}]
 
         }}
 
@@ -148,37 +385,65 @@ class PromptAgent:
         return llm_output.replace("```json", "").replace("```", "")
 
 
-    def get_response(self, research_papers, format_requirements, citations, output_format):
-        """Gets AI-generated LaTeX output using the structured prompt."""
+    @staticmethod
+    def preview_sections(partial):
+        """
+        Reads the title, section headings and bullet points out of a partially streamed
+        response, as parsed so far by IncrementalJSONParser.snapshot().
+
+        :return: Tuple of (title or None, list of (heading, list of content strings)).
+        """
+        if not isinstance(partial, dict):
+            return None, []
+        sections = []
+        for section in partial.get("sections") or []:
+            if isinstance(section, dict) and section.get("heading"):
+                content = section.get("content") or []
+                content = content if isinstance(content, list) else [content]
+                sections.append((str(section["heading"]), [str(item) for item in content]))
+        title = partial.get("title")
+        return (str(title) if title else None), sections
+
+    @staticmethod
+    def _neutral_format_requirements(format_requirements):
+        """Replaces the format PDF with a neutral instruction plus the template's layout fingerprint."""
+        layout = getattr(format_requirements, "page_content", "")  # Document of the template, or a plain string
+        neutral = "This document provides layout guidelines. DO NOT use its content. Only follow its structure."
+        return neutral + "\n" + layout if layout else neutral
+
+    def _prepare_prompt(self, research_papers, format_requirements, citations, output_format, index=None, report=None):
+        """Builds the prompt; returns (prompt, neutral format requirements used to clean the output)."""
         logger.info("Generating prompt for LLM...")
-        
-        # Reset LLM memory (if applicable)
-        self.llm = LLMInterface(self.llm.api_key)  # Reset LLM instance
+        format_requirements = self._neutral_format_requirements(format_requirements)
 
+        prompt = self.generate_prompt(research_papers, format_requirements, citations, output_format, index, report)
+        logger.info(f"Prompt: {prompt}")
+        return prompt, format_requirements
 
-        # Ensure format_requirements is set to a neutral instruction
-        format_requirements = "This document provides layout guidelines. DO NOT use its content. Only follow its structure."
+    def _parse_response(self, llm_output, format_requirements, citations, output_format, parser=None):
+        """
+        Parses the raw LLM output into a structured dictionary, repairing common JSON defects and
+        validating it against the IEEE or Beamer schema.
 
-        prompt = self.generate_prompt(research_papers, format_requirements, citations, output_format)
-        logger.info(f"Prompt: {prompt}")
+        :param parser: IncrementalJSONParser that already consumed the streamed output, if any.
+        """
+        from src.utils.output_schema import validate_output
 
-        logger.info("Sending prompt to LLM...")
-        llm_output = self.llm.generate_text(prompt)
         logger.info(f"Raw LLM output: {llm_output}")
 
-        # Clean the JSON response
-        llm_output = self.clean_llm_json_response(llm_output, format_requirements)
+        # Clean the JSON response (the parser skips the <think> trace and code fences as well)
+        if parser is None or format_requirements.strip() in llm_output:
+            llm_output = self.clean_llm_json_response(llm_output, format_requirements)
+            parser = IncrementalJSONParser()
+            parser.feed(llm_output)
 
-        # Parse the LLM output into a structured dictionary
-        try:
-            structured_output = json.loads(llm_output)  # Assuming the LLM returns JSON
-            if not isinstance(structured_output, dict):
-                raise json.JSONDecodeError("LLM output is not a dictionary.")
+        structured_output = validate_output(parser.result(), self.is_beamer(output_format))
+        if structured_output is not None:
             logger.info("LLM output successfully parsed as JSON.")
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse LLM output as JSON: {e}")
+        else:
+            logger.error("Failed to parse LLM output as JSON.")
             structured_output = {
-                "title": "Generated Report" if output_format.lower() == "ieee" else "Generated Presentation",
+                "title": "Generated Presentation" if self.is_beamer(output_format) else "Generated Report",
                 "author": "AI-generated",
                 "sections": [{"heading": "Generated Content", "content": [llm_output]}],
                 "citations": [{"citation": citations}]
@@ -186,3 +451,292 @@ class PromptAgent:
 
         return structured_output
 
+    def _summary_prompt(self, doc, output_format):
+        """Builds the summarisation prompt of one paper, cut to fit the context window."""
+        words = self.content_budget(output_format).max_tokens * 3 // 4
+        prompt, _ = self.planner.plan(
+            lambda contents: SUMMARY_PROMPT.format(
+                target="Beamer presentation" if self.is_beamer(output_format) else "research report",
+                words=words,
+                title=doc.metadata.get("title", "Unknown"),
+                author=doc.metadata.get("author", "Unknown"),
+                sections=list(doc.metadata.get("sections", {}).keys()),
+                content=contents[0],
+            ),
+            [doc.page_content],
+        )
+        return prompt
+
+    def _summary_key(self, doc, output_format):
+        """Identifies a summary by paper hash, model, summary length and how much of the paper was extracted."""
+        return sha256_hex(json.dumps([
+            doc.metadata.get("hash") or sha256_hex(doc.page_content),
+            self.llm.provider,
+            self.llm.model,
+            self.content_budget(output_format).max_tokens,
+            len(doc.page_content),
+        ]))
+
+    def summarize_paper(self, doc, output_format, use_cache=True, report=None):
+        """
+        Summarises one research paper in about its share of the final prompt (map step).
+        Summaries are cached by paper hash unless use_cache is False.
+        :param report: Optional ResponseReport the call's token usage is added to.
+        """
+        cache = get_cache(SUMMARY_CACHE)
+        key = self._summary_key(doc, output_format)
+        summary = cache.get(key) if use_cache else None
+        if summary is None:
+            logger.info(f"Summarising {doc.metadata.get('source', 'paper')}")
+            summary = self._generate("summary", self._summary_prompt(doc, output_format), use_cache, report).strip()
+            cache.set(key, summary)
+        return summary
+
+    async def asummarize_paper(self, doc, output_format, use_cache=True, report=None):
+        """Async counterpart of summarize_paper."""
+        cache = get_cache(SUMMARY_CACHE)
+        key = self._summary_key(doc, output_format)
+        summary = cache.get(key) if use_cache else None
+        if summary is None:
+            logger.info(f"Summarising {doc.metadata.get('source', 'paper')}")
+            summary = (await self._agenerate("summary", self._summary_prompt(doc, output_format), use_cache, report)).strip()
+            cache.set(key, summary)
+        return summary
+
+    @staticmethod
+    def _as_summary_documents(research_papers, summaries):
+        """Replaces each paper's content with its summary, keeping its metadata, for the reduce step."""
+        return [type(doc)(page_content=summary, metadata=doc.metadata) for doc, summary in zip(research_papers, summaries)]
+
+    @staticmethod
+    def _numbered_papers(research_papers, contents, numbers):
+        """Lists papers under their 1-based numbers, so the outline and section prompts can refer to them."""
+        return "\n\n".join(
+            f"Paper {number}\n"
+            f"Title: {doc.metadata.get('title', 'Unknown')}\n"
+            f"Author: {doc.metadata.get('author', 'Unknown')}\n"
+            f"Content:\n{content}..."
+            for number, doc, content in zip(numbers, research_papers, contents)
+        )
+
+    def _outline_prompt(self, research_papers, format_requirements, output_format, index=None, report=None):
+        """Builds the prompt asking for the title, abstract and section outline of an IEEE report."""
+        format_requirements = self._neutral_format_requirements(format_requirements)
+        prompt, plan = self.planner.plan(
+            lambda contents: OUTLINE_PROMPT.format(
+                papers=self._numbered_papers(research_papers, contents, range(1, len(research_papers) + 1)),
+                format_requirements=format_requirements,
+                min_sections=MIN_SECTIONS,
+                max_sections=MAX_SECTIONS,
+            ),
+            self._paper_contents(research_papers, output_format, index),
+            per_paper_cap=self.content_budget(output_format).max_tokens,
+        )
+        if report is not None:
+            report.plan = plan
+        return prompt
+
+    @staticmethod
+    def _parse_outline(llm_output, paper_count):
+        """Parses the outline response; falls back to the default headings over all papers if it is unusable."""
+        from src.utils.output_schema import validate_outline
+
+        outline = validate_outline(loads_tolerant(llm_output))
+        if outline is None or not outline["sections"]:
+            logger.error("Failed to parse the report outline; using the default sections.")
+            outline = validate_outline({"sections": [{"heading": heading} for heading in DEFAULT_OUTLINE_HEADINGS]})
+        for section in outline["sections"]:
+            # Sections citing no valid paper number draw on all papers
+            papers = [number for number in dict.fromkeys(section["papers"]) if 1 <= number <= paper_count]
+            section["papers"] = papers or list(range(1, paper_count + 1))
+        return outline
+
+    def _section_prompt(self, outline, position, research_papers, output_format, index=None):
+        """
+        Builds the prompt writing one outlined section. With a PassageIndex, the section gets the
+        passages across all papers most relevant to its heading and focus; otherwise the papers
+        the outline assigns to it.
+        """
+        section = outline["sections"][position]
+        numbers = section["papers"]
+        contents = None
+        if index is not None:
+            passages = index.select(
+                [f"{section['heading']} {section['focus']}"], SECTION_CONTEXT_TOKENS, k=TOP_K_PASSAGES
+            )
+            papers = sorted({index.passages[passage_id][0] for passage_id in passages})
+            if papers:
+                numbers = [paper + 1 for paper in papers]
+                contents = [index.excerpt(passages, paper) for paper in papers]
+        docs = [research_papers[number - 1] for number in numbers]
+        prompt, _ = self.planner.plan(
+            lambda contents: SECTION_PROMPT.format(
+                title=outline["title"],
+                abstract=outline["abstract"],
+                outline="\n".join(f"{i}. {s['heading']}: {s['focus']}" for i, s in enumerate(outline["sections"], 1)),
+                heading=section["heading"],
+                focus=section["focus"] or section["heading"],
+                words=REPORT_WORDS // len(outline["sections"]),
+                papers=self._numbered_papers(docs, contents, numbers),
+            ),
+            contents or [doc.page_content for doc in docs],
+            per_paper_cap=self.content_budget(output_format).max_tokens,
+        )
+        return prompt
+
+    @staticmethod
+    def _clean_section(llm_output):
+        """Strips the <think> trace, code fences and a repeated \\section command from a written section."""
+        text = re.sub(r"<think>.*?</think>", "", llm_output, flags=re.DOTALL)
+        text = re.sub(r"^```[a-z]*\s*|```\s*$", "", text.strip())
+        text = re.sub(r"^\\section\*?\{[^}]*\}\s*", "", text.strip())
+        return text.strip()
+
+    def get_sectioned_response(self, research_papers, format_requirements, output_format, use_cache=True, on_partial=None,
+                               index=None, report=None):
+        """
+        Generates an IEEE report in two phases: one short call plans the title, abstract and
+        section outline, then every section is written by its own concurrent call from only
+        the paper context relevant to it (see _section_prompt). The report takes about as long
+        as the outline plus the slowest section, and a failed section does not lose the others.
+
+        :param index: Optional PassageIndex of the papers to draw each section's passages from.
+        :param report: Optional ResponseReport to record the outline's token plan and every call's usage in.
+        :param on_partial: Optional callback called with a SectionedDraft once the outline is
+                           ready and after every section. An exception raised by it cancels
+                           the sections not yet started.
+        :return: The report (see SectionedDraft.result).
+        """
+        logger.info("Requesting the report outline...")
+        outline_output = self._generate(
+            "outline", self._outline_prompt(research_papers, format_requirements, output_format, index, report), use_cache,
+            report
+        )
+        draft = SectionedDraft(self._parse_outline(outline_output, len(research_papers)))
+        if on_partial is not None:
+            on_partial(draft)
+
+        def write(position):
+            prompt = self._section_prompt(draft.outline, position, research_papers, output_format, index)
+            return self._generate("section", prompt, use_cache, report)
+
+        sections = draft.outline["sections"]
+        logger.info(f"Writing {len(sections)} section(s) concurrently")
+        with ThreadPoolExecutor(max_workers=min(len(sections), MAX_CONCURRENT_REQUESTS)) as pool:
+            futures = {pool.submit(write, position): position for position in range(len(sections))}
+            try:
+                for future in as_completed(futures):
+                    position = futures[future]
+                    try:
+                        draft.contents[position] = self._clean_section(future.result())
+                    except Exception as e:
+                        logger.error(f"Failed to write section {sections[position]['heading']}: {e}")
+                    if on_partial is not None:
+                        on_partial(draft)
+            except BaseException:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        return draft.result()
+
+    async def aget_sectioned_response(self, research_papers, format_requirements, output_format, use_cache=True, index=None,
+                                      report=None):
+        """Async counterpart of get_sectioned_response."""
+        outline_output = await self._agenerate(
+            "outline", self._outline_prompt(research_papers, format_requirements, output_format, index, report), use_cache,
+            report
+        )
+        draft = SectionedDraft(self._parse_outline(outline_output, len(research_papers)))
+
+        async def write(position):
+            prompt = self._section_prompt(draft.outline, position, research_papers, output_format, index)
+            return await self._agenerate("section", prompt, use_cache, report)
+
+        sections = draft.outline["sections"]
+        results = await asyncio.gather(*(write(position) for position in range(len(sections))), return_exceptions=True)
+        for position, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to write section {sections[position]['heading']}: {result}")
+            else:
+                draft.contents[position] = self._clean_section(result)
+        return draft.result()
+
+    def get_response(self, research_papers, format_requirements, citations, output_format, use_cache=True, map_reduce=False,
+                     on_partial=None, sectioned=False, report=None):
+        """
+        Gets AI-generated LaTeX output using the structured prompt.
+        Identical requests are answered from the LLM response cache unless use_cache is False.
+        Every call is held to its task's output budget (see OUTPUT_BUDGETS).
+
+        :param report: Optional ResponseReport receiving the prompt's token plan and the tokens
+                       each LLM call spent on reasoning and on the payload.
+
+        :param on_partial: Optional callback that streams the response: it is called with the
+                           IncrementalJSONParser consuming it after every chunk (its snapshot()
+                           is the output so far, see preview_sections). An exception raised by
+                           it cancels the request.
+
+        :param map_reduce: Summarise every paper in its own concurrent call first, then merge
+                           the summaries into the output structure with one final call. Pass
+                           whole papers: nothing past the per-paper budget is lost this way.
+        :param sectioned: Write IEEE reports section by section (see get_sectioned_response);
+                          on_partial then receives a SectionedDraft. Ignored for Beamer.
+        """
+        if map_reduce and research_papers:
+            with ThreadPoolExecutor(max_workers=min(len(research_papers), MAX_CONCURRENT_REQUESTS)) as pool:
+                summaries = list(pool.map(
+                    lambda doc: self.summarize_paper(doc, output_format, use_cache, report), research_papers
+                ))
+            research_papers = self._as_summary_documents(research_papers, summaries)
+        # Summaries are short enough to send whole; otherwise passages are picked by relevance
+        index = None if map_reduce else self.build_index(research_papers, use_cache)
+
+        if sectioned and not self.is_beamer(output_format) and research_papers:
+            return self.get_sectioned_response(
+                research_papers, format_requirements, output_format, use_cache, on_partial, index, report
+            )
+
+        prompt, format_requirements = self._prepare_prompt(
+            research_papers, format_requirements, citations, output_format, index, report
+        )
+
+        logger.info("Sending prompt to LLM...")
+        parser = None
+        if on_partial is None:
+            llm_output = self._generate(self.output_task(output_format), prompt, use_cache, report)
+        else:
+            received = []  # Joined once at the end; appending to a string would copy it on every chunk
+            parser = IncrementalJSONParser()
+            # closing() ends the provider stream at once if on_partial cancels
+            with closing(self._stream(self.output_task(output_format), prompt, use_cache, report)) as chunks:
+                for chunk in chunks:
+                    received.append(chunk)
+                    parser.feed(chunk)
+                    on_partial(parser)
+            llm_output = "".join(received)
+        return self._parse_response(llm_output, format_requirements, citations, output_format, parser)
+
+    async def aget_response(self, research_papers, format_requirements, citations, output_format, use_cache=True, map_reduce=False,
+                            sectioned=False, report=None):
+        """
+        Async counterpart of get_response; many jobs can await it on one event loop, and on one
+        PromptAgent, bounded by LLMInterface's concurrency limit.
+        """
+        if map_reduce and research_papers:
+            summaries = await asyncio.gather(*(
+                self.asummarize_paper(doc, output_format, use_cache, report) for doc in research_papers
+            ))
+            research_papers = self._as_summary_documents(research_papers, summaries)
+        index = None if map_reduce else self.build_index(research_papers, use_cache)
+
+        if sectioned and not self.is_beamer(output_format) and research_papers:
+            return await self.aget_sectioned_response(
+                research_papers, format_requirements, output_format, use_cache, index, report
+            )
+
+        prompt, format_requirements = self._prepare_prompt(
+            research_papers, format_requirements, citations, output_format, index, report
+        )
+
+        logger.info("Sending prompt to LLM...")
+        llm_output = await self._agenerate(self.output_task(output_format), prompt, use_cache, report)
+        return self._parse_response(llm_output, format_requirements, citations, output_format)
@@ -93,7 +93,7 @@ class ReportGenerationAgent:
             ])
 
         latex_sections = "\n".join(
-            f"\\section{{{section['heading']}}}\n{section['content']}" for section in sections
+            f"\\section{{{section['heading']}}}\n{self._section_body(section)}" for section in sections
         )
 
         return f"""
@@ -121,6 +121,17 @@ class ReportGenerationAgent:
     """.strip()
 
 
+    @staticmethod
+    def _section_body(section):
+        """
+        Returns the LaTeX body of a report section. Sections written separately (see
+        PromptAgent.get_sectioned_response) may have failed; they keep their outline focus.
+        """
+        content = section.get("content")
+        if content is not None:
+            return content
+        return f"% Generation of this section failed; its planned focus follows.\n{section.get('focus', '')}"
+
     def _generate_introduction(self):
         """Concise Introduction section."""
         return """Multi-agent systems (MAS) and large language models (LLMs) play key roles in automation and decision-making. 
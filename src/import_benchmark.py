@@ -0,0 +1,98 @@
+#import_benchmark.py
+"""
+Measures the cold start of the application: each sample runs in a fresh interpreter, so
+nothing is imported or cached yet.
+
+    python -m src.import_benchmark [--runs 5] [--top 10] [--json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Project root; the samples run from it so that app.py and the src package are found.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Code timed in each fresh interpreter.
+SCENARIOS = {
+    "pipeline": "from src.pipeline import ProcessingPipeline\nProcessingPipeline('benchmark')",
+    # Runs the Streamlit script in bare mode: it imports its modules and renders the empty page once
+    "app": "import runpy\nrunpy.run_path('app.py', run_name='__main__')",
+}
+
+
+def _environment():
+    """Environment of the samples: the caller's, with the project on the path and Streamlit's bare-mode logging muted."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    env.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    return env
+
+
+def time_scenario(code, runs=5):
+    """
+    Runs code in runs fresh interpreters.
+    :return: List of the wall-clock seconds of each run, interpreter start-up included.
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=_environment(), check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def slowest_imports(code, top=10):
+    """
+    Runs code once under -X importtime.
+    :return: The top modules by cumulative import time, as (module, milliseconds) pairs.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=_environment(),
+                            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        # Nested imports are indented by two more spaces per level; only top-level ones are kept, so a
+        # package's time is not counted again for each module it imports
+        if len(module) - len(module.lstrip()) == 1:
+            imports.append((module.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: -item[1])[:top]
+
+
+def run(runs=5, top=10):
+    """
+    :return: Dictionary per scenario with its "median" and "samples" in seconds and its "imports",
+             the slowest top-level imports in milliseconds.
+    """
+    results = {}
+    for name, code in SCENARIOS.items():
+        samples = time_scenario(code, runs)
+        results[name] = {
+            "median": statistics.median(samples),
+            "samples": samples,
+            "imports": slowest_imports(code, top),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of app.py and ProcessingPipeline")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per scenario")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON, e.g. to track them over time")
+    args = parser.parse_args()
+
+    results = run(args.runs, args.top)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            print(f"{name}: median {result['median'] * 1000:.0f} ms over {len(result['samples'])} run(s)")
+            for module, milliseconds in result["imports"]:
+                print(f"    {milliseconds:8.1f} ms  {module}")
@@ -0,0 +1,173 @@
+#client_registry.py
+import os
+import asyncio
+import hashlib
+import logging
+import importlib
+import threading
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Connection pool limits shared by every client of a provider; override through the environment.
+MAX_CONNECTIONS = int(os.getenv("BIBTEX_AI_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("BIBTEX_AI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("BIBTEX_AI_KEEPALIVE_EXPIRY", "30"))
+REQUEST_TIMEOUT = float(os.getenv("BIBTEX_AI_REQUEST_TIMEOUT", "120"))
+
+# Chat model classes by provider name, as "module:class"; each SDK is imported when its first client is created.
+PROVIDERS = {
+    "groq": "langchain_groq:ChatGroq",
+}
+
+_lock = threading.Lock()
+_http_clients = {}  # provider -> httpx.Client
+_chat_clients = {}  # (provider, model, credentials fingerprint, options) -> chat model
+# Async connections and semaphores belong to the event loop they were created on, so they are kept per loop.
+_loop_state = weakref.WeakKeyDictionary()  # event loop -> {"http": {}, "chat": {}, "limiters": {}}
+
+
+def _fingerprint(api_key):
+    """Identifies credentials in registry keys without keeping the key itself in them."""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+def _chat_model_class(provider):
+    module, _, name = PROVIDERS[provider].partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def http_limits():
+    """Returns the httpx connection limits used for the pooled provider clients."""
+    import httpx
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_client(provider):
+    """Returns the process-wide pooled HTTP client of a provider, creating it on first use."""
+    import httpx
+    with _lock:
+        client = _http_clients.get(provider)
+        if client is None or client.is_closed:
+            client = httpx.Client(limits=http_limits(), timeout=REQUEST_TIMEOUT)
+            _http_clients[provider] = client
+        return client
+
+
+def _current_loop_state():
+    loop = asyncio.get_running_loop()
+    with _lock:
+        state = _loop_state.get(loop)
+        if state is None:
+            state = {"http": {}, "chat": {}, "limiters": {}}
+            _loop_state[loop] = state
+        return state
+
+
+def get_chat_model(provider, model, api_key, **options):
+    """
+    Returns the shared chat model for a provider, model and set of credentials.
+
+    Chat models hold no conversation state (every call sends its own message list), so
+    one instance per key is safely shared by all jobs and threads, and all of them reuse
+    the provider's pooled keep-alive connections.
+
+    :param provider: Provider name, a key of PROVIDERS.
+    :param model: Model name.
+    :param api_key: API key of the provider.
+    :param options: Further constructor arguments, e.g. temperature; part of the registry key.
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    key = (provider, model, _fingerprint(api_key), tuple(sorted(options.items())))
+    with _lock:
+        chat_model = _chat_clients.get(key)
+    if chat_model is not None:
+        return chat_model
+
+    http_client = get_http_client(provider)
+    chat_model_class = _chat_model_class(provider)
+    with _lock:
+        chat_model = _chat_clients.get(key)
+        if chat_model is None:
+            logger.info(f"Creating shared {provider} client for {model}")
+            chat_model = chat_model_class(
+                model=model,
+                api_key=api_key,
+                http_client=http_client,
+                **options,
+            )
+            _chat_clients[key] = chat_model
+        return chat_model
+
+
+def get_async_http_client(provider):
+    """Returns the pooled httpx.AsyncClient of a provider on the running event loop. Must be called from a coroutine."""
+    import httpx
+    clients = _current_loop_state()["http"]
+    client = clients.get(provider)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=http_limits(), timeout=REQUEST_TIMEOUT)
+        clients[provider] = client
+    return client
+
+
+def get_async_chat_model(provider, model, api_key, **options):
+    """
+    Async counterpart of get_chat_model for the running event loop: one chat model per
+    provider, model and credentials on each loop, sharing a pooled httpx.AsyncClient.
+    Must be called from a coroutine.
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    state = _current_loop_state()
+    key = (provider, model, _fingerprint(api_key), tuple(sorted(options.items())))
+    chat_model = state["chat"].get(key)
+    if chat_model is None:
+        http_client = get_async_http_client(provider)
+        logger.info(f"Creating shared async {provider} client for {model}")
+        chat_model = _chat_model_class(provider)(
+            model=model,
+            api_key=api_key,
+            http_client=get_http_client(provider),
+            http_async_client=http_client,
+            **options,
+        )
+        state["chat"][key] = chat_model
+    return chat_model
+
+
+def async_limiter(name, limit):
+    """
+    Returns the semaphore bounding concurrent async requests to a service on the running
+    event loop. Every job on the loop shares it, so one loop can drive many papers and
+    jobs without exceeding the limit.
+    """
+    limiters = _current_loop_state()["limiters"]
+    semaphore = limiters.get(name)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(limit)
+        limiters[name] = semaphore
+    return semaphore
+
+
+async def aclose_clients():
+    """Closes the pooled async HTTP clients of the running event loop."""
+    state = _current_loop_state()
+    for client in state["http"].values():
+        await client.aclose()
+    state["http"].clear()
+    state["chat"].clear()
+
+
+def close_clients():
+    """Closes every pooled HTTP client and forgets the shared chat models (e.g. at shutdown)."""
+    with _lock:
+        for client in _http_clients.values():
+            client.close()
+        _http_clients.clear()
+        _chat_clients.clear()
@@ -1,43 +1,157 @@
 #llm_interface.py
-from langchain.schema import HumanMessage
 import os
-from tenacity import retry, wait_exponential, stop_after_attempt
-from langchain_groq import ChatGroq
-from dotenv import load_dotenv
+import logging
+from contextlib import closing
+from src.llm.output_budget import OutputMeter, ReasoningBudgetExceeded, suppress_reasoning
+from src.llm.providers import MAX_CONCURRENT_REQUESTS, ProviderRouter, build_providers, load_environment
 
-# Load environment variables
-load_dotenv()
+# Providers to route between, best first, unless BIBTEX_AI_LLM_PROVIDERS (read when an LLMInterface is created)
+# says otherwise; e.g. "groq,openai" adds the OpenAI-compatible server as fallback.
+DEFAULT_PROVIDERS = "groq:deepseek-r1-distill-llama-70b"
+DEFAULT_PARAMS = {"temperature": 0}
+
+logger = logging.getLogger(__name__)
 
 class LLMInterface:
-    def __init__(self, api_key=None):
-        self.api_key = api_key
-        self.llm = ChatGroq(
-        model="deepseek-r1-distill-llama-70b",
-        temperature=0,
-        api_key=os.getenv("GROQ")
-    
-    # other params...
-)
+    def __init__(self, api_key=None, providers=None, params=None):
+        """
+        :param api_key: Groq API key; defaults to the GROQ environment variable.
+        :param providers: Provider spec string (see build_providers); defaults to BIBTEX_AI_LLM_PROVIDERS
+                          or DEFAULT_PROVIDERS.
+        :param params: Generation parameters; defaults to DEFAULT_PARAMS.
+        """
+        load_environment()
+        providers = providers or os.getenv("BIBTEX_AI_LLM_PROVIDERS", DEFAULT_PROVIDERS)
+        self.params = DEFAULT_PARAMS if params is None else params
+        self.router = ProviderRouter(build_providers(providers, {"groq": api_key}, **self.params))
+        # Identify the route in response cache keys
+        self.provider = self.router.name
+        self.model = self.router.model
 
-    @retry(wait=wait_exponential(multiplier=1, min=4, max=10), stop=stop_after_attempt(5))
-    def generate_text(self, prompt):
-        response = self.llm.invoke([HumanMessage(content=prompt)])
-        
-        return response.content
+    def generate_text(self, prompt, budget=None, on_usage=None):
+        """
+        Generates text using the LLM based on the given prompt. Rate limits and transient
+        failures are retried, slow calls hedged and failing providers failed over.
 
+        With an OutputBudget the request carries its max_tokens limit and only the payload is
+        returned, without the <think> trace. Budgets that abandon overlong traces are read as a
+        stream (see stream_text); those calls are not hedged.
 
-    def generate_text(self, prompt):
+        :param prompt: Input prompt string.
+        :param budget: Optional OutputBudget of the task (see get_budget).
+        :param on_usage: Optional callback receiving the reasoning and payload token counts of a budgeted call.
+        :return: AI-generated response.
+        """
+        if budget is None:
+            return self.router.generate(prompt)
+        if budget.abandon_traces:
+            return "".join(self.stream_text(prompt, budget, on_usage))
+        meter = OutputMeter(budget)
+        response = meter.feed(self.router.generate(prompt, budget.max_tokens)) + meter.finish()
+        self._report(meter, on_usage)
+        return response
+
+    def stream_text(self, prompt, budget=None, on_usage=None):
         """
-        Generates text using the LLM based on the given prompt.
+        Streams the response to a prompt from the provider's streaming API.
+        Closing the generator early abandons the request.
+
+        With an OutputBudget the <think> trace is withheld. If the budget abandons traces, once
+        the trace outgrows its allowance the stream is closed and the prompt sent again, asking
+        for the answer without reasoning; the max_tokens limit still bounds that second response.
 
         :param prompt: Input prompt string.
+        :param budget: Optional OutputBudget of the task.
+        :param on_usage: Optional callback receiving the reasoning and payload token counts of a budgeted call.
+        :return: Generator of response text chunks.
+        """
+        if budget is None:
+            yield from self.router.stream(prompt)
+            return
+        meter = OutputMeter(budget)
+        try:
+            yield from self._metered(self.router.stream(prompt, budget.max_tokens), meter)
+        except ReasoningBudgetExceeded as e:
+            abandoned = meter.reasoning_tokens
+            logger.warning(f"{e}; asking again without reasoning")
+            meter = OutputMeter(budget, limit_reasoning=False)
+            yield from self._metered(self.router.stream(suppress_reasoning(prompt), budget.max_tokens), meter)
+            meter.abandoned_tokens = abandoned
+        self._report(meter, on_usage)
+
+    async def agenerate_text(self, prompt, budget=None, on_usage=None):
+        """
+        Async counterpart of generate_text. Requests beyond MAX_CONCURRENT_REQUESTS to a
+        provider on the running event loop wait for a free slot.
+
+        :param prompt: Input prompt string.
+        :param budget: Optional OutputBudget of the task.
+        :param on_usage: Optional callback receiving the reasoning and payload token counts of a budgeted call.
         :return: AI-generated response.
         """
-        response = self.llm.invoke([HumanMessage(content=prompt)])
+        if budget is None:
+            return await self.router.agenerate(prompt)
+        if budget.abandon_traces:
+            return "".join([chunk async for chunk in self.astream_text(prompt, budget, on_usage)])
+        meter = OutputMeter(budget)
+        response = meter.feed(await self.router.agenerate(prompt, budget.max_tokens)) + meter.finish()
+        self._report(meter, on_usage)
+        return response
+
+    async def astream_text(self, prompt, budget=None, on_usage=None):
+        """Async counterpart of stream_text."""
+        if budget is None:
+            async for chunk in self.router.astream(prompt):
+                yield chunk
+            return
+        meter = OutputMeter(budget)
+        try:
+            async for chunk in self._ametered(self.router.astream(prompt, budget.max_tokens), meter):
+                yield chunk
+        except ReasoningBudgetExceeded as e:
+            abandoned = meter.reasoning_tokens
+            logger.warning(f"{e}; asking again without reasoning")
+            meter = OutputMeter(budget, limit_reasoning=False)
+            async for chunk in self._ametered(self.router.astream(suppress_reasoning(prompt), budget.max_tokens), meter):
+                yield chunk
+            meter.abandoned_tokens = abandoned
+        self._report(meter, on_usage)
+
+    @staticmethod
+    def _metered(chunks, meter):
+        """Passes on the payload of a stream; the stream is closed at once if the meter aborts it."""
+        with closing(chunks):
+            for chunk in chunks:
+                payload = meter.feed(chunk)
+                if payload:
+                    yield payload
+        rest = meter.finish()
+        if rest:
+            yield rest
+
+    @staticmethod
+    async def _ametered(chunks, meter):
+        try:
+            async for chunk in chunks:
+                payload = meter.feed(chunk)
+                if payload:
+                    yield payload
+        finally:
+            await chunks.aclose()
+        rest = meter.finish()
+        if rest:
+            yield rest
 
-        return response.content
+    def _report(self, meter, on_usage):
+        usage = meter.usage()
+        logger.info(
+            f"{usage['task']} output: {usage['reasoning_tokens']} reasoning and {usage['payload_tokens']} payload tokens"
+            + (f", {usage['abandoned_tokens']} in an abandoned trace" if usage["abandoned_tokens"] else "")
+        )
+        if on_usage is not None:
+            on_usage(usage)
 
 # Example Usage:
 if __name__ == "__main__":
     llm_interface = LLMInterface("test_api_key")
-    response = llm_interface.generate_text("Write a summary of AI applications in healthcare.")
\ No newline at end of file
+    response = llm_interface.generate_text("Write a summary of AI applications in healthcare.")
@@ -0,0 +1,175 @@
+#local_server.py
+"""
+Local stand-in for an LLM provider: a minimal OpenAI-compatible /v1/chat/completions server
+with configurable latency, failures and payloads, for testing failover and measuring
+throughput offline.
+
+    python -m src.llm.local_server --port 8000 --latency 0.5 --jitter 0.2 --error-rate 0.1
+    BIBTEX_AI_LLM_PROVIDERS=groq,openai BIBTEX_AI_OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python -m src.pipeline
+"""
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Response used when no payload file is given: a minimal report in the structure the IEEE prompt asks for.
+DEFAULT_PAYLOAD = json.dumps({
+    "title": "Stand-in Report",
+    "author": "Local Server",
+    "abstract": "Generated by the local stand-in server.",
+    "sections": [{"heading": "Introduction", "content": "Stand-in content."}],
+})
+# Characters per streamed chunk.
+STREAM_CHUNK_CHARS = 16
+
+
+class StandInConfig:
+    """
+    Behaviour of the stand-in server; attributes may be changed while it runs.
+
+    :param latency: Seconds before each response starts.
+    :param jitter: Extra random latency, up to this many seconds.
+    :param error_rate: Share of requests answered with error_status.
+    :param error_status: HTTP status of failed requests (429 responses carry a Retry-After header).
+    :param retry_after: Retry-After seconds sent with 429 responses.
+    :param payload: Response text.
+    :param chunk_delay: Seconds between streamed chunks.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500, retry_after=1,
+                 payload=DEFAULT_PAYLOAD, chunk_delay=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.payload = payload
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like real providers
+    disable_nagle_algorithm = True  # Headers and body are written separately
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": "local", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        number = self.config.count()
+        time.sleep(self.config.latency + random.uniform(0, self.config.jitter))
+        if random.random() < self.config.error_rate:
+            status = self.config.error_status
+            headers = {"Retry-After": str(self.config.retry_after)} if status == 429 else {}
+            self._send_json(status, {"error": {"message": f"Stand-in failure for request {number}"}}, headers)
+            return
+
+        model = body.get("model", "local")
+        if body.get("stream"):
+            self._stream(model)
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.config.payload}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def _stream(self, model):
+        """Sends the payload as server-sent events, STREAM_CHUNK_CHARS characters at a time."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        payload = self.config.payload
+        self.close_connection = True
+        try:
+            for start in range(0, len(payload), STREAM_CHUNK_CHARS):
+                chunk = {"object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": payload[start:start + STREAM_CHUNK_CHARS]}}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(self.config.chunk_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug("Client abandoned the stream")
+
+
+def start_server(host="127.0.0.1", port=0, config=None):
+    """
+    Starts a stand-in server in a daemon thread.
+
+    :param port: Port to listen on; 0 picks a free one.
+    :return: The server; its base URL is f"http://{host}:{server.server_port}/v1", its settings
+             are server.config, and server.shutdown() stops it.
+    """
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.daemon_threads = True
+    server.config = config or StandInConfig()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of failed requests")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds of 429 responses")
+    parser.add_argument("--payload", help="file whose content is returned as the response")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    payload = DEFAULT_PAYLOAD
+    if args.payload:
+        with open(args.payload, encoding="utf-8") as f:
+            payload = f.read()
+    config = StandInConfig(args.latency, args.jitter, args.error_rate, args.error_status, args.retry_after, payload, args.chunk_delay)
+    server = ThreadingHTTPServer((args.host, args.port), StandInHandler)
+    server.config = config
+    logger.info(f"Stand-in LLM server listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,161 @@
+#output_budget.py
+import os
+import logging
+from src.utils.prompt_budget import OUTPUT_RESERVE, count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Payload tokens and <think> trace allowance of each task, in tokens. The request's max_tokens is their sum, so the
+# report's stays within the OUTPUT_RESERVE its prompt leaves free. None leaves no room for a trace (models that do
+# not reason in their output).
+OUTPUT_BUDGETS = {
+    "report": (OUTPUT_RESERVE - 2048, 2048),
+    "beamer": (3072, 1536),
+    "outline": (1024, 1024),
+    "section": (1536, 768),
+    "summary": (2560, 512),
+    "citations": (4096, None),
+}
+# Caps the trace allowance of every task, e.g. 0 to re-ask without reasoning as soon as a trace starts.
+REASONING_CAP = os.getenv("BIBTEX_AI_REASONING_TOKENS")
+# Abandons a response whose trace outgrows its allowance and asks again without reasoning. Off by default: the
+# re-ask repeats the whole call, and reading every response as a stream to watch the trace takes it out of hedging.
+ABANDON_TRACES = os.getenv("BIBTEX_AI_ABANDON_TRACES", "").lower() in ("1", "true", "yes") or REASONING_CAP is not None
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+SUPPRESS_REASONING = """
+
+Answer directly. Do not think step by step and do not write a <think> section: start your response with the answer itself."""
+
+
+class ReasoningBudgetExceeded(RuntimeError):
+    """Raised while reading a response whose <think> trace has outgrown the task's allowance."""
+
+
+class OutputBudget:
+    """
+    Output limits of one kind of LLM call.
+
+    :param task: Task name, as in OUTPUT_BUDGETS.
+    :param payload_tokens: Tokens the answer itself may take.
+    :param reasoning_tokens: Tokens set aside for the <think> trace; None for none.
+    :param abandon_traces: Abandon the response once its trace outgrows reasoning_tokens (see ABANDON_TRACES).
+    """
+
+    def __init__(self, task, payload_tokens, reasoning_tokens=None, abandon_traces=False):
+        self.task = task
+        self.payload_tokens = payload_tokens
+        self.reasoning_tokens = reasoning_tokens
+        self.abandon_traces = abandon_traces and reasoning_tokens is not None
+
+    @property
+    def max_tokens(self):
+        """Hard limit on generated tokens sent with the request; the trace counts towards it."""
+        return self.payload_tokens + (self.reasoning_tokens or 0)
+
+    def cache_params(self, params):
+        """Adds the limits to the generation parameters identifying a request in response cache keys."""
+        return {**params, "max_tokens": self.max_tokens, "reasoning_tokens": self.reasoning_tokens}
+
+
+def get_budget(task):
+    """Returns the OutputBudget of a task in OUTPUT_BUDGETS, with the trace allowance capped by REASONING_CAP."""
+    payload_tokens, reasoning_tokens = OUTPUT_BUDGETS[task]
+    if REASONING_CAP and reasoning_tokens is not None:
+        reasoning_tokens = min(int(REASONING_CAP), reasoning_tokens)
+    return OutputBudget(task, payload_tokens, reasoning_tokens, ABANDON_TRACES)
+
+
+def suppress_reasoning(prompt):
+    """Appends the instruction to answer without a <think> trace, for re-asking after a trace ran over."""
+    return prompt + SUPPRESS_REASONING
+
+
+class OutputMeter:
+    """
+    Reads a response chunk by chunk, passing on its payload and withholding the leading <think>
+    trace of reasoning models, while counting the tokens of each.
+
+    feed raises ReasoningBudgetExceeded once the trace outgrows the budget's allowance, so the
+    caller can abandon the stream instead of paying for the rest of the trace.
+    """
+
+    def __init__(self, budget, limit_reasoning=True):
+        """
+        :param budget: OutputBudget of the call.
+        :param limit_reasoning: Set to False to only count the trace, e.g. when re-asking after an abandoned one.
+        """
+        self.budget = budget
+        self.limit = budget.reasoning_tokens if limit_reasoning and budget.abandon_traces else None
+        self.reasoning_tokens = 0
+        self.payload_tokens = 0
+        self.abandoned_tokens = 0  # Trace tokens of an earlier response abandoned for running over
+        # "start" until the response shows whether it opens with a trace, then "reasoning", then "answer" until the
+        # payload's first non-blank character, then "payload"
+        self._state = "start"
+        self._buffer = ""
+
+    def feed(self, chunk):
+        """
+        :return: The payload text of the chunk (possibly empty).
+        :raises ReasoningBudgetExceeded: If the trace has outgrown its allowance.
+        """
+        self._buffer += chunk
+        payload = ""
+        while self._buffer:
+            if self._state == "start":
+                text = self._buffer.lstrip()
+                if text.startswith(THINK_OPEN):
+                    self._state = "reasoning"
+                    self._buffer = text[len(THINK_OPEN):]
+                elif THINK_OPEN.startswith(text):
+                    break  # Too short to tell yet
+                else:
+                    self._state = "answer"
+            elif self._state == "reasoning":
+                end = self._buffer.find(THINK_CLOSE)
+                if end < 0:
+                    # Keep a possibly split closing tag for the next chunk
+                    keep = len(THINK_CLOSE) - 1
+                    self.reasoning_tokens += count_tokens(self._buffer[:-keep])
+                    self._buffer = self._buffer[-keep:]
+                    if self.limit is not None and self.reasoning_tokens > self.limit:
+                        raise ReasoningBudgetExceeded(
+                            f"{self.budget.task} reasoning trace exceeded its {self.limit}-token allowance"
+                        )
+                    break
+                self.reasoning_tokens += count_tokens(self._buffer[:end])
+                self._buffer = self._buffer[end + len(THINK_CLOSE):]
+                self._state = "answer"
+            elif self._state == "answer":
+                self._buffer = self._buffer.lstrip()
+                if self._buffer:
+                    self._state = "payload"
+            else:
+                payload += self._buffer
+                self._buffer = ""
+        self.payload_tokens += count_tokens(payload) if payload else 0
+        return payload
+
+    def finish(self):
+        """Returns the payload still held back at the end of the response; an unclosed trace is dropped."""
+        rest, self._buffer = self._buffer, ""
+        if self._state == "reasoning":
+            self.reasoning_tokens += count_tokens(rest)
+            logger.warning(f"{self.budget.task} response ended inside its reasoning trace")
+            return ""
+        if self._state != "payload":
+            rest = rest.strip()
+        self.payload_tokens += count_tokens(rest) if rest else 0
+        return rest
+
+    def usage(self):
+        """:return: Dictionary with the "task" and its "reasoning_tokens", "payload_tokens" and "abandoned_tokens"."""
+        return {
+            "task": self.budget.task,
+            "reasoning_tokens": self.reasoning_tokens,
+            "payload_tokens": self.payload_tokens,
+            "abandoned_tokens": self.abandoned_tokens,
+        }
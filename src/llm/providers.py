@@ -0,0 +1,373 @@
+#providers.py
+import os
+import json
+import logging
+import threading
+import functools
+from src.llm.client_registry import (
+    async_limiter, get_async_chat_model, get_async_http_client, get_chat_model, get_http_client
+)
+from src.llm.resilience import get_caller
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of async requests in flight at once to one provider on an event loop, across all jobs.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("BIBTEX_AI_MAX_CONCURRENT_LLM_REQUESTS", "8"))
+# Attempts a provider gets before the router fails over to the next one.
+FAILOVER_ATTEMPTS = 2
+# Providers failing more than this share of recent calls are only used when no healthy one is left.
+MAX_ERROR_RATE = 0.5
+# Endpoint and model of the OpenAI-compatible provider, e.g. the local stand-in server (src/llm/local_server.py).
+OPENAI_BASE_URL = os.getenv("BIBTEX_AI_OPENAI_BASE_URL", "http://127.0.0.1:8000/v1")
+OPENAI_MODEL = os.getenv("BIBTEX_AI_OPENAI_MODEL", "local")
+
+
+class ProviderUnavailableError(RuntimeError):
+    """Raised when none of the configured providers has the credentials it needs."""
+
+
+@functools.lru_cache(maxsize=None)
+def load_environment():
+    """Loads a .env file into the environment once, when the first provider looks up its credentials."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def _messages(prompt):
+    from langchain_core.messages import HumanMessage
+    return [HumanMessage(content=prompt)]
+
+
+class Provider:
+    """
+    An LLM backend: sends a prompt as a single user message and returns the response text.
+
+    Subclasses implement _generate, _agenerate and, if the API can stream, stream and _astream. Every call
+    takes an optional max_tokens limit on the generated tokens. Async calls are bounded
+    by MAX_CONCURRENT_REQUESTS per provider on the running event loop; retries, hedging and the
+    circuit breaker are applied by the provider's ResilientCaller.
+    """
+    name = None
+    default_model = None
+    api_key_env = None  # Environment variable holding the API key, if the provider needs one
+
+    def __init__(self, model=None, api_key=None, **params):
+        load_environment()
+        self.model = model or self.default_model
+        self.api_key = api_key or (os.getenv(self.api_key_env) if self.api_key_env else None)
+        self.params = params
+        self.caller = get_caller(self.endpoint)
+
+    @property
+    def endpoint(self):
+        """Identifies the service whose latency, errors and circuit are tracked together."""
+        return self.name
+
+    @property
+    def available(self):
+        """False if the provider needs an API key and none is set."""
+        return bool(self.api_key) or not self.api_key_env
+
+    def generate(self, prompt, max_tokens=None):
+        return self._generate(prompt, max_tokens)
+
+    async def agenerate(self, prompt, max_tokens=None):
+        async with async_limiter(self.name, MAX_CONCURRENT_REQUESTS):
+            return await self._agenerate(prompt, max_tokens)
+
+    def stream(self, prompt, max_tokens=None):
+        """Yields the response in chunks; providers without a streaming API yield it in one piece."""
+        yield self._generate(prompt, max_tokens)
+
+    async def astream(self, prompt, max_tokens=None):
+        """Async counterpart of stream; the request holds a concurrency slot until the stream ends."""
+        async with async_limiter(self.name, MAX_CONCURRENT_REQUESTS):
+            async for chunk in self._astream(prompt, max_tokens):
+                yield chunk
+
+    def _generate(self, prompt, max_tokens=None):
+        raise NotImplementedError
+
+    async def _agenerate(self, prompt, max_tokens=None):
+        raise NotImplementedError
+
+    async def _astream(self, prompt, max_tokens=None):
+        yield await self._agenerate(prompt, max_tokens)
+
+
+class GroqProvider(Provider):
+    """Groq's chat API through the shared LangChain ChatGroq clients."""
+    name = "groq"
+    default_model = "deepseek-r1-distill-llama-70b"
+    api_key_env = "GROQ"
+    # Retries are left to the ResilientCaller so backoff, hedging and the circuit breaker see every attempt.
+    client_options = {"max_retries": 0}
+
+    @staticmethod
+    def _options(max_tokens):
+        # Per-call options, so one shared client serves every output limit
+        return {"max_tokens": max_tokens} if max_tokens else {}
+
+    def _generate(self, prompt, max_tokens=None):
+        llm = get_chat_model(self.name, self.model, self.api_key, **self.params, **self.client_options)
+        return llm.invoke(_messages(prompt), **self._options(max_tokens)).content
+
+    async def _agenerate(self, prompt, max_tokens=None):
+        llm = get_async_chat_model(self.name, self.model, self.api_key, **self.params, **self.client_options)
+        response = await llm.ainvoke(_messages(prompt), **self._options(max_tokens))
+        return response.content
+
+    def stream(self, prompt, max_tokens=None):
+        llm = get_chat_model(self.name, self.model, self.api_key, **self.params, **self.client_options)
+        for chunk in llm.stream(_messages(prompt), **self._options(max_tokens)):
+            if chunk.content:
+                yield chunk.content
+
+    async def _astream(self, prompt, max_tokens=None):
+        llm = get_async_chat_model(self.name, self.model, self.api_key, **self.params, **self.client_options)
+        async for chunk in llm.astream(_messages(prompt), **self._options(max_tokens)):
+            if chunk.content:
+                yield chunk.content
+
+
+class GeminiProvider(Provider):
+    """Google's Gemini API; the SDK is imported and configured on first use."""
+    name = "gemini"
+    default_model = "gemini-1.5-flash"
+    api_key_env = "GOOGLE_API_KEY"
+    _configure_lock = threading.Lock()
+    _configured_key = None
+
+    def _model(self, max_tokens=None):
+        import google.generativeai as genai
+        with self._configure_lock:
+            # The SDK keeps its credentials globally
+            if GeminiProvider._configured_key != self.api_key:
+                genai.configure(api_key=self.api_key)
+                GeminiProvider._configured_key = self.api_key
+        config = dict(self.params)
+        if max_tokens:
+            config["max_output_tokens"] = max_tokens
+        return genai.GenerativeModel(self.model, generation_config=config or None)
+
+    def _generate(self, prompt, max_tokens=None):
+        response = self._model(max_tokens).generate_content([prompt])
+        response.resolve()
+        return response.text
+
+    async def _agenerate(self, prompt, max_tokens=None):
+        response = await self._model(max_tokens).generate_content_async([prompt])
+        return response.text
+
+    def stream(self, prompt, max_tokens=None):
+        for chunk in self._model(max_tokens).generate_content([prompt], stream=True):
+            if chunk.text:
+                yield chunk.text
+
+    async def _astream(self, prompt, max_tokens=None):
+        async for chunk in await self._model(max_tokens).generate_content_async([prompt], stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class OpenAICompatibleProvider(Provider):
+    """
+    Any server speaking OpenAI's /chat/completions API, such as vLLM, llama.cpp or the local
+    stand-in server used to test failover and throughput offline.
+    """
+    name = "openai"
+    default_model = OPENAI_MODEL
+    api_key_env = None  # OPENAI_API_KEY is sent when set, but local servers need none
+
+    def __init__(self, model=None, api_key=None, base_url=OPENAI_BASE_URL, **params):
+        load_environment()
+        self.base_url = base_url.rstrip("/")
+        super().__init__(model, api_key or os.getenv("OPENAI_API_KEY"), **params)
+
+    @property
+    def endpoint(self):
+        return f"{self.name} {self.base_url}"
+
+    def _request(self):
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        return f"{self.base_url}/chat/completions", headers
+
+    def _body(self, prompt, max_tokens=None, stream=False):
+        body = {"model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": stream, **self.params}
+        if max_tokens:
+            body["max_tokens"] = max_tokens
+        return body
+
+    @staticmethod
+    def _event_content(line):
+        """Returns the text of a server-sent event line, "" for other lines and None at the end of the stream."""
+        if not line.startswith("data:"):
+            return ""
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return None
+        return json.loads(data)["choices"][0].get("delta", {}).get("content") or ""
+
+    def _generate(self, prompt, max_tokens=None):
+        url, headers = self._request()
+        response = get_http_client(self.name).post(url, json=self._body(prompt, max_tokens), headers=headers)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def _agenerate(self, prompt, max_tokens=None):
+        url, headers = self._request()
+        response = await get_async_http_client(self.name).post(url, json=self._body(prompt, max_tokens), headers=headers)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    def stream(self, prompt, max_tokens=None):
+        url, headers = self._request()
+        body = self._body(prompt, max_tokens, stream=True)
+        with get_http_client(self.name).stream("POST", url, json=body, headers=headers) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                content = self._event_content(line)
+                if content is None:
+                    break
+                if content:
+                    yield content
+
+    async def _astream(self, prompt, max_tokens=None):
+        url, headers = self._request()
+        body = self._body(prompt, max_tokens, stream=True)
+        async with get_async_http_client(self.name).stream("POST", url, json=body, headers=headers) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                content = self._event_content(line)
+                if content is None:
+                    break
+                if content:
+                    yield content
+
+
+# Provider classes by name, as used in provider specs ("groq", "gemini:gemini-1.5-pro", ...).
+BACKENDS = {
+    "groq": GroqProvider,
+    "gemini": GeminiProvider,
+    "openai": OpenAICompatibleProvider,
+}
+
+
+def build_providers(specs, api_keys=None, **params):
+    """
+    Creates providers from a comma-separated spec string such as "groq,openai:llama3".
+
+    :param specs: Spec string or list of "name" / "name:model" specs.
+    :param api_keys: Optional API keys by provider name; the others come from the environment.
+    :param params: Generation parameters (temperature, ...) passed to every provider.
+    """
+    if isinstance(specs, str):
+        specs = [spec.strip() for spec in specs.split(",") if spec.strip()]
+    providers = []
+    for spec in specs:
+        name, _, model = spec.partition(":")
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown LLM provider: {name} (known: {', '.join(BACKENDS)})")
+        providers.append(BACKENDS[name](model or None, (api_keys or {}).get(name), **params))
+    return providers
+
+
+class ProviderRouter:
+    """
+    Routes each request to the fastest healthy provider and fails over to the others.
+
+    Providers are ranked by the median latency of their recent calls; ones never called yet
+    come first so every provider gets measured, and ones with an open circuit or an error
+    rate above MAX_ERROR_RATE come last. A failing provider gets FAILOVER_ATTEMPTS attempts
+    before the next one takes over; the last one gets its caller's full retry budget.
+    """
+
+    def __init__(self, providers):
+        if not providers:
+            raise ValueError("At least one LLM provider is required")
+        self.providers = providers
+        # Identify the route in cache keys; a single provider keeps its own name and model.
+        self.name = "+".join(provider.name for provider in providers)
+        self.model = "+".join(provider.model for provider in providers)
+        self.params = providers[0].params
+
+    def ranked(self):
+        """
+        :return: The available providers, best first.
+        :raises ProviderUnavailableError: If no provider has its credentials.
+        """
+        available = [provider for provider in self.providers if provider.available]
+        if not available:
+            missing = ", ".join(provider.api_key_env for provider in self.providers if provider.api_key_env)
+            raise ProviderUnavailableError(f"No LLM provider is configured; set {missing}")
+
+        def rank(indexed):
+            index, provider = indexed
+            health = provider.caller.health()
+            unhealthy = health["state"] == "open" or health["error_rate"] > MAX_ERROR_RATE
+            return unhealthy, health["latency"] or 0.0, index
+
+        return [provider for _, provider in sorted(enumerate(available), key=rank)]
+
+    def _attempts(self, position, ranked):
+        return FAILOVER_ATTEMPTS if position < len(ranked) - 1 else None
+
+    def _failed_over(self, provider, error, position, ranked):
+        logger.warning(
+            f"{provider.endpoint} failed ({type(error).__name__}: {error}); failing over to {ranked[position + 1].endpoint}"
+        )
+
+    def generate(self, prompt, max_tokens=None):
+        ranked = self.ranked()
+        for position, provider in enumerate(ranked):
+            try:
+                return provider.caller.call(provider.generate, prompt, max_tokens, attempts=self._attempts(position, ranked))
+            except Exception as e:
+                if position == len(ranked) - 1:
+                    raise
+                self._failed_over(provider, e, position, ranked)
+
+    async def agenerate(self, prompt, max_tokens=None):
+        ranked = self.ranked()
+        for position, provider in enumerate(ranked):
+            try:
+                return await provider.caller.acall(provider.agenerate, prompt, max_tokens, attempts=self._attempts(position, ranked))
+            except Exception as e:
+                if position == len(ranked) - 1:
+                    raise
+                self._failed_over(provider, e, position, ranked)
+
+    def stream(self, prompt, max_tokens=None):
+        """Streams from the best provider; failover is only possible before the first chunk."""
+        ranked = self.ranked()
+        for position, provider in enumerate(ranked):
+            chunks = provider.caller.stream(provider.stream, prompt, max_tokens, attempts=self._attempts(position, ranked))
+            try:
+                first = next(chunks, None)
+            except Exception as e:
+                if position == len(ranked) - 1:
+                    raise
+                self._failed_over(provider, e, position, ranked)
+                continue
+            if first is not None:
+                yield first
+                yield from chunks
+            return
+
+    async def astream(self, prompt, max_tokens=None):
+        """Async counterpart of stream."""
+        ranked = self.ranked()
+        for position, provider in enumerate(ranked):
+            chunks = provider.caller.astream(provider.astream, prompt, max_tokens, attempts=self._attempts(position, ranked))
+            try:
+                first = await anext(chunks, None)
+            except Exception as e:
+                if position == len(ranked) - 1:
+                    raise
+                self._failed_over(provider, e, position, ranked)
+                continue
+            if first is not None:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+            return
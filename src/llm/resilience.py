@@ -0,0 +1,372 @@
+#resilience.py
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# Attempts per call, including the first one.
+MAX_ATTEMPTS = 5
+# Upper bounds of the exponential backoff and of a server-requested Retry-After wait, in seconds.
+MAX_BACKOFF = 30
+MAX_RETRY_AFTER = 60
+# A hedged duplicate is sent when a call outlives the provider's p95 latency over this many recent calls.
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+HEDGING = os.getenv("BIBTEX_AI_HEDGING", "1").lower() not in ("0", "false", "no")
+# Consecutive failures that open a provider's circuit, and how long it stays open.
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while its circuit breaker is open."""
+
+
+def status_code(error):
+    """Returns the HTTP status code carried by a provider exception, if any."""
+    for status in (
+        getattr(error, "status_code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+        getattr(error, "code", None),  # google.api_core exceptions
+    ):
+        if isinstance(status, int):
+            return int(status)
+    return None
+
+
+def is_retryable(error):
+    """Rate limits, timeouts, server errors and connection failures are worth retrying; client errors are not."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    # An httpx error means httpx is loaded already; looking it up spares importing it with this module
+    httpx = sys.modules.get("httpx")
+    transport_errors = (httpx.TransportError,) if httpx else ()
+    return isinstance(error, (*transport_errors, TimeoutError, ConnectionError)) or type(error).__name__ in (
+        "APIConnectionError", "APITimeoutError"
+    )
+
+
+def retry_after(error):
+    """Reads the wait a server asked for from the Retry-After (or retry-after-ms) header of an error's response."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyTracker:
+    """Rolling window of a provider's successful call latencies."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, share, min_samples=MIN_LATENCY_SAMPLES):
+        """Returns the given percentile (0-1) of recent latencies, or None with fewer than min_samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(share * len(samples)))]
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast after repeated failures: the circuit opens after failure_threshold
+    consecutive failures, and after reset_timeout lets one trial call through (half-open),
+    closing again on its success.
+    """
+
+    def __init__(self, name, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def before_call(self):
+        """:raises CircuitOpenError: If the circuit is open, or half-open with its trial call in flight."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return
+            raise CircuitOpenError(f"{self.name} circuit is open after {self._failures} consecutive failures")
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"{self.name} circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_error(self, error):
+        """Counts retryable errors as failures; any other error still shows the provider is reachable."""
+        if is_retryable(error):
+            self.record_failure()
+        elif not isinstance(error, CircuitOpenError):
+            self.record_success()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"{self.name} circuit opened for {self.reset_timeout}s after {self._failures} failures")
+                self._opened_at = time.monotonic()
+
+
+class ResilientCaller:
+    """
+    Wraps the calls to one provider with retries, hedging and a circuit breaker.
+
+    Retryable failures are retried with exponential backoff, or after the Retry-After delay
+    the server asked for. Once enough latencies are known, a call that outlives the p95
+    latency gets a duplicate request, and whichever answers first wins. Consecutive
+    failures open the provider's circuit so later calls fail fast instead of queueing up.
+    """
+
+    def __init__(self, provider, max_attempts=MAX_ATTEMPTS, hedging=HEDGING):
+        self.provider = provider
+        self.max_attempts = max_attempts
+        self.hedging = hedging
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(provider)
+        self._outcomes = deque(maxlen=LATENCY_WINDOW)  # True for a success, False for a provider failure
+        from tenacity import wait_random_exponential
+        self._backoff = wait_random_exponential(multiplier=1, max=MAX_BACKOFF)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _wait(self, retry_state):
+        error = retry_state.outcome.exception()
+        delay = retry_after(error)
+        if delay is None:
+            delay = self._backoff(retry_state)
+        return min(delay, MAX_RETRY_AFTER)
+
+    def _log_retry(self, retry_state):
+        error = retry_state.outcome.exception()
+        logger.warning(
+            f"{self.provider} call failed ({type(error).__name__}: {error}); "
+            f"retry {retry_state.attempt_number}/{retry_state.retry_object.stop.max_attempt_number - 1} in {retry_state.next_action.sleep:.1f}s"
+        )
+
+    def _succeeded(self):
+        self._outcomes.append(True)
+        self.breaker.record_success()
+
+    def _failed(self, error):
+        if is_retryable(error):
+            self._outcomes.append(False)
+        self.breaker.record_error(error)
+
+    def error_rate(self):
+        """Share of recent calls that failed on the provider's side (0 when nothing is known yet)."""
+        outcomes = list(self._outcomes)
+        return outcomes.count(False) / len(outcomes) if outcomes else 0.0
+
+    def health(self):
+        """
+        :return: Dictionary with the median "latency" of recent calls (None before the first one),
+                 their "error_rate" and the circuit "state".
+        """
+        return {
+            "latency": self.latency.percentile(0.5, min_samples=1),
+            "error_rate": self.error_rate(),
+            "state": self.breaker.state,
+        }
+
+    def _retrying(self, attempts=None, asynchronous=False):
+        from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt
+        return (AsyncRetrying if asynchronous else Retrying)(
+            stop=stop_after_attempt(attempts or self.max_attempts),
+            wait=self._wait,
+            retry=retry_if_exception(is_retryable),
+            before_sleep=self._log_retry,
+            reraise=True,
+        )
+
+    def _hedge_threshold(self):
+        return self.latency.percentile(0.95) if self.hedging else None
+
+    def _hedge_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix=f"{self.provider}-hedge")
+            return self._pool
+
+    def _attempt(self, fn, args):
+        self.breaker.before_call()
+        try:
+            result = self._hedged(fn, args)
+        except Exception as e:
+            self._failed(e)
+            raise
+        self._succeeded()
+        return result
+
+    def _hedged(self, fn, args):
+        start = time.monotonic()
+        threshold = self._hedge_threshold()
+        if threshold is None:
+            result = fn(*args)
+            self.latency.record(time.monotonic() - start)
+            return result
+
+        pool = self._hedge_pool()
+        pending = {pool.submit(fn, *args)}
+        done, _ = wait(pending, timeout=threshold)
+        if not done:
+            logger.info(f"{self.provider} call exceeded p95 latency of {threshold:.1f}s; sending a hedged request")
+            pending.add(pool.submit(fn, *args))
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.latency.record(time.monotonic() - start)
+                    return future.result()  # The other request finishes in the background
+                error = future.exception()
+        raise error
+
+    def call(self, fn, *args, attempts=None):
+        """
+        Calls fn(*args) with retries, hedging and the circuit breaker.
+        :param attempts: Optional attempt limit for this call, e.g. fewer when another provider can take over.
+        """
+        for attempt in self._retrying(attempts):
+            with attempt:
+                return self._attempt(fn, args)
+
+    async def _ahedged(self, coroutine_fn, args):
+        start = time.monotonic()
+        threshold = self._hedge_threshold()
+        if threshold is None:
+            result = await coroutine_fn(*args)
+            self.latency.record(time.monotonic() - start)
+            return result
+
+        pending = {asyncio.ensure_future(coroutine_fn(*args))}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=threshold)
+            if not done:
+                logger.info(f"{self.provider} call exceeded p95 latency of {threshold:.1f}s; sending a hedged request")
+                pending.add(asyncio.ensure_future(coroutine_fn(*args)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.latency.record(time.monotonic() - start)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()  # The slower request is abandoned
+
+    async def acall(self, coroutine_fn, *args, attempts=None):
+        """Async counterpart of call; the losing hedged request is cancelled."""
+        async for attempt in self._retrying(attempts, asynchronous=True):
+            with attempt:
+                self.breaker.before_call()
+                try:
+                    result = await self._ahedged(coroutine_fn, args)
+                except Exception as e:
+                    self._failed(e)
+                    raise
+                self._succeeded()
+                return result
+
+    def stream(self, generator_fn, *args, attempts=None):
+        """
+        Streams generator_fn(*args) behind the circuit breaker. Failures before the first chunk
+        are retried; once chunks have been passed on, errors propagate. Streams are not hedged;
+        the time to their last chunk is recorded as their latency unless they are closed early.
+        """
+        for attempt in self._retrying(attempts):
+            with attempt:
+                self.breaker.before_call()
+                start = time.monotonic()
+                chunks = generator_fn(*args)
+                try:
+                    first = next(chunks, None)
+                except Exception as e:
+                    self._failed(e)
+                    raise
+        self._succeeded()
+        if first is not None:
+            yield first
+            yield from chunks
+        self.latency.record(time.monotonic() - start)
+
+    async def astream(self, generator_fn, *args, attempts=None):
+        """Async counterpart of stream; generator_fn returns an async generator."""
+        async for attempt in self._retrying(attempts, asynchronous=True):
+            with attempt:
+                self.breaker.before_call()
+                start = time.monotonic()
+                chunks = generator_fn(*args)
+                try:
+                    first = await anext(chunks, None)
+                except Exception as e:
+                    self._failed(e)
+                    raise
+        self._succeeded()
+        if first is not None:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        self.latency.record(time.monotonic() - start)
+
+
+_callers = {}
+_callers_lock = threading.Lock()
+
+
+def get_caller(provider):
+    """Returns the process-wide ResilientCaller of a provider, so its latencies and circuit are shared by all jobs."""
+    with _callers_lock:
+        if provider not in _callers:
+            _callers[provider] = ResilientCaller(provider)
+        return _callers[provider]
@@ -0,0 +1,88 @@
+#response_cache.py
+import os
+import json
+import logging
+from src.utils.disk_cache import get_cache, sha256_hex
+
+logger = logging.getLogger(__name__)
+
+# Cache namespace; bumped whenever the key or entry layout changes.
+RESPONSE_CACHE = "llm-responses-v1"
+# Lifetime of a cached response; override with BIBTEX_AI_LLM_CACHE_MAX_AGE_HOURS.
+MAX_AGE_SECONDS = float(os.getenv("BIBTEX_AI_LLM_CACHE_MAX_AGE_HOURS", "168")) * 3600
+
+
+def get_response_cache():
+    """Returns the process-wide disk cache of LLM responses."""
+    return get_cache(RESPONSE_CACHE, max_age=MAX_AGE_SECONDS)
+
+
+def response_key(provider, model, params, prompt):
+    """Builds the cache key of a request from its provider, model, generation parameters and prompt."""
+    return sha256_hex(json.dumps(
+        {"provider": provider, "model": model, "params": params, "prompt": sha256_hex(prompt)},
+        sort_keys=True,
+    ))
+
+
+def _lookup(key, use_cache):
+    if not use_cache:
+        return None
+    cache = get_response_cache()
+    response = cache.get(key)
+    stats = cache.stats()
+    outcome = "hit" if response is not None else "miss"
+    logger.info(f"LLM response cache {outcome} (hits={stats['hits']}, misses={stats['misses']})")
+    return response
+
+
+def cached_generate(provider, model, params, prompt, generate, use_cache=True):
+    """
+    Returns the cached response to a deterministic request, or calls generate(prompt) and caches its result.
+    Empty responses are not cached.
+
+    :param provider: Provider name, e.g. "groq".
+    :param model: Model name.
+    :param params: JSON-serialisable generation parameters (temperature, ...).
+    :param prompt: Prompt string.
+    :param generate: Callable sending the prompt and returning the response text.
+    :param use_cache: Set to False to bypass the cache (the fresh response is still stored).
+    """
+    key = response_key(provider, model, params, prompt)
+    response = _lookup(key, use_cache)
+    if response is None:
+        response = generate(prompt)
+        if response:
+            get_response_cache().set(key, response)
+    return response
+
+
+async def acached_generate(provider, model, params, prompt, agenerate, use_cache=True):
+    """Async counterpart of cached_generate; agenerate is a coroutine function."""
+    key = response_key(provider, model, params, prompt)
+    response = _lookup(key, use_cache)
+    if response is None:
+        response = await agenerate(prompt)
+        if response:
+            get_response_cache().set(key, response)
+    return response
+
+
+def cached_stream(provider, model, params, prompt, stream, use_cache=True):
+    """
+    Streaming counterpart of cached_generate: yields a cached response in one piece, or the
+    chunks of stream(prompt) as they arrive. Only a stream read to the end is cached, so a
+    generation cancelled by closing this generator is never stored.
+    """
+    key = response_key(provider, model, params, prompt)
+    response = _lookup(key, use_cache)
+    if response is not None:
+        yield response
+        return
+    chunks = []
+    for chunk in stream(prompt):
+        chunks.append(chunk)
+        yield chunk
+    response = "".join(chunks)
+    if response:
+        get_response_cache().set(key, response)
@@ -1,11 +1,9 @@
 from src.utils.input_handler import InputHandler
-from src.agents.prompt_agent import PromptAgent
+from src.agents.prompt_agent import PromptAgent, ResponseReport
 from src.agents.report_generation_agent import ReportGenerationAgent
 import os
 from src.agents.citation_agent import get_citations
-from dotenv import load_dotenv
-# Load environment variables
-load_dotenv()
+from src.utils.text_compressor import RAW_TEXT_HEADROOM, compress_documents
 
 class ProcessingPipeline:
     """Pipeline that connects input handling to report generation."""
@@ -15,8 +13,23 @@ class ProcessingPipeline:
     #     # Set default paths relative to project root
     #     self.research_papers_dir = os.path.join(os.path.dirname(__file__), "..", "Research_papers")
     #     self.format_dir = os.path.join(os.path.dirname(__file__), "..", "Format")
-    def __init__(self, api_key):
+    def __init__(self, api_key, corpus_dir=None, map_reduce=False, sectioned=False, retrieval=True):
+        """
+        :param api_key: GROQ API key.
+        :param corpus_dir: Optional directory of a Parquet corpus store the extracted papers are persisted to.
+        :param map_reduce: Summarise each whole paper in its own call before generating the output.
+        :param sectioned: Write IEEE reports from an outline, one concurrent call per section.
+        :param retrieval: Read a bounded part of each paper (see PromptAgent.retrieval_budget) and prompt with its
+                          passages most relevant to the output.
+        """
         self.api_key = api_key
+        self.map_reduce = map_reduce
+        self.sectioned = sectioned
+        self.retrieval = retrieval
+        self.corpus_store = None
+        if corpus_dir:
+            from src.utils.corpus_store import CorpusStore  # PyArrow is only loaded for a corpus store
+            self.corpus_store = CorpusStore(corpus_dir)
         base_path = os.path.dirname(os.path.dirname(__file__))  # Project root
         self.research_papers_dir = os.path.join(base_path, "Research_papers")
         self.format_dir = os.path.join(base_path, "Format")
@@ -66,14 +79,31 @@ class ProcessingPipeline:
             print(f"Error locating input files: {e}")
             return None
 
-        # Step 2: Extract Text from PDFs
-        input_handler = InputHandler(research_papers, format_pdf)
+        # Step 2: Extract Text from PDFs (whole papers when they are summarised or persisted to the corpus store, and a
+        # bounded multiple of each paper's prompt share when passages are retrieved from them)
+        if self.map_reduce or self.corpus_store is not None:
+            budget = None
+        elif self.retrieval:
+            budget = PromptAgent.retrieval_budget(output_format).scaled(RAW_TEXT_HEADROOM)
+        else:
+            budget = PromptAgent.content_budget(output_format).scaled(RAW_TEXT_HEADROOM)
+        input_handler = InputHandler(
+            research_papers,
+            format_pdf,
+            budget=budget,
+            corpus_store=self.corpus_store
+        )
         processed_data = input_handler.process_inputs()
 
         # Step 3: Convert Extracted Text into LangChain Documents
         research_documents = processed_data["research_papers"]
         format_requirements = processed_data["format_requirements"]
 
+        # Strip headers, footers, page numbers and the bibliography before prompt assembly
+        research_documents, savings = compress_documents(research_documents)
+        print(f"\nCompression: {savings['chars_before']} -> {savings['chars_after']} chars, "
+              f"~{savings['tokens_before']} -> ~{savings['tokens_after']} tokens")
+
         print("\nExtracted Research Content:")
         print("+" * 60)
         print("\n".join(doc.page_content[:200] + "..." for doc in research_documents))  # Show preview
@@ -83,12 +113,23 @@ class ProcessingPipeline:
         extracted_citations = get_citations(research_papers)
         print("\nExtracted Citations:")
         print("+" * 60)
-        print(extracted_citations[:500] + "..." if len(extracted_citations) > 500 else extracted_citations)
+        print(f"{len(extracted_citations)} citation(s)")
+        print("\n".join(extracted_citations[:20]))  # Show preview
         print("+" * 60)
 
         # Step 5: Generate Structured Prompt and Get LLM Response
-        agent = PromptAgent(self.api_key)
-        llm_output = agent.get_response(research_documents, format_requirements, extracted_citations, output_format)
+        agent = PromptAgent(self.api_key, retrieval=self.retrieval)
+        report = ResponseReport()
+        llm_output = agent.get_response(
+            research_documents, format_requirements, extracted_citations, output_format, map_reduce=self.map_reduce,
+            sectioned=self.sectioned, report=report
+        )
+        plan = report.plan
+        print(f"\nPrompt tokens: {plan['planned_tokens']} planned, {plan['actual_tokens']} actual "
+              f"(context window {plan['context_window']}, {plan['output_reserve']} reserved for the response)")
+        usage = report.usage
+        print(f"Output tokens: {sum(call['reasoning_tokens'] + call['abandoned_tokens'] for call in usage)} reasoning, "
+              f"{sum(call['payload_tokens'] for call in usage)} payload over {len(usage)} LLM call(s)")
 
         # Step 6: Generate Final LaTeX Document
         report_agent = ReportGenerationAgent()
@@ -101,11 +142,20 @@ class ProcessingPipeline:
 
 # Example Usage
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    # Load environment variables
+    load_dotenv()
     api_key = os.getenv("GROQ")
     if not api_key:
         raise ValueError("Error: GROQ_API_KEY is missing.  Please set it in the .env file.")                                
     print("=== BibTeX AI Report Generator ===")
-    pipeline = ProcessingPipeline(api_key)
+    pipeline = ProcessingPipeline(
+        api_key,
+        corpus_dir=os.getenv("BIBTEX_AI_CORPUS_DIR"),
+        map_reduce=os.getenv("BIBTEX_AI_MAP_REDUCE", "").lower() in ("1", "true", "yes"),
+        sectioned=os.getenv("BIBTEX_AI_SECTIONED", "").lower() in ("1", "true", "yes"),
+        retrieval=os.getenv("BIBTEX_AI_RETRIEVAL", "1").lower() in ("1", "true", "yes")
+    )
     result, format_type = pipeline.run()
     
     if result:
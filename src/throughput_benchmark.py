@@ -0,0 +1,105 @@
+#throughput_benchmark.py
+"""
+Measures LLM request throughput and failover offline: requests go through a ProviderRouter to
+local stand-in servers (src/llm/local_server.py), one per provider, each with its own latency
+and error rate.
+
+    python -m src.throughput_benchmark [--requests 200] [--concurrency 32] [--latency 0.05,0.2]
+                                       [--error-rate 0,0.2] [--stream] [--json]
+"""
+import json
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+
+from src.llm.local_server import StandInConfig, start_server
+from src.llm.providers import OpenAICompatibleProvider, ProviderRouter
+
+
+def _floats(value):
+    return [float(item) for item in value.split(",")]
+
+
+async def _timed(router, prompt, stream, semaphore):
+    """Sends one request; returns its latency in seconds, or None if it failed after failover."""
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            if stream:
+                async for _ in router.astream(prompt):
+                    pass
+            else:
+                await router.agenerate(prompt)
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+
+async def _run_requests(router, requests, concurrency, stream):
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(_timed(router, f"request {i}", stream, semaphore) for i in range(requests)))
+    return latencies, time.perf_counter() - start
+
+
+def run(requests=200, concurrency=32, latencies=(0.05, 0.2), error_rates=(0.0, 0.2), stream=False):
+    """
+    Starts one stand-in per latency (and matching error rate) and sends requests through a router over them.
+
+    :return: Dictionary with "requests", "failed", "seconds", "throughput" (requests per second), the
+             "p50" and "p95" latencies of the successful ones in seconds, and per stand-in its "latency",
+             "error_rate", "requests" received and final "health" as the router saw it.
+    """
+    error_rates = list(error_rates) + [0.0] * (len(latencies) - len(error_rates))
+    servers = [
+        # 429 with Retry-After: 0, so failed attempts are retried at once instead of after a backoff
+        start_server(config=StandInConfig(latency=latency, error_rate=error_rate, error_status=429, retry_after=0))
+        for latency, error_rate in zip(latencies, error_rates)
+    ]
+    try:
+        providers = [OpenAICompatibleProvider(base_url=f"http://127.0.0.1:{server.server_port}/v1") for server in servers]
+        router = ProviderRouter(providers)
+        results, seconds = asyncio.run(_run_requests(router, requests, concurrency, stream))
+        succeeded = sorted(latency for latency in results if latency is not None)
+        return {
+            "requests": requests,
+            "failed": requests - len(succeeded),
+            "seconds": seconds,
+            "throughput": len(succeeded) / seconds if seconds else 0.0,
+            "p50": statistics.median(succeeded) if succeeded else None,
+            "p95": succeeded[min(len(succeeded) - 1, int(0.95 * len(succeeded)))] if succeeded else None,
+            "stand_ins": [
+                {"latency": latency, "error_rate": error_rate, "requests": server.config.requests,
+                 "health": provider.caller.health()}
+                for latency, error_rate, server, provider in zip(latencies, error_rates, servers, providers)
+            ],
+        }
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline throughput and failover benchmark of the LLM provider router")
+    parser.add_argument("--requests", type=int, default=200, help="requests to send")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight at once")
+    parser.add_argument("--latency", type=_floats, default=[0.05, 0.2], help="comma-separated latency of each stand-in")
+    parser.add_argument("--error-rate", type=_floats, default=[0.0, 0.2], help="comma-separated error rate of each stand-in")
+    parser.add_argument("--stream", action="store_true", help="stream the responses")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON, e.g. to track them over time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)  # Failed attempts are expected; the summary counts them
+    result = run(args.requests, args.concurrency, args.latency, args.error_rate, args.stream)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['requests'] - result['failed']}/{result['requests']} request(s) in {result['seconds']:.2f}s: "
+              f"{result['throughput']:.1f} req/s, p50 {result['p50'] or 0:.3f}s, p95 {result['p95'] or 0:.3f}s")
+        for number, stand_in in enumerate(result["stand_ins"], 1):
+            health = stand_in["health"]
+            print(f"    stand-in {number} ({stand_in['latency']}s, {stand_in['error_rate']:.0%} errors): "
+                  f"{stand_in['requests']} request(s), circuit {health['state']}, error rate {health['error_rate']:.0%}")
@@ -0,0 +1,199 @@
+#citation_index.py
+
+import re
+import logging
+import unicodedata
+import numpy as np
+
+from src.utils.reference_parser import citation_key, first_author_surname, parse_entry
+
+logger = logging.getLogger(__name__)
+
+# MinHash signature length, split into LSH bands of ROWS values; titles sharing a band become candidates.
+NUM_PERM = 96
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Candidates are the same work when the Jaccard similarity of their title shingles reaches this.
+SIMILARITY_THRESHOLD = 0.8
+# Universal hash family (a * x + b) mod PRIME over the 24-bit character trigrams of a title; a and b stay below
+# 2**31 so the products fit in 64 bits. Seeded, so signatures are the same in every process.
+PRIME = np.uint64(4294967311)
+_random = np.random.RandomState(1)
+_A = _random.randint(1, 2**31, size=NUM_PERM).astype(np.uint64)
+_B = _random.randint(0, 2**31, size=NUM_PERM).astype(np.uint64)
+
+BIBITEM = re.compile(r"\s*\\bibitem(?:\[[^\]]*\])?\{([^}]*)\}\s*", re.DOTALL)
+LATEX_COMMAND = re.compile(r"\\[A-Za-z]+\*?")
+TITLE_STOPWORDS = frozenset("a an and for in of on the to with".split())
+
+
+def title_tokens(title):
+    """Lower-cased ASCII words of a title without LaTeX commands, punctuation and short function words."""
+    title = unicodedata.normalize("NFKD", LATEX_COMMAND.sub(" ", title)).encode("ascii", "ignore").decode().lower()
+    return [token for token in re.findall(r"[a-z0-9]+", title) if token not in TITLE_STOPWORDS]
+
+
+def reference_fields(text):
+    """
+    Normalises a \\bibitem line or a raw bibliography entry for matching.
+    :return: Dictionary with the parsed "authors", "title" and "year", the first author's lower-cased
+             "surname", the normalised title "tokens" and the "body" of the entry (without \\bibitem{key}).
+    """
+    match = BIBITEM.match(text)
+    body = text[match.end():].strip() if match else text.strip()
+    parsed = parse_entry(body)
+    title = parsed["title"] or body  # Unparsed entries are matched on their whole text
+    return {
+        "authors": parsed["authors"],
+        "title": title,
+        "year": parsed["year"],
+        "surname": first_author_surname(parsed["authors"]).lower(),
+        "tokens": title_tokens(title),
+        "body": body,
+    }
+
+
+def identity_key(fields):
+    """Exact identity of a work: first author surname, year and normalised title, e.g. "smith|2017|deep residual learning"."""
+    title = " ".join(fields["tokens"]) or fields["body"].lower()  # Titles without Latin letters are kept whole
+    return f"{fields['surname']}|{fields['year']}|{title}"
+
+
+def _shingles(tokens):
+    """
+    Character trigrams of a normalised title with its spaces removed, so words split or joined by
+    line breaks still match, packed into integers.
+    :return: Sorted array of distinct trigrams.
+    """
+    chars = np.frombuffer("".join(tokens).encode(), dtype=np.uint8).astype(np.uint64)
+    if len(chars) < 3:
+        return np.array([int.from_bytes(chars.astype(np.uint8).tobytes(), "big")], dtype=np.uint64)
+    return np.unique((chars[:-2] << np.uint64(16)) | (chars[1:-1] << np.uint64(8)) | chars[2:])
+
+
+def _signature(shingles):
+    return ((_A[:, None] * shingles[None, :] + _B[:, None]) % PRIME).min(axis=1)
+
+
+def _similarity(a, b):
+    """Jaccard similarity of two shingle arrays."""
+    common = len(np.intersect1d(a, b, assume_unique=True))
+    return common / (len(a) + len(b) - common)
+
+
+def compatible(a, b):
+    """Years and surnames must agree where both entries have them."""
+    return all(not a[field] or not b[field] or a[field] == b[field] for field in ("year", "surname"))
+
+
+class CitationIndex:
+    """
+    Deduplicates references across papers.
+
+    Each reference is normalised to its first author's surname, year and title words. Entries
+    with the same normalised key are merged at once. Near-duplicates (different punctuation,
+    OCR slips, abbreviated titles) are found by MinHash signatures of the title's character
+    shingles, bucketed by LSH band, so each reference is compared only with the few entries
+    sharing a band. Merging n references takes about O(n).
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.entries = []  # Dictionaries of reference fields plus "shingles", in order of first occurrence
+        self._exact = {}
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def find(self, fields):
+        """Returns the index of the entry the normalised reference duplicates, or None."""
+        entry_id = self._exact.get(identity_key(fields))
+        if entry_id is not None or not fields["tokens"]:
+            return entry_id
+        self._sketch(fields)
+        candidates = set()
+        for band_key in fields["bands"]:
+            candidates.update(self._buckets.get(band_key, ()))
+        for entry_id in sorted(candidates):
+            entry = self.entries[entry_id]
+            if compatible(fields, entry) and _similarity(fields["shingles"], entry["shingles"]) >= self.threshold:
+                return entry_id
+        return None
+
+    def add(self, text):
+        """
+        Adds a \\bibitem line or raw entry. A duplicate keeps the most complete (longest) formatting of the two.
+        :return: Tuple of (entry index, True if the reference was new).
+        """
+        fields = reference_fields(text)
+        entry_id = self.find(fields)
+        if entry_id is not None:
+            entry = self.entries[entry_id]
+            if len(fields["body"]) > len(entry["body"]):
+                entry.update(body=fields["body"], authors=fields["authors"] or entry["authors"])
+            entry["year"] = entry["year"] or fields["year"]
+            entry["surname"] = entry["surname"] or fields["surname"]
+            self._exact.setdefault(identity_key(fields), entry_id)
+            return entry_id, False
+
+        entry_id = len(self.entries)
+        self._sketch(fields)
+        self.entries.append(fields)
+        self._exact[identity_key(fields)] = entry_id
+        for band_key in fields["bands"]:
+            self._buckets.setdefault(band_key, []).append(entry_id)
+        return entry_id, True
+
+    @staticmethod
+    def _sketch(fields):
+        """Adds a reference's title "shingles" and the LSH "bands" of its MinHash signature to its fields, once."""
+        if "bands" not in fields:
+            fields["shingles"] = _shingles(fields["tokens"])
+            bands = _signature(fields["shingles"]).reshape(BANDS, ROWS)
+            fields["bands"] = [(band, rows.tobytes()) for band, rows in enumerate(bands)]
+
+    def keys(self):
+        """
+        Assigns every entry a stable key such as Smith2017: works sharing one get a letter
+        (Smith2017a, Smith2017b, ...) in the order of their normalised titles, so a work's key
+        does not depend on the order the papers were uploaded in.
+        """
+        groups = {}
+        for entry_id, entry in enumerate(self.entries):
+            groups.setdefault(citation_key(entry["authors"], entry["year"]), []).append(entry_id)
+        keys = [None] * len(self.entries)
+        for base, entry_ids in groups.items():
+            if len(entry_ids) == 1:
+                keys[entry_ids[0]] = base
+                continue
+            for position, entry_id in enumerate(sorted(entry_ids, key=lambda i: identity_key(self.entries[i]))):
+                keys[entry_id] = base + _suffix(position)
+        return keys
+
+    def bibitems(self):
+        """Returns the unique references as \\bibitem lines with stable keys, in order of first occurrence."""
+        return [f"\\bibitem{{{key}}} {entry['body']}" for key, entry in zip(self.keys(), self.entries)]
+
+
+def _suffix(position):
+    """a, b, ..., z, aa, ab, ..."""
+    letters = ""
+    position += 1
+    while position:
+        position, remainder = divmod(position - 1, 26)
+        letters = chr(ord("a") + remainder) + letters
+    return letters
+
+
+def deduplicate(references):
+    """
+    Merges duplicate \\bibitem lines, e.g. the same work cited by several papers.
+    :return: The unique references with stable keys, in order of first occurrence.
+    """
+    index = CitationIndex()
+    for reference in references:
+        index.add(reference)
+    if len(index) < len(references):
+        logger.info(f"Merged {len(references)} references into {len(index)} unique entries")
+    return index.bibitems()
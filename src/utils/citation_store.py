@@ -0,0 +1,155 @@
+#citation_store.py
+
+import os
+import re
+import sqlite3
+import logging
+import functools
+from contextlib import closing
+
+from src.utils.citation_index import identity_key, reference_fields
+from src.utils.disk_cache import DEFAULT_CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Database file of the store inside the cache directory; BIBTEX_AI_CITATION_STORE sets another path, or turns the
+# store off when empty.
+STORE_FILE = "citations.sqlite3"
+# Keys looked up per SELECT ... IN (...) statement, well below SQLite's limit on bound parameters.
+LOOKUP_BATCH = 500
+# Seconds a connection waits for another process's write to finish.
+BUSY_TIMEOUT = 30
+
+# A DOI ends at whitespace or at characters that delimit it in LaTeX and prose.
+DOI = re.compile(r"\b10\.\d{4,9}/[^\s\"'<>{}]+", re.IGNORECASE)
+
+
+def find_doi(text):
+    """Returns the lower-cased DOI an entry carries, or None; LaTeX escapes and trailing punctuation are dropped."""
+    match = DOI.search(text.replace("\\_", "_"))
+    return match.group().rstrip(".,;:)]").lower() if match else None
+
+
+def reference_keys(text):
+    """
+    Keys a \\bibitem line or raw bibliography entry is stored and looked up under, most specific first:
+    "doi:<DOI>" when it carries one, then "ref:<surname>|<year>|<title words>" (see identity_key) when
+    its first author, year and title could all be read. Keeping both lets entries that cite the work
+    without its DOI find it too.
+    """
+    keys = []
+    doi = find_doi(text)
+    if doi:
+        keys.append(f"doi:{doi}")
+    fields = reference_fields(text)
+    if fields["surname"] and fields["year"] and fields["tokens"]:
+        keys.append(f"ref:{identity_key(fields)}")
+    return keys
+
+
+class CitationStore:
+    """
+    SQLite table of resolved references, shared by all jobs and processes, so a work cited by
+    many uploaded papers is formatted by the citation LLM once.
+
+    The table is keyed by reference identity (see reference_keys) and holds each work's
+    \\bibitem line. It is a WITHOUT ROWID table clustered on the key, so a lookup is a single
+    B-tree seek that also reads the line, and stays fast with millions of rows. Writes are
+    batched into one transaction and the database runs in WAL mode, so readers are not
+    blocked while another job adds its references.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Database file (created with its directory if missing).
+        """
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")  # Persists in the database file
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS citations (key TEXT PRIMARY KEY, bibitem TEXT NOT NULL) WITHOUT ROWID"
+            )
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        connection.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL; a crash loses at most the last writes
+        return connection
+
+    def __len__(self):
+        with closing(self._connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM citations").fetchone()[0]
+
+    def lookup(self, keys):
+        """
+        :param keys: Reference keys, as returned by reference_keys.
+        :return: Dictionary of the stored \\bibitem line of each key found.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        try:
+            with closing(self._connect()) as connection:
+                for start in range(0, len(keys), LOOKUP_BATCH):
+                    batch = keys[start:start + LOOKUP_BATCH]
+                    found.update(connection.execute(
+                        f"SELECT key, bibitem FROM citations WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ))
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read the citation store {self.path}: {e}")
+        return found
+
+    def find(self, references):
+        """
+        Looks up many references at once.
+        :param references: \\bibitem lines or raw bibliography entries.
+        :return: The stored \\bibitem line of each reference, or None where it is not in the store.
+        """
+        keys = [reference_keys(reference) for reference in references]
+        found = self.lookup(key for reference_key in keys for key in reference_key)
+        return [next((found[key] for key in reference_key if key in found), None) for reference_key in keys]
+
+    def add(self, records):
+        """
+        Stores resolved references in one transaction. A key already present keeps the more
+        complete (longer) of its two lines, as when CitationIndex merges duplicates.
+
+        :param records: Iterable of (keys, \\bibitem line) pairs.
+        :return: Number of keys written.
+        """
+        lines = {}
+        for keys, bibitem in records:
+            for key in keys:
+                if len(bibitem) > len(lines.get(key, "")):
+                    lines[key] = bibitem
+        rows = sorted(lines.items())  # Inserting in key order fills the B-tree's pages in sequence
+        if not rows:
+            return 0
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.executemany(
+                    "INSERT INTO citations (key, bibitem) VALUES (?, ?) ON CONFLICT (key) DO UPDATE "
+                    "SET bibitem = excluded.bibitem WHERE length(excluded.bibitem) > length(citations.bibitem)",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to update the citation store {self.path}: {e}")
+            return 0
+        return len(rows)
+
+
+@functools.lru_cache(maxsize=None)
+def get_store():
+    """
+    Returns the process-wide CitationStore, or None when BIBTEX_AI_CITATION_STORE is set but
+    empty. It defaults to STORE_FILE in the BIBTEX_AI_CACHE_DIR cache directory.
+    """
+    path = os.getenv("BIBTEX_AI_CITATION_STORE")
+    if path is None:
+        path = os.path.join(os.getenv("BIBTEX_AI_CACHE_DIR", DEFAULT_CACHE_DIR), STORE_FILE)
+    if not path:
+        return None
+    try:
+        return CitationStore(path)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Citation store {path} is unavailable: {e}")
+        return None
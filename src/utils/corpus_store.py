@@ -0,0 +1,133 @@
+#corpus_store.py
+
+import os
+import logging
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+logger = logging.getLogger(__name__)
+
+# Label of the text before a paper's first heading (title, authors, abstract body).
+FRONT_MATTER = ""
+
+
+class CorpusStore:
+    """
+    Columnar Parquet dataset of extracted papers for batch runs over large collections.
+
+    Each paper is written once, to a file named after its content hash, with one row per
+    (page, section) piece of text. Readers memory-map the dataset and load only the
+    columns and rows they ask for instead of holding every paper's text in RAM.
+    """
+
+    SCHEMA = pa.schema([
+        ("paper_hash", pa.string()),
+        ("source", pa.string()),
+        ("title", pa.string()),
+        ("page", pa.int32()),
+        ("section", pa.string()),
+        ("text", pa.large_string()),
+    ])
+
+    def __init__(self, directory):
+        """
+        :param directory: Directory holding the dataset's Parquet files (created if missing).
+        """
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, paper_hash):
+        return os.path.join(self.directory, f"{paper_hash}.parquet")
+
+    @staticmethod
+    def _rows(document):
+        """Splits a Document's text at page and section boundaries into dataset rows."""
+        metadata = document.metadata
+        text = document.page_content
+        page_spans = metadata.get("page_spans") or [(0, len(text))]
+        # Boundaries where a new section label starts, in text order.
+        starts = sorted((start, name) for name, (start, _) in metadata.get("sections", {}).items())
+
+        rows = []
+        label_index = -1
+        for page, (page_start, page_end) in enumerate(page_spans):
+            cursor = page_start
+            while cursor < page_end:
+                while label_index + 1 < len(starts) and starts[label_index + 1][0] <= cursor:
+                    label_index += 1
+                next_start = starts[label_index + 1][0] if label_index + 1 < len(starts) else page_end
+                piece_end = min(page_end, max(next_start, cursor + 1))
+                piece = text[cursor:piece_end]
+                if piece.strip():
+                    rows.append((page, starts[label_index][1] if label_index >= 0 else FRONT_MATTER, piece))
+                cursor = piece_end
+        return rows
+
+    def write(self, documents):
+        """
+        Persists research-paper Documents produced by InputHandler.
+        Papers already in the store (same content hash) are skipped.
+
+        :return: Number of papers written.
+        """
+        written = 0
+        for document in documents:
+            paper_hash = document.metadata.get("hash")
+            if not paper_hash or os.path.exists(self._path(paper_hash)):
+                continue
+            rows = self._rows(document)
+            table = pa.table(
+                {
+                    "paper_hash": [paper_hash] * len(rows),
+                    "source": [document.metadata.get("source", "")] * len(rows),
+                    "title": [document.metadata.get("title", "")] * len(rows),
+                    "page": [page for page, _, _ in rows],
+                    "section": [section for _, section, _ in rows],
+                    "text": [piece for _, _, piece in rows],
+                },
+                schema=self.SCHEMA,
+            )
+            tmp_path = f"{self._path(paper_hash)}.{os.getpid()}.tmp"
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, self._path(paper_hash))
+            written += 1
+        logger.info(f"Wrote {written} paper(s) to corpus store {self.directory}")
+        return written
+
+    def dataset(self):
+        """Returns the memory-mapped pyarrow dataset over every stored paper."""
+        return ds.dataset(
+            self.directory,
+            format="parquet",
+            schema=self.SCHEMA,
+            filesystem=fs.LocalFileSystem(use_mmap=True),
+            exclude_invalid_files=True,
+        )
+
+    def read(self, columns=None, filter=None):
+        """
+        Reads only the requested columns and matching rows.
+
+        :param columns: Column names to load (all by default).
+        :param filter: Optional pyarrow.dataset expression, e.g. ds.field("section") == "Results".
+        :return: pyarrow.Table.
+        """
+        return self.dataset().to_table(columns=columns, filter=filter)
+
+    def iter_batches(self, columns=None, filter=None, batch_size=1024):
+        """Streams matching rows as pyarrow.RecordBatch objects of at most batch_size rows."""
+        yield from self.dataset().to_batches(columns=columns, filter=filter, batch_size=batch_size)
+
+    def paper_text(self, paper_hash, sections=None):
+        """
+        Reassembles the text of one paper, optionally restricted to some section labels.
+        """
+        expression = ds.field("paper_hash") == paper_hash
+        if sections is not None:
+            expression &= ds.field("section").isin(list(sections))
+        return "".join(self.read(columns=["text"], filter=expression).column("text").to_pylist())
+
+    def __contains__(self, paper_hash):
+        return os.path.exists(self._path(paper_hash))
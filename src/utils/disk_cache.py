@@ -0,0 +1,185 @@
+#disk_cache.py
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import time
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bibtex_ai")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def sha256_hex(data):
+    """Returns the hex SHA-256 digest of a bytes object (strings are UTF-8 encoded)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class DiskCache:
+    """
+    Content-addressed on-disk cache of JSON values compressed with zstandard.
+    Each entry is one file; the file's modification time records when it was written and
+    its access time its last use. The least recently used entries are evicted once the
+    cache exceeds max_bytes, and entries older than max_age expire.
+    """
+
+    SUFFIX = ".json.zst"
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, level=3, max_age=None):
+        """
+        :param directory: Directory holding the cache entries (created if missing).
+        :param max_bytes: Total compressed size above which old entries are evicted.
+        :param level: zstandard compression level.
+        :param max_age: Optional lifetime of an entry in seconds, counted from when it was written.
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.level = level
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None  # Computed lazily from the directory listing
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def _expired(self, mtime, now):
+        return self.max_age is not None and now - mtime > self.max_age
+
+    def get(self, key):
+        """Returns the cached value for key, or None on a miss."""
+        value = self._read(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def _read(self, key):
+        path = self._path(key)
+        now = time.time()
+        try:
+            mtime = os.stat(path).st_mtime
+            if self._expired(mtime, now):
+                self.delete(key)
+                return None
+            with open(path, "rb") as f:
+                payload = f.read()
+            os.utime(path, (now, mtime))  # Mark as recently used, keeping the write time
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to read cache entry {path}: {e}")
+            return None
+        try:
+            return json.loads(zstandard.ZstdDecompressor().decompress(payload))
+        except (zstandard.ZstdError, ValueError) as e:
+            logger.warning(f"Discarding corrupt cache entry {path}: {e}")
+            self.delete(key)
+            return None
+
+    def stats(self):
+        """Returns the hit and miss counts of this process."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def set(self, key, value):
+        """Stores a JSON-serialisable value under key, evicting old entries if needed."""
+        payload = zstandard.ZstdCompressor(level=self.level).compress(
+            json.dumps(value, ensure_ascii=False).encode("utf-8")
+        )
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)  # Atomic, so concurrent readers never see partial entries
+            except OSError as e:
+                logger.warning(f"Failed to write cache entry {path}: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return
+            if self._size is not None:
+                self._size += len(payload) - previous
+            self._evict()
+
+    def delete(self, key):
+        """Removes an entry if it exists."""
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        if self._size is not None:
+            self._size -= size
+
+    def _entries(self):
+        """Lists (atime, mtime, size, path) for every entry in the cache directory."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        """Deletes expired entries, then least recently used ones until the cache fits in max_bytes."""
+        if self._size is not None and self._size <= self.max_bytes:
+            return
+        now = time.time()
+        entries = []
+        for atime, mtime, size, path in self._entries():
+            if self._expired(mtime, now):
+                try:
+                    os.remove(path)
+                    continue
+                except OSError:
+                    pass
+            entries.append((atime, size, path))
+        self._size = sum(size for _, size, _ in entries)
+        if self._size <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            logger.info(f"Evicted cache entry {path}")
+            if self._size <= self.max_bytes:
+                break
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace, max_bytes=None, max_age=None):
+    """
+    Returns the process-wide cache for a namespace.
+    max_bytes and max_age only apply when the namespace's cache is first created.
+    The root directory and size limit can be overridden with the BIBTEX_AI_CACHE_DIR
+    and BIBTEX_AI_CACHE_MAX_MB environment variables.
+    """
+    with _caches_lock:
+        if namespace not in _caches:
+            root = os.getenv("BIBTEX_AI_CACHE_DIR", DEFAULT_CACHE_DIR)
+            if max_bytes is None:
+                max_mb = os.getenv("BIBTEX_AI_CACHE_MAX_MB")
+                max_bytes = int(max_mb) * 1024 * 1024 if max_mb else DEFAULT_MAX_BYTES
+            _caches[namespace] = DiskCache(os.path.join(root, namespace), max_bytes, max_age=max_age)
+        return _caches[namespace]
@@ -2,8 +2,8 @@
 
 import os
 import logging
-from langchain.schema import Document
-import fitz  # PyMuPDF
+from src.utils.pdf_extractor import PDFExtractor, is_path, source_name
+from src.utils.template_analyzer import TemplateAnalyzer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -11,95 +11,85 @@ logger = logging.getLogger(__name__)
 class InputHandler:
     """Handles user input by validating and processing research papers and format PDFs."""
 
-    def __init__(self, research_papers, format_pdf):
+    def __init__(self, research_papers, format_pdf, max_workers=None, budget=None, corpus_store=None):
         """
         Initialize InputHandler.
-        :param research_papers: List of research paper file paths.
-        :param format_pdf: File path of the required format PDF.
+        :param research_papers: List of research papers, each a file path or the PDF itself as
+                                bytes, a memoryview or an in-memory file (e.g. a Streamlit upload).
+        :param format_pdf: The required format PDF, as a file path or in-memory PDF.
+        :param max_workers: Maximum number of extraction worker processes (defaults to the CPU count).
+        :param budget: Optional TextBudget; each paper is only extracted until it is met.
+        :param corpus_store: Optional CorpusStore the extracted papers are persisted to.
         """
         self.research_papers = research_papers
         self.format_pdf = format_pdf
+        self.max_workers = max_workers
+        self.budget = budget
+        self.corpus_store = corpus_store
 
     def validate_files(self):
-        """Check if all input files exist."""
+        """Check if all input files given as paths exist; in-memory PDFs are always present."""
         all_files = self.research_papers + [self.format_pdf]
-        return all(os.path.exists(file) for file in all_files)
+        return all(os.path.exists(file) for file in all_files if is_path(file))
 
     def extract_text_from_pdf(self, file_path):
-        """Extracts text from a PDF file using PyMuPDF."""
-        try:
-            doc = fitz.open(file_path)
-            text = ""
-            for page in doc:
-                text += page.get_text() + "\n"
-                if len(text) > 1000000:  # Stop after 100,000 characters to avoid memory issues
-                    break
-            doc.close()
-            return text
-        except Exception as e:
-            logger.error(f"Failed to extract text from {file_path}: {e}")
-            return ""
+        """Extracts text from a PDF file using PyMuPDF, page by page until the budget is met."""
+        return "\n".join(PDFExtractor.iter_pages(file_path, self.budget))
 
-    def _extract_title(self, text):
-        """Extracts the title from the research paper text."""
-        return text.split("\n")[0].strip()
-
-    def _extract_author(self, text):
-        """Extracts the author(s) from the research paper text."""
-        lines = text.split("\n")
-        if len(lines) > 1:
-            return lines[1].strip()
-        return "Unknown"
-
-    def _extract_sections(self, text):
-        """Extracts sections from the research paper text."""
-        sections = {}
-        current_section = None
-        for line in text.split("\n"):
-            if line.strip().startswith(("1.", "2.", "3.", "4.", "5.", "6.", "7.", "8.", "9.", "0.")):
-                current_section = line.strip()
-                sections[current_section] = ""
-            elif current_section:
-                sections[current_section] += line + "\n"
-        return sections
+    def extract_documents_from_pdfs(self, file_paths):
+        """
+        Extracts several PDF files in parallel worker processes, reusing cached extractions.
+        :return: List of extraction records (see PDFExtractor.extract_documents) in input order.
+        """
+        return PDFExtractor.extract_documents(file_paths, self.max_workers, self.budget)
 
     def process_inputs(self):
         """
         Process research papers and format PDF into LangChain Document objects.
         :return: Dictionary containing processed LangChain Documents.
         """
+        from langchain_core.documents import Document  # LangChain is only loaded once inputs are processed
+
         if not self.validate_files():
             raise FileNotFoundError("One or more input files are missing.")
 
         logger.info("Processing research papers and format PDF...")
 
+        # Extract the research papers in one parallel batch
+        logger.info(f"Extracting text from {len(self.research_papers)} research paper(s)")
+        paper_records = self.extract_documents_from_pdfs(self.research_papers)
+
         # Convert research papers into LangChain Documents
         research_paper_docs = []
-        for paper in self.research_papers:
-            logger.info(f"Extracting text from: {paper}")
-            text = self.extract_text_from_pdf(paper)
-            title = self._extract_title(text)
-            author = self._extract_author(text)
-            sections = self._extract_sections(text)
+        for paper, record in zip(self.research_papers, paper_records):
+            text = "\n".join(record["pages"])
+            metadata = record["metadata"]
+            title = metadata.get("title", "Unknown")
+            author = metadata.get("author", "Unknown")
+            sections = metadata.get("sections", {})
             logger.info(f"Extracted metadata - Title: {title}, Author: {author}, Sections: {list(sections.keys())}")
             research_paper_docs.append(
                 Document(
                     page_content=text,
                     metadata={
-                        "source": paper,
+                        "source": source_name(paper),
+                        "hash": record["hash"],
                         "title": title,
                         "author": author,
-                        "sections": sections
+                        "sections": sections,
+                        "page_spans": metadata.get("page_spans", [])
                     }
                 )
             )
 
-        # Convert format PDF into a LangChain Document
-        logger.info(f"Extracting text from format PDF: {self.format_pdf}")
-        format_text = self.extract_text_from_pdf(self.format_pdf)
+        if self.corpus_store is not None:
+            self.corpus_store.write(research_paper_docs)
+
+        # Only the layout of the format PDF is used, so it is fingerprinted rather than extracted
+        fingerprint = TemplateAnalyzer.fingerprint(self.format_pdf)
         format_doc = Document(
-            page_content=format_text,
-            metadata={"source": self.format_pdf}
+            page_content=TemplateAnalyzer.describe(fingerprint),
+            metadata={"source": source_name(self.format_pdf), "hash": fingerprint["hash"], "fingerprint": fingerprint}
         )
         # format_requirements = "This document provides layout guidelines. DO NOT use its content. Only follow its structure."
         format_requirements = format_doc
@@ -0,0 +1,285 @@
+#llm_json.py
+
+import re
+import json
+import logging
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# LaTeX commands that start like a JSON escape (\b, \f, \n, \r, \t); a backslash before one of these, followed by
+# a non-letter, is kept as a literal backslash. Commands such as \nice or \there would swallow real newlines and tabs.
+LATEX_COMMANDS = frozenset("""
+bar beta bf bfseries bibitem bigskip binom bm boldsymbol bot breve bullet
+fbox flat footnote footnotesize forall frac frame framebox
+nabla neq newcommand newline newpage noindent nonumber normalsize not nu
+raggedright rangle rceil ref renewcommand rfloor rho right rightarrow rm
+tableofcontents tabular tau text textbf textit textrm textsc textsf textsubscript textsuperscript texttt tfrac theta
+tilde times tiny title to top triangle tt
+""".split())
+LATEX_COMMAND = re.compile(r"(?:%s)(?![A-Za-z])" % "|".join(sorted(LATEX_COMMANDS, key=len, reverse=True)))
+# A JSON control escape that swallowed the first letter of one of those commands, e.g. a tab followed by "extbf".
+SWALLOWED_COMMAND = re.compile("|".join(
+    "%s(?:%s)(?![A-Za-z])" % (json.loads(f'"\\{first}"'), "|".join(
+        sorted((command[1:] for command in LATEX_COMMANDS if command[0] == first), key=len, reverse=True)
+    ))
+    for first in "bfnrt"
+))
+UNICODE_ESCAPE = re.compile(r"u[0-9a-fA-F]{4}")
+# Literal prefixes that a truncated stream may end with, and their completions.
+LITERALS = ("true", "false", "null")
+
+
+class IncrementalJSONParser:
+    """
+    Tolerant JSON parser for LLM output that is fed chunk by chunk as the response streams in.
+
+    Each chunk is scanned once and rewritten into valid JSON on the fly: the <think> trace and
+    code fences before the object are skipped, LaTeX backslashes (\\cite, \\textbf, ...) and raw
+    control characters inside strings are escaped, and trailing commas are dropped. At any
+    point snapshot() closes whatever is still open (strings, keys, arrays, objects) and parses
+    the result with orjson, so a truncated response still yields everything received so far.
+    """
+
+    def __init__(self):
+        self._preamble = ""  # Text received before the JSON object starts
+        self._raw = []  # The JSON object's text as received, for a strict parse once it is complete
+        self._out = []  # Repaired JSON text
+        self._stack = []  # Open containers as [kind, state]; kind is "{" or "["
+        self._in_string = False
+        self._escape = None  # Characters after a backslash awaiting a decision
+        self._last_comma = None  # Index in _out of a comma that may turn out to be trailing
+        self._scalar_start = None  # Index in _out where the last number or literal started
+        self.started = False
+        self.done = False
+
+    def feed(self, chunk):
+        """Consumes the next chunk of the response."""
+        if self.done:
+            return
+        if not self.started:
+            self._preamble += chunk
+            text = self._preamble
+            if "<think>" in text:
+                if "</think>" not in text:
+                    return
+                text = text.rsplit("</think>", 1)[1]
+            start = text.find("{")
+            if start < 0:
+                return
+            self.started = True
+            self._preamble = ""
+            chunk = text[start:]
+        for position, char in enumerate(chunk):
+            self._consume(char)
+            if self.done:
+                self._raw.append(chunk[:position + 1])
+                return
+        self._raw.append(chunk)
+
+    def _emit(self, text):
+        self._out.append(text)
+
+    def _value_started(self):
+        """Marks the innermost container as holding a complete (or in-progress) value."""
+        if self._stack:
+            top = self._stack[-1]
+            if top[0] == "{":
+                top[1] = "colon" if top[1] == "key" else "after"
+            else:
+                top[1] = "after"
+
+    def _consume(self, char):
+        if self._in_string:
+            self._consume_string(char)
+            return
+        if char.isspace():
+            self._emit(char)
+            return
+        self._scalar_start = self._scalar_start if char.isalnum() or char in "+-." else None
+        if char == '"':
+            self._last_comma = None
+            self._in_string = True
+            self._emit(char)
+        elif char in "{[":
+            self._last_comma = None
+            self._value_started()
+            self._stack.append([char, "key" if char == "{" else "value"])
+            self._emit(char)
+        elif char in "}]":
+            if self._last_comma is not None:
+                self._out[self._last_comma] = ""
+                self._last_comma = None
+            if self._stack:
+                self._stack.pop()
+            self._emit("}" if char == "}" else "]")
+            if not self._stack:
+                self.done = True
+        elif char == ",":
+            if self._stack:
+                self._stack[-1][1] = "key" if self._stack[-1][0] == "{" else "value"
+            self._last_comma = len(self._out)
+            self._emit(char)
+        elif char == ":":
+            if self._stack and self._stack[-1][0] == "{":
+                self._stack[-1][1] = "value"
+            self._emit(char)
+        else:
+            self._last_comma = None
+            if self._scalar_start is None:
+                self._scalar_start = len(self._out)
+                self._value_started()
+            self._emit(char)
+
+    def _consume_string(self, char):
+        if self._escape is not None:
+            self._escape += char
+            self._resolve_escape()
+        elif char == "\\":
+            self._escape = ""
+        elif char == '"':
+            self._in_string = False
+            self._emit(char)
+            self._value_started()
+        elif char < " ":
+            self._emit(json.dumps(char)[1:-1])  # Raw newline or tab inside a string
+        else:
+            self._emit(char)
+
+    def _resolve_escape(self, final=False):
+        """Decides whether the pending backslash starts a JSON escape or is a literal (LaTeX) backslash."""
+        pending = self._escape
+        if not pending:
+            if final:
+                self._escape = None  # Dangling backslash at the very end
+            return
+        first = pending[0]
+        if first in "bfnrt":
+            latex = _latex_command(pending, final)
+            if latex is None:
+                return  # Need more characters to tell \n from \newline or \t from \textbf
+        elif first == "u" and len(pending) < 5 and not final:
+            return  # Need more characters to tell \u00e9 from \url
+        self._escape = None
+        if first in '"\\/':
+            valid = True
+        elif first in "bfnrt":
+            valid = not latex
+        elif first == "u":
+            valid = UNICODE_ESCAPE.match(pending) is not None
+        else:
+            valid = False
+        if valid:
+            self._emit("\\" + first)
+            rest = pending[1:]
+        else:
+            self._emit("\\\\")  # Keep the backslash as a literal character
+            rest = pending
+        for char in rest:
+            self._consume(char)
+
+    def _repaired(self):
+        """Returns the JSON received so far with every open construct closed."""
+        out = list(self._out)
+        stack = [list(entry) for entry in self._stack]
+        if self._in_string:
+            # A pending escape is left out; it is at most a few characters at the tail.
+            out.append('"')
+            if stack and stack[-1][0] == "{" and stack[-1][1] == "key":
+                stack[-1][1] = "colon"
+            elif stack:
+                stack[-1][1] = "after"
+        elif self._scalar_start is not None:
+            scalar = "".join(out[self._scalar_start:]).strip()
+            completed = next((literal for literal in LITERALS if literal.startswith(scalar)), None)
+            out[self._scalar_start:] = [completed or scalar.rstrip("+-.eE")]
+        if self._last_comma is not None:
+            out[self._last_comma] = ""
+        for kind, state in reversed(stack):
+            if kind == "{":
+                if state == "colon":
+                    out.append(":null")
+                elif state == "value":
+                    out.append("null")
+                out.append("}")
+            else:
+                out.append("]")
+        return "".join(out)
+
+    def snapshot(self):
+        """
+        Parses everything received so far.
+        :return: The parsed value, or None if no JSON object has started or it cannot be repaired.
+        """
+        if not self.started:
+            return None
+        try:
+            return orjson.loads(self._repaired())
+        except orjson.JSONDecodeError as e:
+            logger.debug(f"Partial LLM output not parseable yet: {e}")
+            return None
+
+    def _strict(self):
+        """
+        Parses a complete object as received, without repairs.
+        :return: The value, or None if it is not valid JSON or a JSON escape in it swallowed a LaTeX command.
+        """
+        if not self.done:
+            return None
+        try:
+            value = orjson.loads("".join(self._raw))
+        except orjson.JSONDecodeError:
+            return None
+        if any(SWALLOWED_COMMAND.search(text) for text in _strings(value)):
+            return None
+        return value
+
+    def result(self):
+        """
+        Finishes parsing; returns the value, or None if the output holds no JSON object.
+        Valid JSON is returned as parsed; only output that fails a strict parse gets the repairs.
+        """
+        value = self._strict()
+        if value is not None:
+            return value
+        if self._escape is not None:
+            self._resolve_escape(final=True)
+        value = self.snapshot()
+        if value is not None and not self.done:
+            logger.warning("LLM output was truncated; closed its open JSON structures")
+        return value
+
+
+def _latex_command(pending, final=False):
+    """
+    Tells whether the characters after a backslash start one of LATEX_COMMANDS.
+    :return: True or False, or None while more characters are needed to tell.
+    """
+    if LATEX_COMMAND.match(pending):
+        return True
+    word = re.match(r"[A-Za-z]*", pending).group()
+    if final:
+        return word in LATEX_COMMANDS
+    if len(word) < len(pending):
+        return False
+    return None if any(command.startswith(word) for command in LATEX_COMMANDS) else False
+
+
+def _strings(value):
+    """Yields every string in a parsed JSON value, keys included."""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            yield key
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+
+
+def loads_tolerant(text):
+    """Parses a complete LLM response with IncrementalJSONParser's repairs."""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.result()
@@ -0,0 +1,178 @@
+#output_schema.py
+
+import re
+import logging
+from typing import Any, List
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator
+
+logger = logging.getLogger(__name__)
+
+
+def _text(value):
+    """Coerces a scalar, list or missing value from the LLM into a string."""
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "\n\n".join(_text(item) for item in value if item is not None)
+    if isinstance(value, dict):
+        return " ".join(_text(item) for item in value.values())
+    return str(value)
+
+
+def _sections(value):
+    """Keeps the section entries that have a heading; a broken section must not sink the others."""
+    if not isinstance(value, list):
+        return []
+    kept = [section for section in value if isinstance(section, dict) and section.get("heading")]
+    if len(kept) < len(value):
+        logger.warning(f"Dropped {len(value) - len(kept)} malformed section(s) from the LLM output")
+    return kept
+
+
+class ReportSection(BaseModel):
+    """A section of an IEEE report: a heading and paragraphs of LaTeX text."""
+    model_config = ConfigDict(extra="ignore")
+
+    heading: str
+    content: str = ""
+
+    @field_validator("heading", "content", mode="before")
+    @classmethod
+    def _coerce_text(cls, value):
+        return _text(value)
+
+
+class IEEEReport(BaseModel):
+    """Structure the IEEE prompt asks the LLM for."""
+    model_config = ConfigDict(extra="ignore")
+
+    title: str = "Generated Report"
+    author: str = "AI-generated"
+    abstract: str = "No abstract provided."
+    sections: List[ReportSection] = []
+
+    @field_validator("title", "author", "abstract", mode="before")
+    @classmethod
+    def _coerce_text(cls, value):
+        return _text(value)
+
+    @field_validator("sections", mode="before")
+    @classmethod
+    def _keep_valid_sections(cls, value):
+        return _sections(value)
+
+
+class SlideSection(BaseModel):
+    """A Beamer section: a heading and its bullet points."""
+    model_config = ConfigDict(extra="ignore")
+
+    heading: str
+    content: List[str] = []
+
+    @field_validator("heading", mode="before")
+    @classmethod
+    def _coerce_heading(cls, value):
+        return _text(value)
+
+    @field_validator("content", mode="before")
+    @classmethod
+    def _coerce_bullets(cls, value):
+        if isinstance(value, list):
+            return [_text(item) for item in value if _text(item).strip()]
+        return [_text(value)] if _text(value).strip() else []
+
+
+class BeamerPresentation(BaseModel):
+    """Structure the Beamer prompt asks the LLM for."""
+    model_config = ConfigDict(extra="ignore")
+
+    title: str = "Generated Presentation"
+    author: str = "AI-generated"
+    sections: List[SlideSection] = []
+    citation: List[Any] = []
+
+    @field_validator("title", "author", mode="before")
+    @classmethod
+    def _coerce_text(cls, value):
+        return _text(value)
+
+    @field_validator("sections", mode="before")
+    @classmethod
+    def _keep_valid_sections(cls, value):
+        return _sections(value)
+
+    @field_validator("citation", mode="before")
+    @classmethod
+    def _coerce_list(cls, value):
+        return value if isinstance(value, list) else []
+
+
+class OutlineSection(BaseModel):
+    """A planned report section: its heading, what it covers and the (1-based) numbers of the papers it draws on."""
+    model_config = ConfigDict(extra="ignore")
+
+    heading: str
+    focus: str = ""
+    papers: List[int] = []
+
+    @field_validator("heading", "focus", mode="before")
+    @classmethod
+    def _coerce_text(cls, value):
+        return _text(value)
+
+    @field_validator("papers", mode="before")
+    @classmethod
+    def _coerce_numbers(cls, value):
+        values = value if isinstance(value, list) else [value]
+        numbers = []
+        for item in values:
+            match = re.search(r"\d+", _text(item))
+            if match:
+                numbers.append(int(match.group()))
+        return numbers
+
+
+class ReportOutline(BaseModel):
+    """Structure the IEEE outline prompt asks the LLM for."""
+    model_config = ConfigDict(extra="ignore")
+
+    title: str = "Generated Report"
+    author: str = "AI-generated"
+    abstract: str = "No abstract provided."
+    sections: List[OutlineSection] = []
+
+    @field_validator("title", "author", "abstract", mode="before")
+    @classmethod
+    def _coerce_text(cls, value):
+        return _text(value)
+
+    @field_validator("sections", mode="before")
+    @classmethod
+    def _keep_valid_sections(cls, value):
+        return _sections(value)
+
+
+def _validate(schema, data):
+    if not isinstance(data, dict):
+        return None
+    try:
+        return schema.model_validate(data).model_dump()
+    except ValidationError as e:
+        logger.error(f"LLM output does not match the {schema.__name__} schema: {e}")
+        return None
+
+
+def validate_output(data, beamer):
+    """
+    Validates parsed LLM output against the IEEE or Beamer schema, salvaging what it can.
+
+    :param data: Parsed JSON value.
+    :param beamer: True for the Beamer schema, False for the IEEE one.
+    :return: The validated output as a plain dictionary, or None if data is not a usable object.
+    """
+    return _validate(BeamerPresentation if beamer else IEEEReport, data)
+
+
+def validate_outline(data):
+    """Validates a parsed IEEE report outline; returns it as a plain dictionary, or None if it is unusable."""
+    return _validate(ReportOutline, data)
@@ -0,0 +1,236 @@
+#passage_index.py
+
+import re
+import json
+import logging
+import numpy as np
+
+from src.utils.disk_cache import get_cache, sha256_hex
+from src.utils.prompt_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Cache namespace of per-paper passage term counts; bumped whenever the passage split or tokenisation changes.
+INDEX_CACHE = "passage-index-v1"
+# Target passage length; passages end at a sentence or paragraph boundary where possible.
+PASSAGE_CHARS = 1200
+# BM25 parameters.
+K1 = 1.5
+B = 0.75
+
+TERM = re.compile(r"[a-z][a-z0-9]+")
+BOUNDARY = re.compile(r"[.!?]\s+|\n\s*\n")
+STOPWORDS = frozenset("""
+an as at be by do if in is it no of on or so to up we
+about above after again against all also among and any are been before being between both but can could
+did does doing down during each few for from further had has have having here how however into its itself just more
+most much must not now off once only other our out over own same should since some such than that the their them
+then there these they this those through thus too under until upon very via was were what when where which while who
+whom why will with within without would yet you your
+""".split())
+
+
+def tokenize(text):
+    """Lower-cased terms of a text without stopwords; a plural "s" is dropped so "models" matches "model"."""
+    terms = []
+    for term in TERM.findall(text.lower()):
+        if term in STOPWORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+def _regions(document):
+    """
+    Splits a paper into labelled regions: the text before the first section and each section,
+    or each page when no sections were detected.
+    :return: List of (label, start, end) offsets into the document's text.
+    """
+    text = document.page_content
+    length = len(text)
+    sections = sorted(
+        ((name, start, end) for name, (start, end) in document.metadata.get("sections", {}).items()),
+        key=lambda item: item[1],
+    )
+    sections = [(name, min(start, length), min(end, length)) for name, start, end in sections]
+    if sections:
+        regions = [("Front matter", 0, sections[0][1])] + sections
+    else:
+        spans = document.metadata.get("page_spans") or [(0, length)]
+        regions = [(f"Page {number}", min(start, length), min(end, length)) for number, (start, end) in enumerate(spans, 1)]
+    return [(label, start, end) for label, start, end in regions if text[start:end].strip()]
+
+
+def split_passages(document):
+    """
+    Cuts a paper into passages of about PASSAGE_CHARS characters that do not cross region boundaries.
+    :return: List of (region label, start, end).
+    """
+    text = document.page_content
+    passages = []
+    for label, start, end in _regions(document):
+        boundaries = [start + match.end() for match in BOUNDARY.finditer(text, start, end)]
+        cursor = start
+        while end - cursor > PASSAGE_CHARS * 1.5:
+            limit = cursor + PASSAGE_CHARS
+            cut = max((b for b in boundaries if cursor + PASSAGE_CHARS // 2 <= b <= limit), default=limit)
+            passages.append((label, cursor, cut))
+            cursor = cut
+        passages.append((label, cursor, end))
+    return passages
+
+
+def _paper_key(document):
+    """Identifies a paper's passages by paper hash and extracted text length, like the summary cache."""
+    return sha256_hex(json.dumps([
+        document.metadata.get("hash") or sha256_hex(document.page_content),
+        len(document.page_content),
+        PASSAGE_CHARS,
+    ]))
+
+
+def paper_terms(document, use_cache=True):
+    """
+    Splits one paper into passages and counts their terms; cached per paper hash.
+
+    :return: Dictionary with "passages" (label, start, end), "terms" (the paper's vocabulary) and the
+             passage-by-term counts as CSR arrays "indptr", "indices" and "counts".
+    """
+    cache = get_cache(INDEX_CACHE)
+    key = _paper_key(document)
+    entry = cache.get(key) if use_cache else None
+    if entry is not None:
+        return entry
+
+    vocabulary = {}
+    indptr = [0]
+    indices = []
+    counts = []
+    passages = split_passages(document)
+    for _, start, end in passages:
+        passage_counts = {}
+        for term in tokenize(document.page_content[start:end]):
+            term_id = vocabulary.setdefault(term, len(vocabulary))
+            passage_counts[term_id] = passage_counts.get(term_id, 0) + 1
+        indices.extend(passage_counts)
+        counts.extend(passage_counts.values())
+        indptr.append(len(indices))
+    entry = {"passages": passages, "terms": list(vocabulary), "indptr": indptr, "indices": indices, "counts": counts}
+    cache.set(key, entry)
+    return entry
+
+
+class PassageIndex:
+    """
+    BM25 index over the passages of a job's research papers, kept as NumPy sparse arrays.
+
+    Each paper's passage term counts are cached by paper hash, so building the index for a
+    job only merges the papers' vocabularies and computes the job's document frequencies.
+    Queries score passages with BM25 and need no embedding service.
+    """
+
+    def __init__(self, documents, use_cache=True):
+        """
+        :param documents: Research-paper Documents from InputHandler (optionally compressed).
+        :param use_cache: Set to False to recount every paper's terms.
+        """
+        self.documents = documents
+        self.passages = []  # (paper index, region label, start, end)
+        vocabulary = {}
+        indptr = [np.zeros(1, dtype=np.int64)]
+        indices = []
+        counts = []
+        offset = 0
+        for paper, document in enumerate(documents):
+            entry = paper_terms(document, use_cache)
+            # Map the paper's term ids to job-wide ones
+            mapping = np.array([vocabulary.setdefault(term, len(vocabulary)) for term in entry["terms"]], dtype=np.int64)
+            indices.append(mapping[np.asarray(entry["indices"], dtype=np.int64)])
+            counts.append(np.asarray(entry["counts"], dtype=np.float64))
+            indptr.append(np.asarray(entry["indptr"][1:], dtype=np.int64) + offset)
+            offset += len(entry["indices"])
+            self.passages.extend((paper, label, start, end) for label, start, end in entry["passages"])
+        self.vocabulary = vocabulary
+
+        indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        counts = np.concatenate(counts) if counts else np.zeros(0)
+        indptr = np.concatenate(indptr)
+        passage_ids = np.repeat(np.arange(len(self.passages)), np.diff(indptr))
+
+        # Term-major (CSC) layout: the postings of term t are _postings[_term_ptr[t]:_term_ptr[t + 1]]
+        order = np.argsort(indices, kind="stable")
+        self._postings = passage_ids[order]
+        self._term_counts = counts[order]
+        self._term_ptr = np.concatenate([[0], np.cumsum(np.bincount(indices, minlength=len(vocabulary)))])
+
+        lengths = np.bincount(passage_ids, weights=counts, minlength=len(self.passages))
+        document_frequency = np.diff(self._term_ptr)
+        self._idf = np.log1p((len(self.passages) - document_frequency + 0.5) / (document_frequency + 0.5))
+        self._norm = K1 * (1 - B + B * lengths / max(lengths.mean(), 1.0)) if len(lengths) else lengths
+        logger.info(f"Indexed {len(self.passages)} passage(s) of {len(documents)} paper(s), {len(vocabulary)} terms")
+
+    def text(self, passage_id):
+        paper, _, start, end = self.passages[passage_id]
+        return self.documents[paper].page_content[start:end].strip()
+
+    def scores(self, query):
+        """Returns the BM25 score of every passage for a query."""
+        scores = np.zeros(len(self.passages))
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self._term_ptr[term_id], self._term_ptr[term_id + 1]
+            postings = self._postings[start:end]
+            tf = self._term_counts[start:end]
+            scores[postings] += self._idf[term_id] * tf * (K1 + 1) / (tf + self._norm[postings])
+        return scores
+
+    def search(self, query, k=10, papers=None):
+        """
+        :param papers: Optional paper indices to restrict the search to.
+        :return: Up to k (passage id, score) pairs with a positive score, best first.
+        """
+        scores = self.scores(query)
+        if papers is not None:
+            allowed = np.zeros(len(self.documents), dtype=bool)
+            allowed[list(papers)] = True
+            scores[~allowed[[paper for paper, _, _, _ in self.passages]]] = 0.0
+        k = min(k, int(np.count_nonzero(scores > 0)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(passage_id), float(scores[passage_id])) for passage_id in top]
+
+    def select(self, queries, max_tokens, papers=None, k=10):
+        """
+        Picks passages for a prompt: the best passages of each query in turn, round robin, until
+        max_tokens (measured by count_tokens, like the prompt planner) are used, so every query is covered.
+
+        :param queries: Query strings, e.g. a section heading and focus, or one per part of a report.
+        :param papers: Optional paper indices to draw from.
+        :return: Selected passage ids in paper and reading order.
+        """
+        rankings = [[passage_id for passage_id, _ in self.search(query, k, papers)] for query in queries]
+        selected = []
+        used = 0
+        for rank in range(k):
+            for ranking in rankings:
+                if rank >= len(ranking) or ranking[rank] in selected:
+                    continue
+                tokens = count_tokens(self.text(ranking[rank]))
+                if used + tokens > max_tokens:
+                    continue
+                selected.append(ranking[rank])
+                used += tokens
+        return sorted(selected, key=lambda passage_id: (self.passages[passage_id][0], self.passages[passage_id][2]))
+
+    def excerpt(self, passage_ids, paper):
+        """Joins the selected passages of one paper, each under its region label, for a prompt."""
+        return "\n\n".join(
+            f"[{self.passages[passage_id][1]}] {self.text(passage_id)}"
+            for passage_id in passage_ids if self.passages[passage_id][0] == paper
+        )
@@ -1,18 +1,330 @@
 #pdf_extractor.py
 
-import fitz  # PyMuPDF
-from pathlib import Path
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from src.utils.disk_cache import get_cache, sha256_hex
+from src.utils.structure_parser import StructureParser, clip_metadata
+
+logger = logging.getLogger(__name__)
+
+# A document needs at least this many pages per worker before splitting it is worth a process.
+MIN_PAGES_PER_WORKER = 16
+
+# Cache namespace; bumped whenever the page text or metadata layout changes.
+EXTRACTION_CACHE = "extractions-v3"
+
+
+def _default_workers(jobs, max_workers=None):
+    """Returns the number of worker processes to use for the given number of jobs."""
+    return max(1, min(jobs, max_workers or os.cpu_count() or 1))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _process_pool():
+    """
+    Returns the process-wide pool of extraction workers, created on first use with one worker per CPU.
+    Its workers start once and serve every later job (e.g. each Streamlit rerun). They are started by a
+    fork server, or spawned where there is none, so the caller's process (such as the Streamlit server
+    with its threads) is never forked.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _map(fn, workers, *iterables):
+    """
+    Calls fn over the iterables, like map, with up to workers calls at once in the shared worker pool;
+    one worker runs them in this process. If the pool breaks (a worker died), it is replaced for later
+    calls and this one runs in this process.
+    :return: List of the results, in order.
+    """
+    calls = list(zip(*iterables))
+    if workers == 1:
+        return [fn(*args) for args in calls]
+    pool = _process_pool()
+    results = [None] * len(calls)
+    pending = {}
+    try:
+        for index, args in enumerate(calls):
+            if len(pending) == workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+            pending[pool.submit(fn, *args)] = index
+        for future, index in pending.items():
+            results[index] = future.result()
+    except BrokenProcessPool as e:
+        logger.warning(f"Extraction worker pool broke ({e}); extracting in this process")
+        _discard_pool(pool)
+        return [fn(*args) for args in calls]
+    return results
+
+
+def _discard_pool(pool):
+    """Shuts down a broken pool, so that the next call starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def is_path(source):
+    """Tells whether a PDF source is a file path rather than an in-memory buffer."""
+    return isinstance(source, (str, os.PathLike))
+
+
+def source_name(source):
+    """Returns a printable name for a PDF source: its path, its file name, or "<memory>"."""
+    if is_path(source):
+        return os.fspath(source)
+    return getattr(source, "name", "<memory>")
+
+
+def read_pdf(source):
+    """
+    Returns the raw bytes of a PDF source without touching the disk for in-memory sources.
+
+    :param source: A file path, a bytes/bytearray/memoryview buffer, or an in-memory file
+                   such as io.BytesIO or a Streamlit UploadedFile.
+    """
+    if is_path(source):
+        with open(source, "rb") as f:
+            return f.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    if hasattr(source, "getbuffer"):
+        return source.getbuffer()  # Zero-copy view of an in-memory file
+    # Other file objects are read from the start and rewound, so the same upload can be read again
+    seekable = getattr(source, "seekable", lambda: False)()
+    if seekable:
+        source.seek(0)
+    data = source.read()
+    if seekable:
+        source.seek(0)
+    return data
+
+
+def _picklable(data):
+    """memoryviews cannot be sent to worker processes, so they are copied into bytes."""
+    return bytes(data) if isinstance(data, memoryview) else data
+
+
+def open_pdf(data):
+    """Opens a PDF from its raw bytes with PyMuPDF's stream API; PyMuPDF is imported on the first call."""
+    import fitz  # PyMuPDF
+    return fitz.open(stream=data, filetype="pdf")
+
+
+def page_spans(page):
+    """Returns a page's text as PyMuPDF's "dict" of blocks, lines and spans with their fonts."""
+    import fitz  # PyMuPDF
+    return page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
+
+
+def _iter_page_texts(doc, parser, start=0, stop=None):
+    """
+    Lazily yields the text of pages [start, stop) of an open document,
+    feeding each page's spans to the structure parser on the way.
+    """
+    stop = doc.page_count if stop is None else min(stop, doc.page_count)
+    for page_number in range(start, stop):
+        yield parser.add_page(page_spans(doc[page_number]))
+
+
+def _extract_page_range(data, start=0, stop=None, budget=None):
+    """
+    Extracts the text of pages [start, stop) from the bytes of a PDF.
+    Module-level so that it can be shipped to worker processes.
+
+    :param budget: Optional TextBudget; extraction stops once it is met.
+    :return: Tuple of (list of page texts, whether every page up to stop was extracted,
+             StructureParser holding the structure of the extracted pages).
+    """
+    doc = open_pdf(data)
+    try:
+        parser = StructureParser()
+        page_texts = _iter_page_texts(doc, parser, start, stop)
+        pages = list(budget.fit(page_texts) if budget else page_texts)
+        end = doc.page_count if stop is None else min(stop, doc.page_count)
+        return pages, start + len(pages) == end, parser
+    finally:
+        doc.close()
+
+
+def _extract_document(data, budget=None, name="<memory>"):
+    """
+    Extracts and parses a whole PDF in a worker; failures are logged and yield no pages.
+    :return: Tuple of (page texts or None, complete, metadata).
+    """
+    try:
+        pages, complete, parser = _extract_page_range(data, budget=budget)
+        return pages, complete, parser.metadata()
+    except Exception as e:
+        logger.error(f"Failed to extract text from {name}: {e}")
+        return None, False, {}
+
+
+def _covers(record, budget):
+    """Checks whether a cached record holds enough pages for a caller's budget."""
+    return record.get("complete") or (budget is not None and budget.is_met_by(record["pages"]))
+
 
 class PDFExtractor:
-    """Extracts text from PDF files using LangChain's PyPDFLoader."""
+    """Extracts text from PDF files with PyMuPDF, spreading the work over a process pool."""
 
     @staticmethod
-    def extract_text(pdf_path):
-        """Extracts text from a PDF using PyMuPDF (fallback for LangChain PDFLoader issues)."""
-        doc = fitz.open(pdf_path)
-        text = "\n".join(page.get_text() for page in doc)
-        doc.close()
-        return text
+    def get_cache():
+        """Returns the on-disk extraction cache shared by every extraction path."""
+        return get_cache(EXTRACTION_CACHE)
+
+    @staticmethod
+    def extract_text(pdf_path, max_workers=None):
+        """
+        Extracts text from a PDF using PyMuPDF.
+        Long documents are split into page ranges that are extracted in parallel.
+
+        :param pdf_path: Path of the PDF file, or the PDF itself as bytes or an in-memory file.
+        :param max_workers: Maximum number of worker processes (defaults to the CPU count).
+        :return: Extracted text, pages separated by newlines.
+        """
+        data = read_pdf(pdf_path)
+        key = sha256_hex(data)
+        cache = PDFExtractor.get_cache()
+        record = cache.get(key)
+        if record is not None and record.get("complete"):
+            return "\n".join(record["pages"])
+
+        with open_pdf(data) as doc:
+            page_count = doc.page_count
+
+        workers = _default_workers(page_count // MIN_PAGES_PER_WORKER, max_workers)
+        if workers == 1:
+            pages, _, parser = _extract_page_range(data)
+        else:
+            step = -(-page_count // workers)  # ceiling division
+            starts = range(0, page_count, step)
+            data = _picklable(data)
+            chunks = _map(_extract_page_range, workers, [data] * len(starts), starts, [start + step for start in starts])
+            pages = []
+            parser = StructureParser()
+            for chunk, _, chunk_parser in chunks:
+                pages.extend(chunk)
+                parser.merge(chunk_parser)
+
+        cache.set(key, {"pages": pages, "complete": True, "metadata": parser.metadata()})
+        return "\n".join(pages)
+
+    @staticmethod
+    def iter_pages(pdf_path, budget=None):
+        """
+        Lazily yields the text of each page of a PDF, stopping once the budget is met.
+        Pages are served from the extraction cache when possible; otherwise only the
+        pages actually consumed are parsed, and they are cached for later calls.
+
+        :param pdf_path: Path of the PDF file, or the PDF itself as bytes or an in-memory file.
+        :param budget: Optional TextBudget limiting characters, tokens or pages.
+        """
+        data = read_pdf(pdf_path)
+        key = sha256_hex(data)
+        cache = PDFExtractor.get_cache()
+        record = cache.get(key)
+        if record is not None and _covers(record, budget):
+            yield from (budget.fit(record["pages"]) if budget else record["pages"])
+            return
+
+        doc = open_pdf(data)
+        parser = StructureParser()
+        pages = []
+        try:
+            page_texts = _iter_page_texts(doc, parser)
+            for text in (budget.fit(page_texts) if budget else page_texts):
+                pages.append(text)
+                yield text
+        finally:
+            complete = len(pages) == doc.page_count
+            doc.close()
+            # Runs even when the consumer stops early, so the pages parsed so far are kept.
+            if record is None or len(pages) > len(record["pages"]):
+                cache.set(key, {"pages": pages, "complete": complete, "metadata": parser.metadata()})
+
+    @staticmethod
+    def extract_documents(pdf_paths, max_workers=None, budget=None):
+        """
+        Extracts several PDFs, one document per worker process.
+        Documents already in the extraction cache are not parsed again.
+
+        :param pdf_paths: List of PDF sources: file paths, byte buffers or in-memory files.
+        :param max_workers: Maximum number of worker processes (defaults to the CPU count).
+        :param budget: Optional per-document TextBudget.
+        :return: List of records in the same order as pdf_paths. Each record is a dictionary
+                 with "hash" (SHA-256 of the PDF bytes), "pages", "complete" and "metadata"
+                 (title, author, section offsets and page offsets, see StructureParser).
+                 Documents that fail to open yield a record without pages.
+        """
+        cache = PDFExtractor.get_cache()
+        records = []
+        misses = []
+        for pdf_path in pdf_paths:
+            try:
+                data = read_pdf(pdf_path)
+            except OSError as e:
+                logger.error(f"Failed to read {source_name(pdf_path)}: {e}")
+                records.append({"hash": None, "pages": [], "complete": False, "metadata": {}})
+                continue
+            key = sha256_hex(data)
+            record = cache.get(key)
+            if record is not None and _covers(record, budget):
+                logger.info(f"Extraction cache hit for {source_name(pdf_path)}")
+                record["hash"] = key
+                if budget is not None:
+                    record["pages"] = list(budget.fit(record["pages"]))
+                text_length = sum(len(page) + 1 for page in record["pages"]) - 1
+                record["metadata"] = clip_metadata(record["metadata"], text_length)
+                records.append(record)
+            else:
+                records.append(None)
+                misses.append((len(records) - 1, pdf_path, key, data))
+
+        if misses:
+            workers = _default_workers(len(misses), max_workers)
+            budgets = [budget] * len(misses)
+            names = [source_name(pdf_path) for _, pdf_path, _, _ in misses]
+            sources = [data if workers == 1 else _picklable(data) for *_, data in misses]
+            results = _map(_extract_document, workers, sources, budgets, names)
+
+            for (index, _, key, _), (pages, complete, metadata) in zip(misses, results):
+                if pages is None:
+                    records[index] = {"hash": key, "pages": [], "complete": False, "metadata": {}}
+                    continue
+                record = {"pages": pages, "complete": complete, "metadata": metadata}
+                cache.set(key, record)
+                records[index] = dict(record, hash=key)
+
+        return records
+
+    @staticmethod
+    def extract_texts(pdf_paths, max_workers=None, budget=None):
+        """
+        Extracts text from several PDFs, one document per worker process.
+
+        :return: List of extracted texts in the same order as pdf_paths.
+                 Documents that fail to open yield an empty string.
+        """
+        records = PDFExtractor.extract_documents(pdf_paths, max_workers, budget)
+        return ["\n".join(record["pages"]) for record in records]
 
 # Example usage:
 if __name__ == "__main__":
@@ -0,0 +1,170 @@
+#prompt_budget.py
+
+import os
+import logging
+import functools
+
+from src.utils.text_budget import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Llama 3 tokenizer shipped with the code, shared by the default model deepseek-r1-distill-llama-70b, so token counts
+# are measured without any download.
+BUNDLED_TOKENIZER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llama3_tokenizer.json")
+# Local tokenizer.json path or Hugging Face repo id of the model's tokenizer; token counts are estimated from characters
+# when it is set but empty. Repo ids are only read from the local Hugging Face cache: fetch one ahead of time with
+# python -m src.utils.prompt_budget --download.
+TOKENIZER = os.getenv("BIBTEX_AI_TOKENIZER", BUNDLED_TOKENIZER)
+# Context window of the model and the part of it kept free for the response.
+CONTEXT_WINDOW = int(os.getenv("BIBTEX_AI_CONTEXT_WINDOW", "131072"))
+OUTPUT_RESERVE = int(os.getenv("BIBTEX_AI_OUTPUT_RESERVE", "8192"))
+# Planning rounds before giving up on a prompt that still overflows after shrinking.
+MAX_PLAN_ROUNDS = 4
+
+
+class PromptTooLargeError(ValueError):
+    """Raised when a prompt cannot be made to fit the model's context window."""
+
+
+@functools.lru_cache(maxsize=None)
+def get_tokenizer(name=TOKENIZER):
+    """
+    Loads a tokenizers.Tokenizer from a local tokenizer.json or the local Hugging Face cache, once
+    per process. It never downloads: counting tokens must not wait on the network.
+    :return: The tokenizer, or None if it is unavailable (token counts then fall back to estimates).
+    """
+    if not name:
+        return None
+    try:
+        from tokenizers import Tokenizer
+        if os.path.isfile(name):
+            return Tokenizer.from_file(name)
+        from huggingface_hub import hf_hub_download
+        return Tokenizer.from_file(hf_hub_download(name, "tokenizer.json", local_files_only=True))
+    except Exception as e:
+        logger.warning(
+            f"Tokenizer {name} unavailable, estimating tokens from characters instead "
+            f"(python -m src.utils.prompt_budget --download fetches it): {e}"
+        )
+        return None
+
+
+def download_tokenizer(name=TOKENIZER):
+    """Fetches a tokenizer from the Hugging Face Hub into the local cache, for get_tokenizer to load offline."""
+    from huggingface_hub import hf_hub_download
+    return hf_hub_download(name, "tokenizer.json")
+
+
+def count_tokens(text):
+    """Counts the tokens of a text with the model's tokenizer (estimated if it is unavailable)."""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def truncate_tokens(text, max_tokens):
+    """Returns the longest prefix of a text that is at most max_tokens tokens long."""
+    if max_tokens <= 0:
+        return ""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+    if len(offsets) <= max_tokens:
+        return text
+    return text[:offsets[max_tokens - 1][1]]
+
+
+def allocate(sizes, total, cap=None):
+    """
+    Splits a token allowance fairly across items: every item gets an equal share, and
+    what smaller items leave unused goes to the larger ones.
+
+    :param sizes: Token count each item would use in full.
+    :param total: Tokens available for all items together.
+    :param cap: Optional maximum per item.
+    :return: List of allowances, in the order of sizes.
+    """
+    wants = [min(size, cap) if cap is not None else size for size in sizes]
+    allowances = [0] * len(wants)
+    remaining = max(total, 0)
+    pending = sorted(range(len(wants)), key=lambda i: wants[i])
+    while pending:
+        share = remaining // len(pending)
+        index = pending.pop(0)
+        allowances[index] = min(wants[index], share)
+        remaining -= allowances[index]
+    return allowances
+
+
+class PromptPlanner:
+    """
+    Fits an LLM prompt into the model's context window by measured token counts.
+
+    The instructions (everything but paper content) are measured first; the rest of the
+    window, minus the response reserve, is split across the papers. If the assembled
+    prompt still overflows, the paper allowances shrink by the overflow and the prompt is
+    rebuilt, all before any network call.
+    """
+
+    def __init__(self, context_window=CONTEXT_WINDOW, output_reserve=OUTPUT_RESERVE):
+        self.context_window = context_window
+        self.output_reserve = output_reserve
+
+    @property
+    def prompt_limit(self):
+        return self.context_window - self.output_reserve
+
+    def plan(self, build, contents, per_paper_cap=None):
+        """
+        :param build: Callable taking a list of per-paper contents and returning the full prompt.
+        :param contents: Full content of each paper.
+        :param per_paper_cap: Optional maximum number of content tokens per paper.
+        :return: Tuple of (prompt, report) where the report holds "context_window", "output_reserve",
+                 "instruction_tokens", "paper_tokens" (allowance per paper), "planned_tokens" and "actual_tokens".
+        :raises PromptTooLargeError: If the instructions alone leave no room in the context window.
+        """
+        instruction_tokens = count_tokens(build([""] * len(contents)))
+        if instruction_tokens >= self.prompt_limit:
+            raise PromptTooLargeError(
+                f"Prompt instructions take {instruction_tokens} tokens, over the {self.prompt_limit}-token limit "
+                f"({self.context_window}-token context minus {self.output_reserve} reserved for the response)"
+            )
+
+        sizes = [count_tokens(content) for content in contents]
+        available = self.prompt_limit - instruction_tokens
+        for _ in range(MAX_PLAN_ROUNDS):
+            allowances = allocate(sizes, available, per_paper_cap)
+            prompt = build([truncate_tokens(content, allowance) for content, allowance in zip(contents, allowances)])
+            actual = count_tokens(prompt)
+            if actual <= self.prompt_limit:
+                report = {
+                    "context_window": self.context_window,
+                    "output_reserve": self.output_reserve,
+                    "instruction_tokens": instruction_tokens,
+                    "paper_tokens": allowances,
+                    "planned_tokens": instruction_tokens + sum(allowances),
+                    "actual_tokens": actual,
+                }
+                logger.info(
+                    f"Prompt plan: {report['planned_tokens']} planned / {actual} actual tokens "
+                    f"({instruction_tokens} instructions, papers {allowances}), limit {self.prompt_limit}"
+                )
+                return prompt, report
+            available -= actual - self.prompt_limit  # Tokens merge across boundaries; shrink by the overflow
+        raise PromptTooLargeError(
+            f"Prompt still needs {actual} tokens after {MAX_PLAN_ROUNDS} rounds of shrinking; limit is {self.prompt_limit}"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prompt token budgeting")
+    parser.add_argument("--download", action="store_true", help="fetch the BIBTEX_AI_TOKENIZER tokenizer into the local cache")
+    args = parser.parse_args()
+    if args.download:
+        if not TOKENIZER or os.path.isfile(TOKENIZER):
+            parser.error("set BIBTEX_AI_TOKENIZER to a Hugging Face repo id to download it")
+        print(f"Tokenizer {TOKENIZER} saved to {download_tokenizer()}")
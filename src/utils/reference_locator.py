@@ -0,0 +1,102 @@
+#reference_locator.py
+
+import re
+
+# "References", "7. References", "REFERENCES", "Bibliography", "Works Cited", ...
+REFERENCE_HEADING = re.compile(
+    r"^\s*(?:[\dIVXLC]+\.?\s+)?(references|bibliography|works cited|literature cited|reference list)\s*:?\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Start of a numbered bibliography entry: "[12] ...", "12. A. Author", "12 A. Author".
+NUMBERED_ENTRY = re.compile(r"^[ \t]*(?:\[\d{1,4}\]|\d{1,4}\.?[ \t]+[A-Z])", re.MULTILINE)
+
+# Share of non-empty lines starting a numbered entry above which a page reads as a bibliography page.
+MIN_ENTRY_DENSITY = 0.15
+# Without a heading, a paper's last pages are searched for dense reference lists.
+TRAILING_PAGES = 4
+
+
+def entry_density(text):
+    """Returns the share of non-empty lines of a text that start a numbered bibliography entry."""
+    lines = sum(1 for line in text.splitlines() if line.strip())
+    return len(NUMBERED_ENTRY.findall(text)) / lines if lines else 0.0
+
+
+def reference_span(pages, sections=None):
+    """
+    Finds the bibliography of a paper without calling an LLM.
+
+    The last "References"/"Bibliography" heading marks the start; following pages are
+    included while their numbered-entry density stays high, so appendices are left out.
+    Without a heading, the trailing run of dense pages is used.
+
+    :param pages: List of page texts.
+    :param sections: Optional section offsets from StructureParser, used to find the heading.
+    :return: (start, end) offsets of the bibliography in "\\n".join(pages), or None if none was found.
+    """
+    spans = []
+    offset = 0
+    for page in pages:
+        spans.append((offset, offset + len(page)))
+        offset += len(page) + 1
+
+    start = None
+    for name, (section_start, _) in (sections or {}).items():
+        if REFERENCE_HEADING.match(name):
+            start = section_start
+    if start is None:
+        headings = list(REFERENCE_HEADING.finditer("\n".join(pages)))
+        if headings:
+            start = headings[-1].end()
+
+    if start is not None:
+        # Page holding the heading, then every following page that still reads as a bibliography.
+        end = None
+        for page, (_, page_end) in zip(pages, spans):
+            if page_end >= start:
+                if end is None or entry_density(page) >= MIN_ENTRY_DENSITY:
+                    end = page_end
+                else:
+                    break
+        return (start, end) if end is not None else None
+
+    trailing = []
+    for index in reversed(range(max(0, len(pages) - TRAILING_PAGES), len(pages))):
+        if entry_density(pages[index]) < MIN_ENTRY_DENSITY:
+            if trailing:
+                break
+            continue
+        trailing.append(index)
+    return (spans[trailing[-1]][0], spans[trailing[0]][1]) if trailing else None
+
+
+def locate_references(pages, sections=None):
+    """
+    Returns the bibliography text of a paper located by reference_span, or "" if none was found.
+    """
+    span = reference_span(pages, sections)
+    return "\n".join(pages)[span[0]:span[1]].strip() if span else ""
+
+
+def chunk_references(text, max_chars):
+    """
+    Splits a bibliography into chunks of at most max_chars characters, cutting only
+    between numbered entries (a single oversized entry becomes its own chunk).
+    """
+    if len(text) <= max_chars:
+        return [text] if text else []
+    starts = [match.start() for match in NUMBERED_ENTRY.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    entries = [text[a:b] for a, b in zip(starts, starts[1:] + [len(text)])]
+
+    chunks = []
+    current = ""
+    for entry in entries:
+        if current and len(current) + len(entry) > max_chars:
+            chunks.append(current.strip())
+            current = ""
+        current += entry
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
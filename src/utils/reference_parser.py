@@ -0,0 +1,166 @@
+#reference_parser.py
+
+import re
+import unicodedata
+
+from src.utils.reference_locator import NUMBERED_ENTRY
+
+# Entry number at the start of an entry: "[12]" or "12." / "12".
+ENTRY_NUMBER = re.compile(r"^\s*(?:\[(\d{1,4})\]|(\d{1,4})\.?)\s*")
+YEAR = re.compile(r"\b((?:19|20)\d{2})[a-z]?\b")
+
+# IEEE: A. Smith, B. Jones, and C. Lee, "Title," in Proc. Venue, 2017, pp. 1-9.
+IEEE_ENTRY = re.compile(r'^(?P<authors>.+?),?\s+["“](?P<title>.+?)[,.]?["”]\s*,?\s*(?P<rest>.*)$')
+# ACM: Alice Smith and Bob Jones. 2017. Title. In Proceedings of Venue. 1-9.
+ACM_ENTRY = re.compile(r"^(?P<authors>.+?)\.\s+(?P<year>(?:19|20)\d{2})[a-z]?\.\s+(?P<title>.+?[^A-Z])[.?!]\s+(?P<rest>.*)$")
+# Author-year: Smith, A., & Jones, B. (2017). Title. Venue, 1-9.
+APA_ENTRY = re.compile(r"^(?P<authors>.+?)\s+\((?P<year>(?:19|20)\d{2})[a-z]?\)\.\s+(?P<title>.+?[^A-Z])[.?!]\s+(?P<rest>.*)$")
+# Last resort: Authors. Title. Venue... (the author list ends at the first period not closing an initial)
+GENERIC_ENTRY = re.compile(r"^(?P<authors>.+?(?<![A-Z]))\.\s+(?P<title>[^.]{8,}?)\.\s+(?P<rest>.*)$")
+
+# An author list is made of capitalised names, initials and separators.
+AUTHOR_TOKEN = re.compile(r"^(?:[A-Z][\w'’\-]*\.?|[A-Z]\.(?:-?[A-Z]\.)*|and|&|et|al\.?|van|von|der|de|da|di|le|la)$")
+
+# Share of recognisable author tokens above which an author list is accepted.
+MIN_AUTHOR_TOKEN_SHARE = 0.8
+
+# Characters of extracted text that are special in LaTeX, and how they are written in a \bibitem line.
+LATEX_SPECIALS = {
+    "\\": r"\textbackslash{}", "&": r"\&", "%": r"\%", "_": r"\_", "#": r"\#", "$": r"\$", "{": r"\{", "}": r"\}",
+}
+LATEX_SPECIAL = re.compile("|".join(re.escape(char) for char in LATEX_SPECIALS))
+
+
+def split_entries(text):
+    """
+    Splits a numbered bibliography into entries, re-joining wrapped lines.
+    :return: List of (entry number or None, entry text) tuples.
+    """
+    starts = [match.start() for match in NUMBERED_ENTRY.finditer(text)]
+    entries = []
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        raw = text[start:end].strip()
+        # Drop page numbers, re-join words hyphenated across a line break, then collapse the remaining breaks.
+        raw = re.sub(r"\n[ \t]*\d{1,4}[ \t]*(?=\n|$)", "", raw)
+        raw = re.sub(r"([a-z])-\n([a-z])", r"\1\2", raw)
+        raw = re.sub(r"\s+", " ", raw)
+        match = ENTRY_NUMBER.match(raw)
+        number = int(match.group(1) or match.group(2)) if match else None
+        entries.append((number, raw[match.end():] if match else raw))
+    return entries
+
+
+def _plausible_authors(authors):
+    tokens = authors.replace(",", " ").split()
+    if not tokens or len(authors) > 400:
+        return False
+    return sum(bool(AUTHOR_TOKEN.match(token)) for token in tokens) / len(tokens) >= MIN_AUTHOR_TOKEN_SHARE
+
+
+def _clean_venue(rest, year):
+    """Drops the year and leftover separators from the part of an entry after the title."""
+    rest = re.sub(r"^(?:in|In)\s+", "", rest.strip())
+    if year:
+        rest = re.sub(rf"[(\s,.]*\b{year}[a-z]?\b[)]?", "", rest, count=1)
+    rest = re.sub(r"\s*,\s*(?=,|$)", "", rest)
+    return rest.strip(" ,.;")
+
+
+def parse_entry(entry):
+    """
+    Parses one bibliography entry with the IEEE, ACM, author-year and generic patterns.
+    :return: Dictionary with "authors", "title", "venue", "year" and "confidence" (0-1).
+    """
+    for pattern, weight in ((IEEE_ENTRY, 1.0), (ACM_ENTRY, 1.0), (APA_ENTRY, 1.0), (GENERIC_ENTRY, 0.6)):
+        match = pattern.match(entry)
+        if not match:
+            continue
+        fields = match.groupdict()
+        authors = fields["authors"].strip(" ,")
+        if not re.search(r"\b(?:[A-Z]|al)\.$", authors):  # Keep the period of a trailing initial or "et al."
+            authors = authors.rstrip(".")
+        title = fields["title"].strip(" ,.")
+        year = fields.get("year")
+        if not year:
+            years = YEAR.findall(fields["rest"]) or YEAR.findall(entry)
+            year = years[-1] if years else ""
+        confidence = weight * (
+            0.4 * bool(title)
+            + 0.3 * _plausible_authors(authors)
+            + 0.3 * bool(year)
+        )
+        return {
+            "authors": authors,
+            "title": title,
+            "venue": _clean_venue(fields["rest"], year),
+            "year": year,
+            "confidence": confidence,
+        }
+    return {"authors": "", "title": "", "venue": "", "year": "", "confidence": 0.0}
+
+
+def first_author_surname(authors):
+    """Returns the ASCII surname of the first author in an author list, or "" if there is none."""
+    first_author = re.split(r",\s*|\s+and\s+|\s*&\s*", authors, maxsplit=1)[0].split()
+    names = [
+        name for name in first_author
+        if not re.fullmatch(r"(?:[A-Z]\.-?)+", name) and name.rstrip(".") not in ("et", "al")
+    ]
+    surname = names[-1] if names else ""
+    if len(first_author) == 1:  # "Smith, A." style lists put the surname first
+        surname = first_author[0]
+    surname = unicodedata.normalize("NFKD", surname).encode("ascii", "ignore").decode()
+    return re.sub(r"[^A-Za-z]", "", surname)
+
+
+def citation_key(authors, year):
+    """Builds a key such as Smith2017 from the first author's surname and the year."""
+    surname = first_author_surname(authors) or "Ref"
+    return surname[0].upper() + surname[1:] + year
+
+
+def escape_latex(text):
+    """Escapes the characters of plain text that LaTeX would read as commands, e.g. "AI & ML" -> "AI \\& ML"."""
+    return LATEX_SPECIAL.sub(lambda match: LATEX_SPECIALS[match.group()], text)
+
+
+def to_bibitem(parsed, key):
+    """
+    Formats a parsed entry like the Gemini prompt asks for: \\bibitem{key} Author(s), "Title," Venue, year.
+    The fields are plain text from the PDF, so LaTeX special characters in them are escaped.
+    """
+    parts = [f'{escape_latex(parsed["authors"])}, "{escape_latex(parsed["title"])},"']
+    if parsed["venue"]:
+        parts.append(f'{escape_latex(parsed["venue"])},')
+    parts.append(f'{parsed["year"]}.' if parsed["year"] else "")
+    return f"\\bibitem{{{key}}} " + " ".join(part for part in parts if part).rstrip(",")
+
+
+def parse_bibliography(text):
+    """
+    Parses a numbered bibliography without an LLM.
+
+    The paper's confidence is the mean entry confidence, scaled by how consistently
+    the entries are numbered 1, 2, 3, ... (a broken sequence hints at a bad split).
+
+    :return: Tuple of (list of \\bibitem lines, confidence between 0 and 1).
+    """
+    entries = split_entries(text)
+    if not entries:
+        return [], 0.0
+
+    references = []
+    total = 0.0
+    for number, entry in entries:
+        parsed = parse_entry(entry)
+        total += parsed["confidence"]
+        if parsed["title"]:
+            references.append(to_bibitem(parsed, citation_key(parsed["authors"], parsed["year"])))
+
+    numbers = [number for number, _ in entries]
+    sequential = sum(
+        1 for previous, current in zip(numbers, numbers[1:])
+        if previous is not None and current == previous + 1
+    )
+    ordering = (sequential + 1) / len(entries)
+    return references, (total / len(entries)) * ordering
@@ -0,0 +1,185 @@
+#structure_parser.py
+
+import re
+from collections import Counter, namedtuple
+
+# Span flag bit PyMuPDF sets for bold text.
+BOLD_FLAG = 16
+
+# Lines longer than this are body text, never a title, author or heading.
+MAX_HEADING_CHARS = 100
+
+# Fallback heading pattern for documents set in a single font: "1 Introduction", "2.3. Results", "IV. Discussion".
+NUMBERED_HEADING = re.compile(r"^(\d+(\.\d+)*\.?|[IVXLC]+\.)\s+[A-Z]")
+CAPTION = re.compile(r"^(fig\.?|figure|table|algorithm)\s*\d", re.IGNORECASE)
+UNNUMBERED_HEADINGS = {
+    "abstract", "introduction", "background", "related work", "method", "methods", "methodology",
+    "experiments", "results", "discussion", "conclusion", "conclusions", "acknowledgments",
+    "acknowledgements", "references", "bibliography", "appendix",
+}
+
+
+def is_section_heading(text):
+    """True for a numbered heading or a well-known section name, e.g. "2.1 Results" or "References:"."""
+    return bool(NUMBERED_HEADING.match(text)) or text.lower().rstrip(":") in UNNUMBERED_HEADINGS
+
+
+# A short, single-style text line remembered as a title/author/heading candidate.
+# offset and length locate the whole line (without its newline) within its page's text.
+Line = namedtuple("Line", "page offset length size bold text")
+
+
+class StructureParser:
+    """
+    Single-pass parser that builds page text from PyMuPDF's "dict" output and detects
+    the title, authors and section headings from span font sizes and flags.
+
+    Pages are fed in order with add_page. Only short, single-style lines are remembered
+    as heading candidates, so the parser never re-splits the document text. Sections are
+    reported as (start, end) character offsets into the pages joined with newlines.
+    """
+
+    def __init__(self):
+        self.page_lengths = []
+        self.font_sizes = Counter()  # Rounded font size -> number of characters set in it
+        self.lines = []  # Line tuples of candidate lines
+
+    def add_page(self, page_dict):
+        """
+        Consumes one page of page.get_text("dict") output.
+        :return: The page text, one text line per line.
+        """
+        page_index = len(self.page_lengths)
+        parts = []
+        offset = 0
+        for block in page_dict["blocks"]:
+            if block.get("type", 0) != 0:
+                continue
+            for line in block["lines"]:
+                text = "".join(span["text"] for span in line["spans"])
+                spans = [span for span in line["spans"] if span["text"].strip()]
+                for span in spans:
+                    self.font_sizes[round(span["size"], 1)] += len(span["text"])
+                stripped = text.strip()
+                if spans and len(stripped) <= MAX_HEADING_CHARS:
+                    self.lines.append(Line(
+                        page_index,
+                        offset,
+                        len(text),
+                        round(max(span["size"] for span in spans), 1),
+                        all(span["flags"] & BOLD_FLAG for span in spans),
+                        stripped,
+                    ))
+                parts.append(text)
+                parts.append("\n")
+                offset += len(text) + 1
+        self.page_lengths.append(offset)
+        return "".join(parts)
+
+    def merge(self, other):
+        """Appends the pages parsed by another parser (e.g. a later page range from a worker)."""
+        shift = len(self.page_lengths)
+        self.page_lengths.extend(other.page_lengths)
+        self.font_sizes.update(other.font_sizes)
+        self.lines.extend(line._replace(page=line.page + shift) for line in other.lines)
+
+    def page_spans(self):
+        """Returns the (start, end) offset of every page in the pages joined with newlines."""
+        spans = []
+        start = 0
+        for length in self.page_lengths:
+            spans.append((start, start + length))
+            start += length + 1
+        return spans
+
+    def metadata(self):
+        """
+        Classifies the remembered lines.
+        :return: Dictionary with "title", "author", "sections" (heading -> (start, end))
+                 and "page_spans".
+        """
+        page_spans = self.page_spans()
+        text_length = page_spans[-1][1] if page_spans else 0
+        body_size = self.font_sizes.most_common(1)[0][0] if self.font_sizes else 0.0
+
+        def absolute(line):
+            return page_spans[line.page][0] + line.offset
+
+        # Title: the consecutive lines set in the largest font on the first page, or its first line when nothing is
+        # set larger than the body text (the whole page would match).
+        first_page = [line for line in self.lines if line.page == 0]
+        title_lines = []
+        if first_page:
+            title_size = max(line.size for line in first_page)
+            start = next(i for i, line in enumerate(first_page) if line.size == title_size)
+            for line in first_page[start:]:
+                if line.size != title_size or (title_lines and title_size <= body_size):
+                    break
+                title_lines.append(line)
+        title = " ".join(line.text for line in title_lines) or "Unknown"
+
+        # Authors: the non-bold lines after the title, up to the abstract, in one font size.
+        author_lines = []
+        if title_lines:
+            for line in first_page[first_page.index(title_lines[-1]) + 1:]:
+                if (
+                    line.bold
+                    or line.text.lower().startswith("abstract")
+                    or NUMBERED_HEADING.match(line.text)
+                    or (author_lines and line.size != author_lines[0].size)
+                    or len(author_lines) == 3
+                ):
+                    break
+                author_lines.append(line)
+        author = ", ".join(line.text for line in author_lines) or "Unknown"
+
+        headings = self._headings(body_size, title_lines + author_lines)
+
+        sections = {}
+        for i, line in enumerate(headings):
+            start = absolute(line) + line.length + 1
+            end = absolute(headings[i + 1]) if i + 1 < len(headings) else text_length
+            name = line.text
+            count = 2
+            while name in sections:
+                name = f"{line.text} ({count})"
+                count += 1
+            sections[name] = (min(start, end), end)
+
+        return {"title": title, "author": author, "sections": sections, "page_spans": page_spans}
+
+    def _headings(self, body_size, front_matter):
+        """Returns candidate lines that are section headings, in document order."""
+        def looks_like_heading(text):
+            return (
+                text[0].isalnum()
+                and not text.endswith((".", ",", ";"))
+                and not text.isdigit()
+                and not CAPTION.match(text)
+            )
+
+        styled = [
+            line for line in self.lines
+            if line not in front_matter
+            and looks_like_heading(line.text)
+            and (line.size > body_size * 1.05 or (line.bold and line.size >= body_size))
+        ]
+        if styled:
+            return styled
+        # Single-font documents: fall back to numbered or well-known heading names.
+        return [
+            line for line in self.lines
+            if line not in front_matter
+            and is_section_heading(line.text)
+        ]
+
+
+def clip_metadata(metadata, text_length):
+    """Restricts parsed metadata to the first text_length characters, e.g. after a budget cut."""
+    sections = {
+        name: (start, min(end, text_length))
+        for name, (start, end) in metadata.get("sections", {}).items()
+        if start < text_length
+    }
+    page_spans = [tuple(span) for span in metadata.get("page_spans", []) if span[0] < text_length]
+    return dict(metadata, sections=sections, page_spans=page_spans)
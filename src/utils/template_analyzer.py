@@ -0,0 +1,111 @@
+#template_analyzer.py
+
+import logging
+
+from src.utils.disk_cache import get_cache, sha256_hex
+from src.utils.pdf_extractor import open_pdf, page_spans, read_pdf, source_name
+from src.utils.structure_parser import StructureParser, is_section_heading
+
+logger = logging.getLogger(__name__)
+
+# Templates repeat their layout on every page, so only the first pages are analysed.
+MAX_TEMPLATE_PAGES = 6
+# Headings listed in the fingerprint; template bodies beyond this add nothing.
+MAX_SECTIONS = 20
+# Cache namespace; bumped whenever the fingerprint layout changes.
+TEMPLATE_CACHE = "templates-v3"
+
+
+def _count_columns(page_dict, page_width):
+    """
+    Estimates the text column count of a page from where its text blocks start and end.
+    Full-width blocks say nothing about columns, and narrow ones are page numbers or running heads.
+    """
+    blocks = [
+        block["bbox"] for block in page_dict["blocks"]
+        if block.get("type", 0) == 0
+        and page_width * 0.2 <= block["bbox"][2] - block["bbox"][0] < page_width * 0.6
+    ]
+    left = any(x1 <= page_width * 0.55 for _, _, x1, _ in blocks)
+    right = any(x0 >= page_width * 0.45 for x0, _, _, _ in blocks)
+    return 2 if left and right else 1
+
+
+class TemplateAnalyzer:
+    """Computes a compact structural fingerprint of a format-template PDF, cached per template hash."""
+
+    @staticmethod
+    def fingerprint(source):
+        """
+        Returns the fingerprint of a template, analysing it only on the first use of its content.
+
+        :param source: Template PDF as a file path, byte buffer or in-memory file.
+        :return: Dictionary with "hash", "kind" ("slides" or "document"), "pages", "columns",
+                 "body_font_size", "font_sizes", "heading_levels" and "section_order".
+        """
+        data = read_pdf(source)
+        key = sha256_hex(data)
+        cache = get_cache(TEMPLATE_CACHE)
+        fingerprint = cache.get(key)
+        if fingerprint is not None:
+            logger.info(f"Template fingerprint cache hit for {source_name(source)}")
+            return fingerprint
+
+        logger.info(f"Analysing template layout of {source_name(source)}")
+        parser = StructureParser()
+        columns = []
+        with open_pdf(data) as doc:
+            page_count = doc.page_count
+            width, height = (doc[0].rect.width, doc[0].rect.height) if page_count else (0, 0)
+            for page_number in range(min(page_count, MAX_TEMPLATE_PAGES)):
+                page_dict = page_spans(doc[page_number])
+                parser.add_page(page_dict)
+                columns.append(_count_columns(page_dict, width))
+
+        metadata = parser.metadata()
+        total_chars = sum(parser.font_sizes.values()) or 1
+        body_size = parser.font_sizes.most_common(1)[0][0] if parser.font_sizes else 0.0
+        # Only lines named like section headings count: a template's large or bold lines also hold its
+        # title, author names and affiliations, which must not reach the prompt
+        headings = [
+            line for line in parser.lines
+            if line.text in metadata["sections"] and is_section_heading(line.text)
+        ]
+        heading_styles = sorted({(line.size, line.bold) for line in headings}, reverse=True)
+
+        fingerprint = {
+            "hash": key,
+            "kind": "slides" if width > height else "document",
+            "pages": page_count,
+            "columns": max(set(columns), key=columns.count) if columns else 1,
+            "body_font_size": body_size,
+            "font_sizes": [
+                {"size": size, "share": round(chars / total_chars, 3)}
+                for size, chars in parser.font_sizes.most_common(5)
+            ],
+            "heading_levels": [
+                {"level": level, "size": size, "bold": bold}
+                for level, (size, bold) in enumerate(heading_styles, 1)
+            ],
+            "section_order": list(dict.fromkeys(line.text for line in headings))[:MAX_SECTIONS],
+        }
+        cache.set(key, fingerprint)
+        return fingerprint
+
+    @staticmethod
+    def describe(fingerprint):
+        """Renders a fingerprint as a short layout description for the LLM prompt."""
+        kind = "slide deck" if fingerprint["kind"] == "slides" else "document"
+        lines = [
+            f"Template layout: {fingerprint['columns']}-column {kind}, {fingerprint['pages']} page(s), "
+            f"body text {fingerprint['body_font_size']}pt."
+        ]
+        if fingerprint["heading_levels"]:
+            levels = ", ".join(
+                f"level {level['level']} at {level['size']}pt{' bold' if level['bold'] else ''}"
+                for level in fingerprint["heading_levels"]
+            )
+            lines.append(f"Heading hierarchy: {levels}.")
+        if fingerprint["section_order"]:
+            lines.append(f"Section order: {' > '.join(fingerprint['section_order'])}.")
+        return "\n".join(lines)
@@ -0,0 +1,70 @@
+#text_budget.py
+
+# Rough characters-per-token ratio for English prose, used when no tokenizer is supplied.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Estimates the token count of a text without loading a tokenizer."""
+    return -(-len(text) // CHARS_PER_TOKEN)  # ceiling division
+
+
+class TextBudget:
+    """
+    Limit on how much text a caller wants from a document, measured in characters,
+    tokens and/or pages. Extraction stops after the first page that meets any limit.
+    """
+
+    def __init__(self, max_chars=None, max_tokens=None, max_pages=None, count_tokens=estimate_tokens):
+        """
+        :param max_chars: Maximum number of characters.
+        :param max_tokens: Maximum number of tokens.
+        :param max_pages: Maximum number of pages.
+        :param count_tokens: Callable returning the token count of a text.
+                             Must be picklable when the budget is sent to worker processes.
+        """
+        self.max_chars = max_chars
+        self.max_tokens = max_tokens
+        self.max_pages = max_pages
+        self.count_tokens = count_tokens
+
+    def __repr__(self):
+        return f"TextBudget(max_chars={self.max_chars}, max_tokens={self.max_tokens}, max_pages={self.max_pages})"
+
+    def _usage(self, pages):
+        """Yields (page, met) pairs, where met tells whether the budget is met after the page."""
+        chars = tokens = count = 0
+        for text in pages:
+            count += 1
+            chars += len(text)
+            if self.max_tokens is not None:
+                tokens += self.count_tokens(text)
+            met = (
+                (self.max_pages is not None and count >= self.max_pages)
+                or (self.max_chars is not None and chars >= self.max_chars)
+                or (self.max_tokens is not None and tokens >= self.max_tokens)
+            )
+            yield text, met
+
+    def fit(self, pages):
+        """
+        Lazily yields whole pages from an iterable until the budget is met.
+        The source iterable is not advanced past the page that meets the budget.
+        """
+        for text, met in self._usage(pages):
+            yield text
+            if met:
+                return
+
+    def is_met_by(self, pages):
+        """Checks whether the given pages are enough to meet the budget."""
+        return any(met for _, met in self._usage(pages))
+
+    def scaled(self, factor):
+        """Returns a copy of the budget with its character and token limits multiplied by factor."""
+        return TextBudget(
+            max_chars=int(self.max_chars * factor) if self.max_chars is not None else None,
+            max_tokens=int(self.max_tokens * factor) if self.max_tokens is not None else None,
+            max_pages=self.max_pages,
+            count_tokens=self.count_tokens,
+        )
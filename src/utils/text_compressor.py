@@ -0,0 +1,186 @@
+#text_compressor.py
+
+import re
+import math
+import logging
+from collections import Counter
+
+from src.utils.reference_locator import REFERENCE_HEADING, reference_span
+from src.utils.text_budget import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Running headers and footers sit within this many non-empty lines of a page's top or bottom.
+EDGE_LINES = 3
+# An edge line is boilerplate when it recurs on at least this share of a paper's pages (and two pages or more).
+MIN_REPEAT_SHARE = 0.5
+# Raw extracted text shrinks by roughly this factor once compressed, so extraction budgets are widened by it.
+RAW_TEXT_HEADROOM = 1.5
+
+# "12", "Page 3", "3 / 10", "4 of 12"
+PAGE_NUMBER = re.compile(r"^(?:page\s+)?\d{1,4}(?:\s*(?:/|of)\s*\d{1,4})?$", re.IGNORECASE)
+# Copyright notices, licence lines and arXiv stamps.
+BOILERPLATE = re.compile(
+    r"©|\(c\)\s*(?:19|20)\d{2}|^copyright\b|\ball rights reserved\b|^arxiv:\d{4}\.\d{4,5}",
+    re.IGNORECASE,
+)
+# A word hyphenated across a line break: "compres-\nsion".
+HYPHENATED = re.compile(r"([a-z])-\n[ \t]*([a-z])")
+# Duplicate heading names get a " (2)" suffix in StructureParser.
+DUPLICATE_SUFFIX = re.compile(r" \(\d+\)$")
+
+
+def _line_key(line):
+    """Normalises a line for repetition counting, so "Smith et al. 3" and "Smith et al. 4" match."""
+    return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+
+def _edge_keys(page):
+    lines = [line for line in page.splitlines() if line.strip()]
+    return {_line_key(line) for line in lines[:EDGE_LINES] + lines[-EDGE_LINES:]}
+
+
+def _drop_bibliography(pages, sections):
+    """Cuts the located bibliography, and the heading introducing it, out of the pages."""
+    span = reference_span(pages, sections)
+    if span is None:
+        return pages
+    start, end = span
+    kept = []
+    page_start = 0
+    for page in pages:
+        page_end = page_start + len(page)
+        if page_end < start or page_start > end:
+            kept.append(page)
+        else:
+            head = page[:max(0, start - page_start)]
+            lines = head.rstrip().rsplit("\n", 1)
+            if lines and REFERENCE_HEADING.match(lines[-1]):
+                head = lines[0] if len(lines) > 1 else ""
+            kept.append(head + page[max(0, end - page_start):])
+        page_start = page_end + 1
+    return kept
+
+
+def compress_pages(pages, sections=None):
+    """
+    Removes boilerplate from the pages of one paper.
+
+    Drops the bibliography, running headers/footers repeated across pages, page numbers
+    at the top or bottom of a page and copyright lines, re-joins words hyphenated across line breaks and collapses
+    whitespace. Page boundaries are kept, so page i of the result is page i of the input.
+
+    :param pages: List of page texts.
+    :param sections: Optional section offsets from StructureParser, used to find the bibliography.
+    :return: List of compressed page texts.
+    """
+    pages = _drop_bibliography(pages, sections)
+
+    repeated = set()
+    if len(pages) >= 2:
+        counts = Counter(key for page in pages for key in _edge_keys(page))
+        threshold = max(2, math.ceil(len(pages) * MIN_REPEAT_SHARE))
+        repeated = {key for key, count in counts.items() if count >= threshold and key}
+
+    compressed = []
+    for page in pages:
+        lines = page.splitlines()
+        edges = [index for index, line in enumerate(lines) if line.strip()]
+        edges = set(edges[:EDGE_LINES] + edges[-EDGE_LINES:])
+        kept = []
+        for index, line in enumerate(lines):
+            line = " ".join(line.split())
+            if (
+                BOILERPLATE.search(line)
+                # A bare number in the body is a table cell, value or equation number, not a page number
+                or (index in edges and (PAGE_NUMBER.match(line) or _line_key(line) in repeated))
+            ):
+                continue
+            kept.append(line)
+        text = HYPHENATED.sub(r"\1\2", "\n".join(kept))
+        compressed.append(re.sub(r"\n{3,}", "\n\n", text).strip())
+    return compressed
+
+
+def _relocate_sections(sections, text):
+    """Finds each section heading again in the compressed text and returns the new (start, end) offsets."""
+    found = []
+    cursor = 0
+    for name, _ in sorted(sections.items(), key=lambda item: item[1][0]):
+        heading = " ".join(name.split())
+        position = text.find(heading, cursor)
+        if position < 0:
+            heading = DUPLICATE_SUFFIX.sub("", heading)
+            position = text.find(heading, cursor)
+        if position < 0:
+            continue  # Heading was part of the removed boilerplate or bibliography
+        found.append((name, position, position + len(heading) + 1))
+        cursor = position + len(heading)
+
+    relocated = {}
+    for i, (name, _, start) in enumerate(found):
+        end = found[i + 1][1] if i + 1 < len(found) else len(text)
+        relocated[name] = (min(start, end), end)
+    return relocated
+
+
+def compress_document(document):
+    """
+    Compresses a research-paper Document produced by InputHandler.
+
+    :return: New Document with the compressed text, section offsets and page spans recomputed,
+             and a "compression" metadata entry with the character and token counts before and after.
+    """
+    metadata = document.metadata
+    text = document.page_content
+    page_spans = metadata.get("page_spans") or [(0, len(text))]
+    pages = compress_pages([text[start:end] for start, end in page_spans], metadata.get("sections"))
+
+    compressed = "\n".join(pages)
+    spans = []
+    offset = 0
+    for page in pages:
+        spans.append((offset, offset + len(page)))
+        offset += len(page) + 1
+
+    stats = {
+        "chars_before": len(text),
+        "chars_after": len(compressed),
+        "tokens_before": estimate_tokens(text),
+        "tokens_after": estimate_tokens(compressed),
+    }
+    return type(document)(
+        page_content=compressed,
+        metadata=dict(
+            metadata,
+            sections=_relocate_sections(metadata.get("sections", {}), compressed),
+            page_spans=spans,
+            compression=stats,
+        ),
+    )
+
+
+def compress_documents(documents):
+    """
+    Compresses research-paper Documents and logs how much text and how many tokens were saved.
+
+    :return: Tuple of (compressed Documents, dictionary of total "chars_before", "chars_after",
+             "tokens_before" and "tokens_after").
+    """
+    compressed = [compress_document(document) for document in documents]
+    totals = Counter()
+    for document in compressed:
+        stats = document.metadata["compression"]
+        totals.update(stats)
+        logger.info(
+            f"Compressed {document.metadata.get('source', 'paper')}: "
+            f"{stats['chars_before']} -> {stats['chars_after']} chars, "
+            f"~{stats['tokens_before']} -> ~{stats['tokens_after']} tokens"
+        )
+    totals = {key: totals[key] for key in ("chars_before", "chars_after", "tokens_before", "tokens_after")}
+    saved = totals["chars_before"] - totals["chars_after"]
+    logger.info(
+        f"Compression saved {saved} chars ({saved / max(totals['chars_before'], 1):.0%}), "
+        f"~{totals['tokens_before'] - totals['tokens_after']} tokens"
+    )
+    return compressed, totals
@@ -0,0 +1,44 @@
+from src.agents import citation_agent
+
+SHARED = 'J. Smith, "Learning to cite references at scale," Journal of Citations, vol. 2, pp. 1-9, 2019.'
+FIRST = 'A. Jones, "Parsing bibliographies from documents," Proc. Conf. on Text, pp. 10-20, 2020.'
+SECOND = 'B. Brown, "Merging duplicate references across papers," Trans. on Data, vol. 4, 2021.'
+
+
+def _bibitem(entry):
+    return "\\bibitem{ref} " + entry.split("] ", 1)[1]
+
+
+def _extract(monkeypatch, failing):
+    """Runs get_citations on two papers citing SHARED, failing the requests of chunks that contain the text failing."""
+    papers = {"a.pdf": f"[1] {SHARED}\n[2] {FIRST}", "b.pdf": f"[1] {SECOND}\n[2] {SHARED}"}
+    monkeypatch.setattr(
+        citation_agent.PDFExtractor, "extract_documents",
+        staticmethod(lambda sources, max_workers=None: [{"pages": [papers[s]], "metadata": {}} for s in sources]),
+    )
+    monkeypatch.setattr(citation_agent, "locate_references", lambda pages, sections: pages[0])
+    requests = []
+
+    def extract_chunk(chunk, use_cache=True):
+        requests.append(chunk)
+        return None if failing in chunk else [_bibitem(line) for line in chunk.splitlines()]
+
+    monkeypatch.setattr(citation_agent, "_extract_chunk", extract_chunk)
+    monkeypatch.setattr(citation_agent, "citation_llm", lambda: type("LLM", (), {"provider": "stub"}))
+    references = citation_agent.get_citations(list(papers), use_local_parser=False, use_store=False)
+    return references, requests
+
+
+def test_shared_reference_is_sent_once(monkeypatch):
+    references, requests = _extract(monkeypatch, failing="never")
+    assert len(requests) == 2 and SHARED not in requests[1]
+    assert [reference for reference in references if "Smith" in reference] == [
+        "\\bibitem{Smith2019} " + SHARED
+    ]
+
+
+def test_duplicate_of_failed_chunk_is_resent(monkeypatch):
+    references, requests = _extract(monkeypatch, failing=FIRST)
+    assert requests[2] == f"[2] {SHARED}"
+    assert any("Smith" in reference for reference in references)
+    assert any("Brown" in reference for reference in references)
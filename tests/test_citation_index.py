@@ -0,0 +1,38 @@
+from src.utils.citation_index import CitationIndex, deduplicate
+
+RESNET = '\\bibitem{x} K. He, X. Zhang, S. Ren, and J. Sun, "Deep residual learning for image recognition," in Proc. CVPR, 2016, pp. 770-778.'
+RESNET_VARIANTS = [
+    # Full names, title case and a spelled-out venue
+    '\\bibitem{He2016} Kaiming He, Xiangyu Zhang, Shaoqing Ren, Jian Sun, "Deep Residual Learning for Image '
+    'Recognition," IEEE Conference on Computer Vision and Pattern Recognition, 2016.',
+    # A raw entry with a word split across a line break and an OCR slip
+    'K. He, X. Zhang, S. Ren, and J. Sun, "Deep residual learn- ing for image recogniton," CVPR, 2016.',
+]
+IDENTITY = '\\bibitem{y} K. He, X. Zhang, S. Ren, and J. Sun, "Identity mappings in deep residual networks," in Proc. ECCV, 2016.'
+FASTER = '\\bibitem{z} S. Ren, K. He, R. Girshick, and J. Sun, "Faster R-CNN: Towards real-time object detection," in NeurIPS, 2015.'
+MASK = '\\bibitem{w} K. He, G. Gkioxari, P. Dollar, and R. Girshick, "Mask R-CNN," in Proc. ICCV, 2017.'
+
+
+def test_near_duplicates_in_different_formats_merge():
+    index = CitationIndex()
+    entry_id, new = index.add(RESNET)
+    assert new
+    for variant in RESNET_VARIANTS:
+        assert index.add(variant) == (entry_id, False)
+    assert len(index) == 1
+    # The longest formatting of the work is kept
+    assert "IEEE Conference" in index.bibitems()[0]
+
+
+def test_distinct_works_of_the_same_author_and_year_stay_separate():
+    references = deduplicate([RESNET, IDENTITY, FASTER, MASK])
+    assert len(references) == 4
+    keys = [reference.split("}")[0] for reference in references]
+    assert keys == ["\\bibitem{He2016a", "\\bibitem{He2016b", "\\bibitem{Ren2015", "\\bibitem{He2017"]
+
+
+def test_keys_do_not_depend_on_input_order():
+    references = [RESNET, IDENTITY, FASTER, MASK, *RESNET_VARIANTS]
+    forward = set(deduplicate(references))
+    assert set(deduplicate(references[::-1])) == forward
+    assert set(deduplicate(references[2:] + references[:2])) == forward
@@ -0,0 +1,48 @@
+from src.utils.citation_store import CitationStore, find_doi, reference_keys
+
+RESNET = ('\\bibitem{He2016a} K. He, X. Zhang, S. Ren, and J. Sun, "Deep residual learning for image recognition," '
+          'in Proc. CVPR, 2016, doi: 10.1109/CVPR.2016.90.')
+RESNET_NO_DOI = '[4] K. He, X. Zhang, S. Ren, and J. Sun, "Deep residual learning for image recognition," CVPR, 2016.'
+RESNET_OTHER_TITLE = '[9] K. He et al., "ResNets," CVPR, 2016. https://doi.org/10.1109/cvpr.2016.90'
+
+
+def test_keys_put_the_doi_first():
+    assert find_doi("see https://doi.org/10.1000/a\\_b.c).") == "10.1000/a_b.c"
+    assert reference_keys(RESNET) == ["doi:10.1109/cvpr.2016.90", "ref:he|2016|deep residual learning image recognition"]
+    assert reference_keys(RESNET_NO_DOI) == ["ref:he|2016|deep residual learning image recognition"]
+    assert reference_keys("[1] Unparseable entry") == []
+
+
+def test_lookups_match_by_doi_or_by_identity(tmp_path):
+    store = CitationStore(tmp_path / "citations.sqlite3")
+    assert store.add([(reference_keys(RESNET), RESNET)]) == 2
+    # One entry carries only the identity, the other only the DOI
+    assert store.find([RESNET_NO_DOI, RESNET_OTHER_TITLE, "[2] Unknown, \"Other work,\" 2001."]) == [RESNET, RESNET, None]
+
+
+def test_conflicting_keys_keep_the_longer_line(tmp_path):
+    store = CitationStore(tmp_path / "citations.sqlite3")
+    short = "\\bibitem{He2016} K. He et al., CVPR, 2016."
+    longer = short.replace("CVPR", "IEEE Conference on Computer Vision and Pattern Recognition")
+    # Within one batch and across batches, whichever order they come in
+    assert store.add([(["doi:10.1/x"], short), (["doi:10.1/x"], longer), (["doi:10.1/y"], longer)]) == 2
+    store.add([(["doi:10.1/y"], short)])
+    assert store.lookup(["doi:10.1/x", "doi:10.1/y", "doi:10.1/z"]) == {"doi:10.1/x": longer, "doi:10.1/y": longer}
+    assert len(store) == 2
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = tmp_path / "store" / "citations.sqlite3"
+    CitationStore(path).add([(reference_keys(RESNET), RESNET)])
+    reopened = CitationStore(path)
+    assert len(reopened) == 2
+    assert reopened.find([RESNET_NO_DOI]) == [RESNET]
+
+
+def test_bulk_lookups_span_several_batches(tmp_path, monkeypatch):
+    from src.utils import citation_store
+    monkeypatch.setattr(citation_store, "LOOKUP_BATCH", 7)
+    store = CitationStore(tmp_path / "citations.sqlite3")
+    store.add(([f"doi:10.1/{number}"], f"\\bibitem{{K{number}}} Work {number}") for number in range(50))
+    found = store.lookup(f"doi:10.1/{number}" for number in range(0, 60, 2))
+    assert sorted(found) == sorted(f"doi:10.1/{number}" for number in range(0, 50, 2))
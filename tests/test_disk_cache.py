@@ -0,0 +1,51 @@
+import os
+import time
+
+from src.utils.disk_cache import DiskCache
+
+
+def _age(cache, key, accessed, written):
+    """Backdates an entry's last use and write time by the given numbers of seconds."""
+    now = time.time()
+    os.utime(cache._path(key), (now - accessed, now - written))
+
+
+def test_round_trip_counts_hits_and_misses(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.set("key", {"text": "é", "pages": [1, 2]})
+    assert cache.get("key") == {"text": "é", "pages": [1, 2]}
+    assert cache.get("other") is None
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_expired_entries_are_deleted_on_read(tmp_path):
+    cache = DiskCache(tmp_path, max_age=60)
+    cache.set("old", "value")
+    cache.set("new", "value")
+    _age(cache, "old", accessed=0, written=120)
+    assert cache.get("old") is None
+    assert not os.path.exists(cache._path("old"))
+    assert cache.get("new") == "value"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiskCache(tmp_path)
+    cache.set("a", "x" * 100)
+    cache.max_bytes = 2 * os.path.getsize(cache._path("a"))
+    cache.set("b", "x" * 100)
+    _age(cache, "a", accessed=10, written=30)
+    _age(cache, "b", accessed=20, written=20)
+    cache.set("c", "x" * 100)
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == "x" * 100
+
+
+def test_eviction_drops_expired_entries_first(tmp_path):
+    cache = DiskCache(tmp_path, max_age=60)
+    cache.set("a", "x" * 100)
+    cache.max_bytes = 2 * os.path.getsize(cache._path("a"))
+    cache.set("b", "x" * 100)
+    _age(cache, "a", accessed=0, written=120)
+    _age(cache, "b", accessed=20, written=20)
+    cache.set("c", "x" * 100)
+    assert sorted(os.listdir(tmp_path)) == ["b.json.zst", "c.json.zst"]
@@ -0,0 +1,34 @@
+from src.utils.llm_json import IncrementalJSONParser, loads_tolerant
+
+
+def test_valid_json_escapes_before_words_are_kept():
+    assert loads_tolerant(r'{"a": "line1\nthe next", "b": "tab\there"}') == {"a": "line1\nthe next", "b": "tab\there"}
+
+
+def test_latex_commands_keep_their_backslash():
+    value = loads_tolerant(r'{"a": "\textbf{x}, \frac{1}{2}, \beta, \newline, \cite{k} and \nu"}')
+    assert value == {"a": r"\textbf{x}, \frac{1}{2}, \beta, \newline, \cite{k} and \nu"}
+
+
+def test_escaped_backslashes_and_unicode_escapes():
+    assert loads_tolerant(r'{"a": "\\textbf{ok}", "b": "é \url{x}"}') == {"a": r"\textbf{ok}", "b": r"é \url{x}"}
+
+
+def test_think_trace_code_fence_and_trailing_commas():
+    text = '<think>{"not": "this"}</think>\n```json\n{"a": [1, 2,], "b": "x",}\n```'
+    assert loads_tolerant(text) == {"a": [1, 2], "b": "x"}
+
+
+def test_raw_control_characters_inside_strings():
+    assert loads_tolerant('{"a": "two\nlines"}') == {"a": "two\nlines"}
+
+
+def test_truncated_stream_yields_what_was_received():
+    parser = IncrementalJSONParser()
+    for char in r'{"title": "T", "sections": [{"heading": "Intro", "content": "\textbf{Dee':
+        parser.feed(char)
+    assert parser.result() == {"title": "T", "sections": [{"heading": "Intro", "content": r"\textbf{Dee"}]}
+
+
+def test_no_json_object():
+    assert loads_tolerant("no JSON here") is None
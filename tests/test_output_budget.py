@@ -0,0 +1,51 @@
+import pytest
+
+from src.llm import output_budget
+from src.llm.output_budget import OutputBudget, OutputMeter, ReasoningBudgetExceeded
+
+
+@pytest.fixture(autouse=True)
+def count_characters(monkeypatch):
+    """Counts one token per character, so the counts do not depend on the tokenizer or on chunk boundaries."""
+    monkeypatch.setattr(output_budget, "count_tokens", len)
+
+
+def _read(meter, chunks):
+    return "".join(meter.feed(chunk) for chunk in chunks) + meter.finish()
+
+
+def test_trace_and_payload_are_counted_apart():
+    meter = OutputMeter(OutputBudget("report", 100, 10, abandon_traces=True))
+    assert _read(meter, ["<thi", "nk>abc", "de</thi", "nk>\n  {\"a\"", ": 1}"]) == '{"a": 1}'
+    assert meter.usage() == {"task": "report", "reasoning_tokens": 5, "payload_tokens": 8, "abandoned_tokens": 0}
+
+
+def test_trace_over_its_allowance_is_cut_off():
+    meter = OutputMeter(OutputBudget("report", 100, 10, abandon_traces=True))
+    assert meter.feed("<think>abcdefghij") == ""  # The last len("</think>") - 1 characters are held back
+    assert meter.reasoning_tokens == 3
+    assert meter.feed("klmnop") == ""
+    assert meter.reasoning_tokens == 9
+    with pytest.raises(ReasoningBudgetExceeded):
+        meter.feed("qr")
+    assert meter.reasoning_tokens == 11
+    assert meter.payload_tokens == 0
+
+
+@pytest.mark.parametrize("budget, limit_reasoning", [
+    (OutputBudget("report", 100, 10), True),  # abandon_traces off
+    (OutputBudget("report", 100, 10, abandon_traces=True), False),  # re-asked call
+])
+def test_trace_is_only_counted_when_not_limited(budget, limit_reasoning):
+    meter = OutputMeter(budget, limit_reasoning)
+    assert _read(meter, ["<think>", "x" * 50, "</think>", "answer"]) == "answer"
+    assert (meter.reasoning_tokens, meter.payload_tokens) == (50, 6)
+
+
+def test_budget_limits():
+    budget = OutputBudget("citations", 4096)
+    assert budget.max_tokens == 4096 and not budget.abandon_traces
+    assert OutputBudget("report", 6144, 2048, abandon_traces=True).max_tokens == 8192
+    assert OutputBudget("report", 6144, 2048).cache_params({"temperature": 0}) == {
+        "temperature": 0, "max_tokens": 8192, "reasoning_tokens": 2048
+    }
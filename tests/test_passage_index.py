@@ -0,0 +1,61 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.utils import disk_cache, passage_index
+from src.utils.passage_index import PassageIndex, tokenize
+
+FILLER = "The framework is described in general terms and its motivation is given at length. "
+
+
+def _paper(sections):
+    """A paper with the given (heading, body) sections and their offsets in its metadata."""
+    text = ""
+    spans = {}
+    for heading, body in sections:
+        text += heading + "\n"
+        spans[heading] = (len(text), len(text) + len(body))
+        text += body + "\n"
+    return Document(page_content=text, metadata={"sections": spans})
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("BIBTEX_AI_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(disk_cache, "_caches", {})
+
+
+@pytest.fixture
+def index():
+    papers = [
+        _paper([
+            ("Introduction", FILLER * 30),
+            ("Experiments", FILLER * 10 + "We evaluate on the ImageNet dataset; accuracy improves by four points. "),
+        ]),
+        _paper([("Introduction", FILLER * 12), ("Results", "Accuracy results on ImageNet are reported in a table.")]),
+    ]
+    return PassageIndex(papers)
+
+
+def test_tokenize_drops_stopwords_and_plurals():
+    assert tokenize("The models of the datasets were evaluated") == ["model", "dataset", "evaluated"]
+
+
+def test_relevant_passage_beats_the_leading_prefix(index):
+    ranking = index.search("ImageNet accuracy evaluation", k=3)
+    assert {index.passages[passage_id][1] for passage_id, _ in ranking[:2]} == {"Experiments", "Results"}
+    # The leading Introduction passages, which a prefix cut would keep, do not match at all
+    assert {index.passages[passage_id][1] for passage_id, _ in ranking} == {"Experiments", "Results"}
+    assert [index.passages[passage_id][0] for passage_id, _ in index.search("ImageNet", papers=[1])] == [1]
+
+
+def test_select_respects_the_token_budget(index):
+    queries = ["ImageNet accuracy", "framework motivation"]
+    everything = index.select(queries, max_tokens=10**6)
+    assert len(everything) > 2
+
+    budget = passage_index.count_tokens(index.text(everything[0])) + 60
+    selected = index.select(queries, max_tokens=budget)
+    assert 0 < len(selected) < len(everything)
+    assert sum(passage_index.count_tokens(index.text(passage_id)) for passage_id in selected) <= budget
+    # Returned in paper and reading order
+    assert selected == sorted(selected, key=lambda passage_id: (index.passages[passage_id][0], index.passages[passage_id][2]))
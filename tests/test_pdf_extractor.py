@@ -0,0 +1,54 @@
+import io
+
+import fitz
+import pytest
+
+from src.utils import disk_cache, pdf_extractor
+from src.utils.pdf_extractor import PDFExtractor, read_pdf
+
+
+class _Stream(io.BufferedReader):
+    """A seekable file object without getbuffer, like an opened file or a spooled upload."""
+
+
+def _pdf(text, pages=1):
+    doc = fitz.open()
+    for number in range(pages):
+        doc.new_page().insert_text((50, 60), f"{text} page {number + 1}")
+    return doc.tobytes()
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("BIBTEX_AI_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(disk_cache, "_caches", {})
+
+
+def test_read_pdf_leaves_streams_readable():
+    stream = _Stream(io.BytesIO(b"%PDF-1.7 data"))
+    stream.read(4)
+    assert read_pdf(stream) == b"%PDF-1.7 data"
+    assert read_pdf(stream) == b"%PDF-1.7 data"
+    assert stream.tell() == 0
+
+
+def test_workers_are_started_once_and_never_forked(cache_dir):
+    first = PDFExtractor.extract_texts([_pdf("alpha"), _pdf("beta"), _pdf("gamma")], max_workers=2)
+    assert first == ["alpha page 1\n", "beta page 1\n", "gamma page 1\n"]
+    pool = pdf_extractor._process_pool()
+    assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+
+    second = PDFExtractor.extract_texts([_pdf("delta"), io.BytesIO(_pdf("epsilon"))], max_workers=2)
+    assert second == ["delta page 1\n", "epsilon page 1\n"]
+    assert pdf_extractor._process_pool() is pool
+
+
+def test_map_bounds_calls_and_keeps_their_order():
+    assert pdf_extractor._map(pow, 2, [2, 3, 4, 5], [2, 2, 2, 2]) == [4, 9, 16, 25]
+    assert pdf_extractor._map(pow, 1, [2, 3], [3, 3]) == [8, 27]
+
+
+def test_long_documents_are_split_across_workers(cache_dir):
+    pages = 2 * pdf_extractor.MIN_PAGES_PER_WORKER
+    text = PDFExtractor.extract_text(_pdf("long", pages), max_workers=2)
+    assert [line for line in text.splitlines() if line] == [f"long page {number}" for number in range(1, pages + 1)]
@@ -0,0 +1,22 @@
+from src.utils import prompt_budget
+from src.utils.prompt_budget import BUNDLED_TOKENIZER, allocate, get_tokenizer
+
+
+def test_bundled_tokenizer_measures_llama3_tokens():
+    tokenizer = get_tokenizer(BUNDLED_TOKENIZER)
+    assert tokenizer.encode("Hello world", add_special_tokens=False).ids == [9906, 1917]
+    assert tokenizer.get_vocab_size() == 128256
+
+
+def test_counts_and_truncation_use_the_tokenizer(monkeypatch):
+    monkeypatch.setattr(prompt_budget, "get_tokenizer", lambda: get_tokenizer(BUNDLED_TOKENIZER))
+    text = "Retrieval-augmented generation grounds answers in passages."
+    count = prompt_budget.count_tokens(text)
+    assert count != prompt_budget.estimate_tokens(text)
+    prefix = prompt_budget.truncate_tokens(text, 3)
+    assert text.startswith(prefix) and prompt_budget.count_tokens(prefix) == 3
+
+
+def test_allocate_gives_unused_share_to_larger_items():
+    assert allocate([10, 100, 100], 150) == [10, 70, 70]
+    assert allocate([10, 100], 150, cap=50) == [10, 50]
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from src.llm.local_server import StandInConfig, start_server
+from src.llm.providers import FAILOVER_ATTEMPTS, OpenAICompatibleProvider, ProviderRouter
+
+
+@pytest.fixture
+def stand_ins():
+    """Starts stand-in servers on demand and stops them after the test."""
+    servers = []
+
+    def start(**config):
+        server = start_server(config=StandInConfig(payload="ok", **config))
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _router(*servers):
+    return ProviderRouter([
+        OpenAICompatibleProvider(base_url=f"http://127.0.0.1:{server.server_port}/v1") for server in servers
+    ])
+
+
+def test_fails_over_and_then_avoids_the_failing_provider(stand_ins):
+    # 429 with Retry-After: 0 is retried without a backoff wait
+    failing = stand_ins(error_rate=1.0, error_status=429, retry_after=0)
+    healthy = stand_ins()
+    router = _router(failing, healthy)
+
+    assert router.generate("prompt") == "ok"
+    assert failing.config.requests == FAILOVER_ATTEMPTS
+    assert healthy.config.requests == 1
+
+    assert router.ranked()[0].base_url.endswith(f":{healthy.server_port}/v1")
+    assert router.generate("prompt") == "ok"
+    assert failing.config.requests == FAILOVER_ATTEMPTS
+
+
+def test_routes_to_the_faster_provider_once_measured(stand_ins):
+    slow = stand_ins(latency=0.2)
+    fast = stand_ins()
+    router = _router(slow, fast)
+
+    for _ in range(5):
+        assert router.generate("prompt") == "ok"
+    # Each provider is measured once, then the faster one takes every call
+    assert slow.config.requests == 1
+    assert fast.config.requests == 4
+
+
+def test_async_stream_fails_over_before_the_first_chunk(stand_ins):
+    failing = stand_ins(error_rate=1.0, error_status=503, retry_after=0)
+    healthy = stand_ins()
+    router = _router(failing, healthy)
+    # 503 carries no Retry-After; keep the backoff between the failing provider's attempts short
+    failing_caller = router.providers[0].caller
+    failing_caller._backoff = lambda retry_state: 0
+
+    async def collect():
+        return "".join([chunk async for chunk in router.astream("prompt")])
+
+    assert asyncio.run(collect()) == "ok"
+    assert failing.config.requests == FAILOVER_ATTEMPTS
+    assert healthy.config.requests == 1
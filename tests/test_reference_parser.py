@@ -0,0 +1,25 @@
+from src.utils.reference_parser import escape_latex, parse_bibliography, parse_entry, to_bibitem
+
+
+def test_escape_latex():
+    assert escape_latex(r"50% of tasks_v2 & #1 {x} $5 a\b") == r"50\% of tasks\_v2 \& \#1 \{x\} \$5 a\textbackslash{}b"
+
+
+def test_bibitem_fields_are_escaped():
+    parsed = parse_entry("Smith, A., & Jones, B. (2020). Solving 50% of tasks_v2. Journal of AI & ML, 3, 1-9.")
+    bibitem = to_bibitem(parsed, "Smith2020")
+    assert bibitem.startswith(r"\bibitem{Smith2020} Smith, A., \& Jones, B., ")
+    assert r'"Solving 50\% of tasks\_v2,"' in bibitem
+    assert r"Journal of AI \& ML" in bibitem
+
+
+def test_numbered_ieee_bibliography():
+    references, confidence = parse_bibliography(
+        '[1] K. He, X. Zhang, S. Ren, and J. Sun, "Deep residual learning for image recognition," in Proc. CVPR, 2016.\n'
+        '[2] A. Vaswani and N. Shazeer, "Attention is all you need," in Proc. NeurIPS, 2017.'
+    )
+    assert confidence == 1.0
+    assert references == [
+        r'\bibitem{He2016} K. He, X. Zhang, S. Ren, and J. Sun, "Deep residual learning for image recognition," Proc. CVPR, 2016.',
+        r'\bibitem{Vaswani2017} A. Vaswani and N. Shazeer, "Attention is all you need," Proc. NeurIPS, 2017.',
+    ]
@@ -0,0 +1,96 @@
+import pytest
+
+from src.llm import resilience
+from src.llm.resilience import CircuitBreaker, CircuitOpenError, ResilientCaller, is_retryable
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_is_retryable():
+    assert is_retryable(_StatusError(429))
+    assert is_retryable(_StatusError(503))
+    assert is_retryable(TimeoutError())
+    assert is_retryable(ConnectionError())
+    assert not is_retryable(_StatusError(400))
+    assert not is_retryable(ValueError())
+    assert not is_retryable(CircuitOpenError())
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_success()  # A success resets the count
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert breaker.state == "open"
+    clock.now += 1
+    assert breaker.state == "half-open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # Only one trial call at a time
+
+    breaker.record_failure()  # A failed trial opens the circuit for another reset_timeout
+    assert breaker.state == "open"
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_client_errors_do_not_open_the_circuit(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    breaker.record_error(_StatusError(400))
+    assert breaker.state == "closed"
+    breaker.record_error(_StatusError(500))
+    assert breaker.state == "open"
+
+
+def test_open_circuit_fails_calls_fast(clock):
+    caller = ResilientCaller("test", max_attempts=1, hedging=False)
+    caller.breaker.failure_threshold = 1
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise _StatusError(503)
+
+    with pytest.raises(_StatusError):
+        caller.call(failing)
+    with pytest.raises(CircuitOpenError):
+        caller.call(failing)
+    assert len(calls) == 1
+    assert caller.health()["state"] == "open"
@@ -0,0 +1,89 @@
+import fitz
+
+from src.utils.pdf_extractor import page_spans
+from src.utils.structure_parser import StructureParser, clip_metadata, is_section_heading
+
+BODY = "Body text of the paper that fills the page in the regular font size of the document."
+
+
+def _pdf(pages):
+    """Builds a PDF whose pages hold the given (text, font size, font) lines from the top."""
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page()
+        for row, (text, size, font) in enumerate(lines):
+            page.insert_text((50, 60 + row * 30), text, fontsize=size, fontname=font)
+    return fitz.open(stream=doc.tobytes(), filetype="pdf")
+
+
+def _parse(doc, parser=None):
+    parser = parser or StructureParser()
+    texts = [parser.add_page(page_spans(page)) for page in doc]
+    return parser, "\n".join(texts)
+
+
+STYLED = [
+    [
+        ("A Study of Things", 20, "helv"),
+        ("Jane Doe", 12, "helv"),
+        ("Abstract", 12, "hebo"),
+        (BODY, 10, "helv"),
+        ("1 Introduction", 12, "hebo"),
+        (BODY, 10, "helv"),
+        (BODY, 10, "helv"),
+        ("Figure 1", 12, "hebo"),  # Captions are not headings, even when set like one
+        (BODY, 10, "helv"),
+    ],
+    [
+        ("2 Method", 12, "hebo"),
+        (BODY, 10, "helv"),
+        ("Key findings.", 12, "hebo"),  # Nor are sentences
+        (BODY, 10, "helv"),
+    ],
+]
+
+
+def test_headings_come_from_span_fonts():
+    parser, text = _parse(_pdf(STYLED))
+    metadata = parser.metadata()
+    assert metadata["title"] == "A Study of Things"
+    assert metadata["author"] == "Jane Doe"
+    assert list(metadata["sections"]) == ["Abstract", "1 Introduction", "2 Method"]
+
+    start, end = metadata["sections"]["1 Introduction"]
+    assert text[start:end].strip().startswith(BODY)
+    assert "Figure 1" in text[start:end]
+    start, end = metadata["sections"]["2 Method"]
+    assert end == len(text) and text[start:].strip().endswith(BODY)
+    assert text[metadata["page_spans"][1][0]:].startswith("2 Method")
+
+
+def test_single_font_documents_fall_back_to_heading_names():
+    doc = _pdf([[
+        ("Plain Title", 10, "helv"),
+        (BODY, 10, "helv"),
+        ("1 Introduction", 10, "helv"),
+        (BODY, 10, "helv"),
+        ("Some short line", 10, "helv"),
+        ("References", 10, "helv"),
+        (BODY, 10, "helv"),
+    ]])
+    metadata = _parse(doc)[0].metadata()
+    assert metadata["title"] == "Plain Title"
+    assert list(metadata["sections"]) == ["1 Introduction", "References"]
+    assert is_section_heading("References:") and not is_section_heading("Some short line")
+
+
+def test_merged_page_ranges_match_a_single_pass():
+    doc = _pdf(STYLED)
+    whole = _parse(doc)[0].metadata()
+    first, second = StructureParser(), StructureParser()
+    first.add_page(page_spans(doc[0]))
+    second.add_page(page_spans(doc[1]))
+    first.merge(second)
+    assert first.metadata() == whole
+
+    page_end = whole["page_spans"][0][1]
+    clipped = clip_metadata(whole, page_end)
+    assert clipped["sections"]["1 Introduction"] == (whole["sections"]["1 Introduction"][0], page_end)
+    assert "2 Method" not in clipped["sections"]
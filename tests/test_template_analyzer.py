@@ -0,0 +1,37 @@
+import fitz
+
+from src.utils import disk_cache
+from src.utils.template_analyzer import TemplateAnalyzer
+
+BODY = "Body text of the template that fills the page in the regular font size."
+
+
+def _template():
+    """A one-page template whose title, author and affiliation are set large or bold like its headings."""
+    doc = fitz.open()
+    page = doc.new_page()
+    lines = [
+        ("Template Title", 20, "hebo"),
+        ("Jane Doe", 14, "hebo"),
+        ("University of Somewhere, 12 Main Street", 12, "hebo"),
+        ("1 Introduction", 14, "hebo"),
+        (BODY, 10, "helv"),
+        (BODY, 10, "helv"),
+        ("Contact Desk", 14, "hebo"),
+        (BODY, 10, "helv"),
+        ("References", 14, "hebo"),
+        (BODY, 10, "helv"),
+    ]
+    for row, (text, size, font) in enumerate(lines):
+        page.insert_text((50, 60 + row * 30), text, fontsize=size, fontname=font)
+    return doc.tobytes()
+
+
+def test_fingerprint_lists_only_section_headings(tmp_path, monkeypatch):
+    monkeypatch.setenv("BIBTEX_AI_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(disk_cache, "_caches", {})
+    fingerprint = TemplateAnalyzer.fingerprint(_template())
+    assert fingerprint["section_order"] == ["1 Introduction", "References"]
+    description = TemplateAnalyzer.describe(fingerprint)
+    for personal in ("Jane Doe", "University", "Contact Desk", "Template Title"):
+        assert personal not in description
@@ -0,0 +1,33 @@
+from src.utils.text_compressor import compress_pages
+
+WORDS = ("alpha", "beta", "gamma", "delta", "epsilon", "zeta")
+
+
+def _page(number, middle):
+    """A page whose lines, apart from the running header and footer, differ from page to page."""
+    word = WORDS[number]
+    return "\n".join([
+        "Journal of Things, Vol. 3",
+        f"The {word} study opens here.",
+        f"Methods of the {word} study.",
+        f"Setup of the {word} runs.",
+        *middle,
+        f"Findings of the {word} study.",
+        f"Limits of the {word} study.",
+        f"Page {number} of 3",
+    ])
+
+
+def test_page_numbers_are_stripped_only_at_page_edges():
+    pages = [_page(number, ["Run", "42", "17", "8 / 10"]) for number in (1, 2)]
+    for page in compress_pages(pages):
+        assert page.splitlines()[3:7] == ["Run", "42", "17", "8 / 10"]
+        assert "Page" not in page
+
+
+def test_headers_footers_copyright_and_hyphenation():
+    pages = [_page(number, ["© 2020 Publisher", "Some com-", "pressed words."]) for number in (1, 2, 3)]
+    assert compress_pages(pages)[1] == (
+        "The gamma study opens here.\nMethods of the gamma study.\nSetup of the gamma runs.\nSome compressed words.\n"
+        "Findings of the gamma study.\nLimits of the gamma study."
+    )